@@ -0,0 +1,233 @@
+import datetime
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import Count, F, Max, Q, Sum
+from django.db.models.functions import Coalesce, TruncDate, TruncHour
+from django.utils import timezone
+
+from .models import Registration, Payment, EventRollup, RollupRun, StaleRollupBucket
+from .payments import CONFIRMED
+
+
+MEASURES = ('registrations', 'payments', 'confirmed_payments', 'revenue')
+HOUR = datetime.timedelta(hours=1)
+
+
+def raw_measures():
+    """
+    Dashboard measures over ``Registration`` rows joined with their payment.
+    """
+    confirmed = Q(payment__payment_status=CONFIRMED)
+    return {
+        'registrations': Count('id'),
+        'payments': Count('payment'),
+        'confirmed_payments': Count('payment', filter=confirmed),
+        'revenue': Coalesce(Sum('payment__amount_paid', filter=confirmed), 0),
+    }
+
+
+def rollup_measures():
+    """
+    The same measures re-added over ``EventRollup`` rows.
+    """
+    return {name: Coalesce(Sum(name), 0) for name in MEASURES}
+
+
+class StatsSource:
+    """
+    Where the dashboard numbers come from: the column paths and measures of
+    either the raw tables or the rollup table.
+    """
+
+    def __init__(self, created, ticket_type, payment_method, measures):
+        self.created = created
+        self.ticket_type = ticket_type
+        self.payment_method = payment_method
+        self.measures = measures
+
+
+RAW = StatsSource('created_at', 'ticket__type', 'payment__payment_method', raw_measures)
+ROLLUP = StatsSource('bucket', 'ticket_type', 'payment_method', rollup_measures)
+
+
+def filter_period(queryset, source, start=None, end=None):
+    """
+    Keep rows created on or after the ``start`` date and before the day
+    after ``end`` (UTC).
+    """
+    if start is not None:
+        since = datetime.datetime.combine(start, datetime.time(), datetime.timezone.utc)
+        queryset = queryset.filter(**{f'{source.created}__gte': since})
+    if end is not None:
+        until = datetime.datetime.combine(end + datetime.timedelta(days=1), datetime.time(), datetime.timezone.utc)
+        queryset = queryset.filter(**{f'{source.created}__lt': until})
+    return queryset
+
+
+def _counts(row):
+    return {name: row[name] for name in MEASURES}
+
+
+def dashboard_stats(queryset, source):
+    """
+    Totals, registrations per day, revenue per payment method and ticket type
+    mix for ``queryset`` (registrations for ``RAW``, rollups for ``ROLLUP``).
+    """
+    queryset = queryset.order_by()
+    totals = queryset.aggregate(**source.measures())
+    totals['conversion_rate'] = (
+        round(totals['confirmed_payments'] / totals['registrations'], 4) if totals['registrations'] else 0.0
+    )
+
+    per_day = (
+        queryset
+        .values(day=TruncDate(source.created, tzinfo=datetime.timezone.utc))
+        .annotate(**source.measures())
+        .order_by('day')
+    )
+    per_method = (
+        queryset
+        .values(method=F(source.payment_method))
+        .annotate(**source.measures())
+        .order_by('method')
+    )
+    per_type = (
+        queryset
+        .values(type=F(source.ticket_type))
+        .annotate(**source.measures())
+        .order_by('type')
+    )
+    return {
+        'totals': totals,
+        'registrations_per_day': [
+            {'day': row['day'].isoformat(), **_counts(row)} for row in per_day
+        ],
+        'revenue_by_payment_method': [
+            {'payment_method': row['method'], **_counts(row)} for row in per_method if row['method'] is not None
+        ],
+        'ticket_types': [
+            {'ticket_type': row['type'], 'registrations': row['registrations']} for row in per_type
+        ],
+    }
+
+
+def rollups_as_of():
+    """
+    When the rollups were last computed, ``None`` before the first run.
+    """
+    return RollupRun.objects.aggregate(last=Max('computed_at'))['last']
+
+
+def record_run(computed_at):
+    """
+    Remember that a run started at ``computed_at`` finished.
+    """
+    with transaction.atomic():
+        RollupRun.objects.create(computed_at=computed_at)
+        RollupRun.objects.filter(computed_at__lt=computed_at).delete()
+
+
+def hour_of(moment):
+    return moment.astimezone(datetime.timezone.utc).replace(minute=0, second=0, microsecond=0)
+
+
+def rollup_events(event_ids, start=None, end=None, computed_at=None, batch_size=1000):
+    """
+    Rebuild the hourly rollups of the given events, optionally only for
+    buckets in ``[start, end)``.
+
+    Existing rows in the range are replaced in one transaction, so the
+    dashboard never sees a half-built hour. Returns the number of rows
+    written.
+    """
+    computed_at = computed_at or timezone.now()
+    registrations = Registration.objects.filter(ticket__event_id__in=event_ids)
+    rollups = EventRollup.objects.filter(event_id__in=event_ids)
+    if start is not None:
+        registrations = registrations.filter(created_at__gte=start)
+        rollups = rollups.filter(bucket__gte=start)
+    if end is not None:
+        registrations = registrations.filter(created_at__lt=end)
+        rollups = rollups.filter(bucket__lt=end)
+
+    rows = (
+        registrations
+        .values(
+            rollup_event=F('ticket__event_id'),
+            hour=TruncHour('created_at', tzinfo=datetime.timezone.utc),
+            type=F('ticket__type'),
+            method=F('payment__payment_method'),
+        )
+        .annotate(**raw_measures())
+        .order_by()
+    )
+    written = 0
+    with transaction.atomic():
+        rollups.delete()
+        batch = []
+        for row in rows.iterator(chunk_size=batch_size):
+            batch.append(EventRollup(
+                event_id=row['rollup_event'],
+                bucket=row['hour'],
+                ticket_type=row['type'],
+                payment_method=row['method'],
+                computed_at=computed_at,
+                **_counts(row),
+            ))
+            if len(batch) == batch_size:
+                EventRollup.objects.bulk_create(batch)
+                written += len(batch)
+                batch = []
+        EventRollup.objects.bulk_create(batch)
+        written += len(batch)
+    return written
+
+
+def changed_buckets(since, stale=()):
+    """
+    ``{event_id: (first hour, last hour)}`` of the buckets holding
+    registrations or payments written at or after ``since``, plus the
+    ``(event_id, bucket)`` pairs in ``stale``.
+    """
+    hour = TruncHour('created_at', tzinfo=datetime.timezone.utc)
+    changed = (
+        Registration.objects
+        .filter(updated_at__gte=since, ticket__isnull=False)
+        .values_list('ticket__event_id', hour)
+        .distinct()
+    )
+    paid = (
+        Payment.objects
+        .filter(updated_at__gte=since, registration__ticket__isnull=False)
+        .values_list('registration__ticket__event_id', TruncHour('registration__created_at', tzinfo=datetime.timezone.utc))
+        .distinct()
+    )
+    hours = defaultdict(list)
+    for event_id, bucket in [*changed, *paid, *stale]:
+        hours[event_id].append(bucket)
+    return {event_id: (min(buckets), max(buckets)) for event_id, buckets in hours.items()}
+
+
+def refresh_rollups(overlap=datetime.timedelta(minutes=5)):
+    """
+    Rebuild only the buckets touched since the last run, and those left by
+    registrations that moved to another event (``StaleRollupBucket``).
+
+    ``overlap`` covers transactions that were still open when the last run
+    started. Deleted registrations leave no trace to detect, so schedule a
+    full ``rollup_stats --full`` as well. Returns ``(events, rows)``, or
+    ``None`` when there is no previous run.
+    """
+    last_run = rollups_as_of()
+    if last_run is None:
+        return None
+    computed_at = timezone.now()
+    written = 0
+    stale = list(StaleRollupBucket.objects.values_list('pk', 'event_id', 'bucket'))
+    buckets = changed_buckets(last_run - overlap, [(event_id, bucket) for _, event_id, bucket in stale])
+    for event_id, (first, last) in buckets.items():
+        written += rollup_events([event_id], first, last + HOUR, computed_at=computed_at)
+    StaleRollupBucket.objects.filter(pk__in=[pk for pk, _, _ in stale]).delete()
+    record_run(computed_at)
+    return len(buckets), written
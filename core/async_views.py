@@ -0,0 +1,225 @@
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.http import Http404, HttpResponse
+from django.db import DEFAULT_DB_ALIAS
+from django.utils.decorators import classonlymethod
+from django.utils.functional import classproperty
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework import exceptions, status
+
+from .authentication import StatelessJWTAuthentication
+from .availability import availability_data, availability_version
+from .cache import event_cache, ticket_cache
+from .conditional import detail_validators, alist_validators, arow_version
+from .fast_serializers import EventFastSerializer, TicketFastSerializer, RegistrationFastSerializer
+from .models import Event, Ticket, Registration
+from .pagination import KeysetPagination
+from .renderers import JSONRenderer
+from .roles import ahas_role
+from .search import filter_events
+from .serializers import EventSerializer, TicketSerializer, RegistrationSerializer, EventFilterSerializer
+from . import views
+
+
+class AsyncReadView(View):
+    """
+    Serves GET natively under ASGI and hands every other method to the sync
+    DRF view in ``sync_view``.
+
+    Authentication, permission checks, cache and ORM access are awaited, so
+    a browse request never leaves the event loop for a thread. Responses are
+    rendered with DRF's ``JSONRenderer`` and error bodies follow DRF's
+    exception handler, so clients see the same bytes as from the sync views.
+    """
+    sync_view = None
+    admin_only = False
+    authentication = StatelessJWTAuthentication()
+    renderer = JSONRenderer()
+
+    @classproperty
+    def read_from_replica(cls):
+        return getattr(cls.sync_view, 'read_from_replica', False)
+
+    @classonlymethod
+    def as_view(cls, **initkwargs):
+        # Token auth only, same as APIView
+        return csrf_exempt(super().as_view(**initkwargs))
+
+    async def get(self, request, *args, **kwargs):
+        try:
+            await self.authenticate(request)
+            await self.check_permissions(request)
+            validators = await self.get_validators(request, *args, **kwargs)
+            if validators is not None:
+                response = validators.not_modified(request)
+                if response is not None:
+                    return validators.apply(response)
+            data = await self.read(request, *args, **kwargs)
+        except Http404:
+            return self.render({'detail': 'Not found.'}, status.HTTP_404_NOT_FOUND)
+        except exceptions.APIException as exc:
+            return self.handle_exception(request, exc)
+        response = self.render(data)
+        return validators.apply(response) if validators is not None else response
+
+    async def delegate(self, request, *args, **kwargs):
+        return await sync_to_async(self.sync_view.as_view())(request, *args, **kwargs)
+
+    post = put = patch = delete = delegate
+
+    async def read(self, request, *args, **kwargs):
+        raise NotImplementedError
+
+    async def get_validators(self, request, *args, **kwargs):
+        # ETag/Last-Modified checked before read(), None to skip
+        return None
+
+    async def authenticate(self, request):
+        result = await self.authentication.aauthenticate(request)
+        if result is None:
+            raise exceptions.NotAuthenticated()
+        request.user, request.auth = result
+
+    async def check_permissions(self, request):
+        if self.admin_only and not (request.user.is_superuser or await ahas_role(request.user, 'admin')):
+            raise exceptions.PermissionDenied()
+
+    def handle_exception(self, request, exc):
+        data = exc.detail if isinstance(exc.detail, (list, dict)) else {'detail': exc.detail}
+        response = self.render(data, exc.status_code)
+        if isinstance(exc, (exceptions.NotAuthenticated, exceptions.AuthenticationFailed)):
+            response['WWW-Authenticate'] = self.authentication.authenticate_header(request)
+        return response
+
+    def render(self, data, status_code=status.HTTP_200_OK):
+        return HttpResponse(self.renderer.render(data), status=status_code, content_type='application/json')
+
+
+async def aget_or_404(klass, **kwargs):
+    # Model or QuerySet, like django.shortcuts.get_object_or_404
+    queryset = klass._default_manager.all() if hasattr(klass, '_default_manager') else klass
+    try:
+        return await queryset.aget(**kwargs)
+    except (queryset.model.DoesNotExist, DjangoValidationError):
+        raise Http404
+
+
+class AsyncEventView(AsyncReadView):
+    sync_view = views.EventView
+
+    async def get_validators(self, request):
+        filters = EventFilterSerializer(data=request.GET)
+        filters.is_valid(raise_exception=True)
+        self.queryset = filter_events(Event.objects.all(), filters.validated_data)
+        self.paginator = KeysetPagination(ordering=(filters.validated_data['ordering'], 'id'))
+        return await alist_validators(self.paginator.get_page_queryset(self.queryset, request))
+
+    async def read(self, request):
+        events = await self.paginator.apaginate_queryset(EventFastSerializer.get_queryset(self.queryset), request)
+        return {
+            'events': EventFastSerializer.serialize(events),
+            'next': self.paginator.get_next_link(),
+        }
+
+
+class AsyncEventDetailView(AsyncReadView):
+    sync_view = views.EventDetailView
+
+    async def load(self, id):
+        event = await aget_or_404(Event.objects.using(DEFAULT_DB_ALIAS).select_related('availability'), id=id)
+        data = dict(EventSerializer(event).data)
+        data['availability'] = availability_data(event)
+        return availability_version(event), data
+
+    async def get_validators(self, request, id):
+        version = await event_cache.aget_version(id)
+        if version is None:
+            version = await arow_version(Event.objects.all(), id, fields=('updated_at', 'availability__updated_at'))
+        return detail_validators(version)
+
+    async def read(self, request, id):
+        return await event_cache.aget_or_load(id, lambda: self.load(id))
+
+
+class AsyncTicketView(AsyncReadView):
+    sync_view = views.TicketView
+
+    async def get_validators(self, request):
+        return await alist_validators(KeysetPagination().get_page_queryset(Ticket.objects.all(), request))
+
+    async def read(self, request):
+        paginator = KeysetPagination()
+        tickets = await paginator.apaginate_queryset(TicketFastSerializer.get_queryset(Ticket.objects.all()), request)
+        return {
+            'tickets': TicketFastSerializer.serialize(tickets),
+            'next': paginator.get_next_link(),
+        }
+
+
+class AsyncTicketDetailView(AsyncReadView):
+    sync_view = views.TicketDetailView
+
+    async def load(self, id):
+        ticket = await aget_or_404(Ticket.objects.using(DEFAULT_DB_ALIAS).select_related('availability'), id=id)
+        data = dict(TicketSerializer(ticket).data)
+        data['availability'] = availability_data(ticket)
+        return availability_version(ticket), data
+
+    async def get_validators(self, request, id):
+        version = await ticket_cache.aget_version(id)
+        if version is None:
+            version = await arow_version(Ticket.objects.all(), id, fields=('updated_at', 'availability__updated_at'))
+        return detail_validators(version)
+
+    async def read(self, request, id):
+        return await ticket_cache.aget_or_load(id, lambda: self.load(id))
+
+
+class AsyncRegistrationView(AsyncReadView):
+    sync_view = views.RegistrationView
+    admin_only = True
+
+    async def get_validators(self, request):
+        return await alist_validators(KeysetPagination().get_page_queryset(Registration.objects.all(), request))
+
+    async def read(self, request):
+        paginator = KeysetPagination()
+        queryset = RegistrationFastSerializer.get_queryset(Registration.objects.all())
+        registrations = await paginator.apaginate_queryset(queryset, request)
+        return {
+            'registrations': RegistrationFastSerializer.serialize(registrations),
+            'next': paginator.get_next_link(),
+        }
+
+
+class AsyncRegistrationDetailView(AsyncReadView):
+    sync_view = views.RegistrationDetailView
+
+    async def get_validators(self, request, id):
+        return detail_validators(await arow_version(Registration.objects.all(), id))
+
+    async def read(self, request, id):
+        registration = await aget_or_404(Registration, id=id)
+        return RegistrationSerializer(registration).data
+
+
+ASYNC_VARIANTS = {
+    views.EventView: AsyncEventView,
+    views.EventDetailView: AsyncEventDetailView,
+    views.TicketView: AsyncTicketView,
+    views.TicketDetailView: AsyncTicketDetailView,
+    views.RegistrationView: AsyncRegistrationView,
+    views.RegistrationDetailView: AsyncRegistrationDetailView,
+}
+
+
+def read_view(view):
+    """
+    Return the view function for ``view``, using its async variant when
+    ``ASYNC_READ_VIEWS`` is enabled (ASGI deployments).
+    """
+    if settings.ASYNC_READ_VIEWS and view in ASYNC_VARIANTS:
+        return ASYNC_VARIANTS[view].as_view()
+    return view.as_view()
@@ -0,0 +1,69 @@
+from rest_framework_simplejwt.authentication import JWTAuthentication, JWTStatelessUserAuthentication
+from django.contrib.auth import get_user_model
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+
+from .roles import ROLE_ATTR, get_role_version, aget_role_version
+
+
+class StatelessJWTAuthentication(JWTStatelessUserAuthentication):
+    """
+    Authenticates from the claims of the access token instead of the user row.
+
+    Tokens issued by RoleTokenObtainPairSerializer carry the username,
+    superuser flag and group names, so ``request.user`` is a TokenUser whose
+    roles are already resolved. The ``role_version`` claim is compared with
+    the cached version of the user; any role change bumps it and old tokens
+    are rejected, as are tokens of deleted or inactive users. Tokens without
+    role claims fall back to the regular database lookup.
+    """
+
+    def has_role_claims(self, validated_token):
+        return 'role_version' in validated_token and 'roles' in validated_token
+
+    def get_user(self, validated_token):
+        if not self.has_role_claims(validated_token):
+            return JWTAuthentication.get_user(self, validated_token)
+
+        user = super().get_user(validated_token)
+        return self.check_role_version(user, validated_token, get_role_version(user.id))
+
+    def check_role_version(self, user, validated_token, current_version):
+        if current_version is None:
+            raise AuthenticationFailed('User not found or inactive', code='user_inactive')
+        if current_version != validated_token['role_version']:
+            raise AuthenticationFailed('Roles have changed, please log in again.', code='roles_changed')
+        setattr(user, ROLE_ATTR, frozenset(validated_token['roles']))
+        return user
+
+    async def aauthenticate(self, request):
+        """
+        ``authenticate`` for async views, with cache and ORM access awaited.
+        Works on a plain ``HttpRequest``.
+        """
+        header = self.get_header(request)
+        if header is None:
+            return None
+        raw_token = self.get_raw_token(header)
+        if raw_token is None:
+            return None
+        validated_token = self.get_validated_token(raw_token)
+        return await self.aget_user(validated_token), validated_token
+
+    async def aget_user(self, validated_token):
+        if self.has_role_claims(validated_token):
+            user = super().get_user(validated_token)
+            return self.check_role_version(user, validated_token, await aget_role_version(user.id))
+
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken('Token contained no recognizable user identification')
+        User = get_user_model()
+        try:
+            user = await User.objects.aget(**{api_settings.USER_ID_FIELD: user_id})
+        except User.DoesNotExist:
+            raise AuthenticationFailed('User not found', code='user_not_found')
+        if api_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+            raise AuthenticationFailed('User is inactive', code='user_inactive')
+        return user
@@ -0,0 +1,156 @@
+from django.db import transaction
+from django.db.models import Count, F, Sum
+from django.utils import timezone
+
+from .cache import touch
+from .models import Ticket, Registration, Payment, Reservation, TicketAvailability, EventAvailability
+from .payments import CONFIRMED
+
+
+COUNTERS = ('sold', 'reserved', 'revenue')
+
+
+def adjust(ticket_id, event_id, updated_at=None, **deltas):
+    """
+    Add ``deltas`` (``sold``, ``reserved``, ``revenue``) to the counters of a
+    ticket and its event with a single ``UPDATE ... SET sold = sold + n`` per
+    row, so no row is read first; a missing row is rebuilt from the source
+    tables instead.
+
+    Call inside the transaction of the write that caused the change, so the
+    counters commit or roll back with it, and as its last step: the counter
+    rows stay locked until the commit. They are always locked ticket first,
+    then event, the same order as the quota rows, so purchases can't
+    deadlock on them; the event's quota row is already held by then.
+    """
+    changes = {name: F(name) + deltas[name] for name in COUNTERS if deltas.get(name)}
+    if not changes:
+        return
+    now = updated_at or timezone.now()
+    with transaction.atomic():
+        ticket_updated = TicketAvailability.objects.filter(ticket_id=ticket_id).update(updated_at=now, **changes)
+        event_updated = EventAvailability.objects.filter(event_id=event_id).update(updated_at=now, **changes)
+        if not (ticket_updated and event_updated):
+            rebuild_availability([event_id], updated_at=now)
+        touch(tickets=[ticket_id], events=[event_id], updated_at=now)
+
+
+def confirmed_amount(payment):
+    """
+    What ``payment`` adds to revenue: its amount once confirmed, else nothing.
+    """
+    if payment is None or payment.registration_id is None or payment.payment_status != CONFIRMED:
+        return 0
+    return payment.amount_paid
+
+
+def record_revenue(registration_id, amount):
+    """
+    Add ``amount`` (negative to take it back) to the revenue of the ticket
+    the registration is for.
+    """
+    if not amount or registration_id is None:
+        return
+    row = (
+        Registration.objects
+        .filter(pk=registration_id, ticket__isnull=False)
+        .values_list('ticket_id', 'ticket__event_id')
+        .first()
+    )
+    if row is not None:
+        adjust(*row, revenue=amount)
+
+
+def record_payment_change(payment, registration_id, amount):
+    """
+    Move revenue after ``payment`` was saved. ``registration_id`` and
+    ``amount`` (from ``confirmed_amount``) are taken before the write.
+    """
+    new_amount = confirmed_amount(payment)
+    if registration_id == payment.registration_id:
+        record_revenue(registration_id, new_amount - amount)
+    else:
+        record_revenue(registration_id, -amount)
+        record_revenue(payment.registration_id, new_amount)
+
+
+def _totals(queryset, key, value=None):
+    annotation = Sum(value) if value else Count('pk')
+    return dict(queryset.values(key).annotate(total=annotation).values_list(key, 'total'))
+
+
+def rebuild_availability(event_ids, updated_at=None, batch_size=1000):
+    """
+    Recompute the counters of the given events and their tickets from
+    registrations, active holds and confirmed payments, and upsert them in
+    bulk.
+
+    Writes that bypass the incremental updates (cascading deletes of a user,
+    raw SQL) are only picked up here.
+    """
+    event_ids = list(event_ids)
+    now = updated_at or timezone.now()
+    with transaction.atomic():
+        sold = _totals(
+            Registration.objects.filter(ticket__event_id__in=event_ids), 'ticket_id'
+        )
+        reserved = _totals(
+            Reservation.objects.filter(ticket__event_id__in=event_ids, status=Reservation.HELD), 'ticket_id'
+        )
+        revenue = _totals(
+            Payment.objects.filter(registration__ticket__event_id__in=event_ids, payment_status=CONFIRMED),
+            'registration__ticket_id',
+            'amount_paid',
+        )
+
+        events = {pk: EventAvailability(event_id=pk, updated_at=now) for pk in event_ids}
+        tickets = []
+        for ticket_id, event_id in Ticket.objects.filter(event_id__in=event_ids).values_list('id', 'event_id'):
+            ticket = TicketAvailability(
+                ticket_id=ticket_id,
+                sold=sold.get(ticket_id, 0),
+                reserved=reserved.get(ticket_id, 0),
+                revenue=revenue.get(ticket_id) or 0,
+                updated_at=now,
+            )
+            tickets.append(ticket)
+            event = events[event_id]
+            for name in COUNTERS:
+                setattr(event, name, getattr(event, name) + getattr(ticket, name))
+
+        update_fields = [*COUNTERS, 'updated_at']
+        TicketAvailability.objects.bulk_create(
+            tickets, batch_size=batch_size,
+            update_conflicts=True, unique_fields=['ticket'], update_fields=update_fields,
+        )
+        EventAvailability.objects.bulk_create(
+            events.values(), batch_size=batch_size,
+            update_conflicts=True, unique_fields=['event'], update_fields=update_fields,
+        )
+        touch(tickets=[ticket.ticket_id for ticket in tickets], events=events, updated_at=now)
+    return len(events), len(tickets)
+
+
+def availability_data(obj):
+    """
+    Counters for an event or ticket detail response.
+    """
+    availability = getattr(obj, 'availability', None)
+    if availability is None:
+        return None
+    return {
+        'sold': availability.sold,
+        'reserved': availability.reserved,
+        'remaining': obj.quota,
+        'revenue': availability.revenue,
+    }
+
+
+def availability_version(obj):
+    """
+    Cache version of a detail response that embeds ``availability_data``.
+    """
+    availability = getattr(obj, 'availability', None)
+    if availability is None:
+        return obj.updated_at.isoformat()
+    return max(obj.updated_at, availability.updated_at).isoformat()
@@ -0,0 +1,96 @@
+import io
+import sys
+
+
+def percentile(sorted_values, percent):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, round(percent / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def summarize(latencies, elapsed):
+    """
+    Throughput and latency percentiles (milliseconds) for one benchmark run.
+    """
+    ordered = sorted(latencies)
+    return {
+        'requests': len(ordered),
+        'rps': len(ordered) / elapsed if elapsed else 0.0,
+        'p50': percentile(ordered, 50) * 1000,
+        'p95': percentile(ordered, 95) * 1000,
+        'p99': percentile(ordered, 99) * 1000,
+    }
+
+
+def format_summary(label, summary):
+    return (
+        f'{label:<28} {summary["rps"]:>9.0f} req/s  '
+        f'p50 {summary["p50"]:>7.2f}ms  p95 {summary["p95"]:>7.2f}ms  p99 {summary["p99"]:>7.2f}ms'
+    )
+
+
+def wsgi_environ(path, token, method='GET', body=b'', content_type='application/json'):
+    """
+    WSGI environ of an authenticated request, for benchmarks that go through
+    the full ``WSGIHandler`` (middleware, request_finished) instead of a view.
+    """
+    return {
+        'REQUEST_METHOD': method,
+        'PATH_INFO': path,
+        'QUERY_STRING': '',
+        'CONTENT_TYPE': content_type,
+        'CONTENT_LENGTH': str(len(body)),
+        'SERVER_NAME': 'localhost',
+        'SERVER_PORT': '80',
+        'SERVER_PROTOCOL': 'HTTP/1.1',
+        'HTTP_HOST': 'localhost',
+        'HTTP_AUTHORIZATION': f'Bearer {token}',
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': 'http',
+        'wsgi.input': io.BytesIO(body),
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': False,
+        'wsgi.multiprocess': False,
+        'wsgi.run_once': False,
+    }
+
+
+class Scenario:
+    """
+    One endpoint call of a benchmark suite.
+
+    ``path`` and ``data`` may be callables taking ``(fixtures, index)`` so
+    every request can target other rows or create unique ones.
+    """
+
+    def __init__(self, name, method, path, data=None, status=200):
+        self.name = name
+        self.method = method
+        self.path = path
+        self.data = data
+        self.status = status
+
+    def request(self, fixtures, index):
+        path = self.path(fixtures, index) if callable(self.path) else self.path
+        data = self.data(fixtures, index) if callable(self.data) else self.data
+        return path, data
+
+
+def compare_to_baseline(results, baseline, tolerance, min_delta):
+    """
+    Regressions of ``results`` against a stored baseline run: more queries
+    per request, or a p95 more than ``tolerance`` (a fraction) and
+    ``min_delta`` milliseconds slower. Returns a list of messages.
+    """
+    regressions = []
+    for name, result in results.items():
+        base = baseline.get(name)
+        if base is None:
+            continue
+        if result['queries'] > base['queries']:
+            regressions.append(f'{name}: {result["queries"]} queries per request, baseline {base["queries"]}')
+        slower = result['p95'] - base['p95']
+        if result['p95'] > base['p95'] * (1 + tolerance) and slower > min_delta:
+            regressions.append(f'{name}: p95 {result["p95"]:.2f}ms, baseline {base["p95"]:.2f}ms')
+    return regressions
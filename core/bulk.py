@@ -0,0 +1,91 @@
+from collections import Counter
+
+from django.db import transaction
+
+from .availability import adjust
+from .models import User, Event, Ticket, Registration, TicketAvailability
+from . import inventory
+from .reservations import take_inventory, TicketSoldOut, HOT_EVENT_MESSAGE
+
+
+def bulk_create_tickets(items, batch_size=1000):
+    """
+    Create tickets from validated ``TicketSerializer`` items.
+
+    Every referenced event is fetched with a single ``IN`` query and all rows
+    are inserted with ``bulk_create`` in one transaction. Returns
+    ``(tickets, errors)`` where ``errors`` lines up with ``items``; nothing is
+    written when any item fails.
+    """
+    errors = [{} for _ in items]
+    events = Event.objects.only('id').in_bulk({item['event_id'] for item in items})
+
+    tickets = []
+    for index, item in enumerate(items):
+        item = dict(item)
+        event = events.get(item.pop('event_id'))
+        if event is None:
+            errors[index] = {'event_id': ['Event not found.']}
+            continue
+        if inventory.is_hot(event.pk):
+            errors[index] = {'event_id': [HOT_EVENT_MESSAGE]}
+            continue
+        tickets.append(Ticket(event=event, **item))
+
+    if any(errors):
+        return [], errors
+
+    with transaction.atomic():
+        Ticket.objects.bulk_create(tickets, batch_size=batch_size)
+        TicketAvailability.objects.bulk_create(
+            [TicketAvailability(ticket=ticket) for ticket in tickets], batch_size=batch_size
+        )
+    return tickets, errors
+
+
+def bulk_create_registrations(items, batch_size=1000):
+    """
+    Create registrations from validated ``RegistrationBulkSerializer`` items.
+
+    Users and tickets are resolved with one ``IN`` query each and seats are
+    taken per ticket with a single conditional update for the whole batch.
+    Returns ``(registrations, errors)`` like ``bulk_create_tickets``.
+    """
+    errors = [{} for _ in items]
+    users = User.objects.only('id').in_bulk({item['user_id'] for item in items})
+    tickets = Ticket.objects.only('id', 'event_id').in_bulk({item['ticket_id'] for item in items})
+
+    for index, item in enumerate(items):
+        if item['user_id'] not in users:
+            errors[index]['user_id'] = ['User not found.']
+        if item['ticket_id'] not in tickets:
+            errors[index]['ticket_id'] = ['Ticket not found.']
+    if any(errors):
+        return [], errors
+
+    with transaction.atomic():
+        sold_out = set()
+        per_ticket = Counter(item['ticket_id'] for item in items)
+        for ticket_id, count in per_ticket.items():
+            try:
+                take_inventory(tickets[ticket_id], count)
+            except TicketSoldOut:
+                sold_out.add(ticket_id)
+
+        if sold_out:
+            transaction.set_rollback(True)
+            for index, item in enumerate(items):
+                if item['ticket_id'] in sold_out:
+                    errors[index]['ticket_id'] = ['Not enough seats left on this ticket.']
+            return [], errors
+
+        registrations = Registration.objects.bulk_create(
+            [
+                Registration(user=users[item['user_id']], ticket=tickets[item['ticket_id']])
+                for item in items
+            ],
+            batch_size=batch_size,
+        )
+        for ticket_id, count in per_ticket.items():
+            adjust(ticket_id, tickets[ticket_id].event_id, sold=count)
+    return registrations, errors
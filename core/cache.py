@@ -0,0 +1,261 @@
+import asyncio
+import datetime
+import threading
+import time
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+
+DELETED = '__deleted__'
+
+
+def is_newer(version, current):
+    """
+    Whether ``version`` may replace the cached ``current`` version: versions
+    are ``updated_at`` isoformat strings and a tombstone is final.
+    """
+    if current is None or version == DELETED:
+        return current != DELETED
+    if current == DELETED:
+        return False
+    return datetime.datetime.fromisoformat(version) > datetime.datetime.fromisoformat(current)
+
+
+class ReadThroughCache:
+    """
+    Cache serialized objects keyed by primary key and ``updated_at`` version.
+
+    ``<prefix>:<pk>:version`` holds the current version of an object and
+    ``<prefix>:<pk>:<version>`` its payload. Signals publish the new version
+    whenever the row changes, so readers never see a payload older than the
+    last write. A version only ever moves forward: publishes (from commit
+    callbacks, which may run out of order, or from a slow loader) compare
+    with the cached one under a short lock in the cache. Concurrent misses
+    on the same key are collapsed into a single recompute.
+    """
+    lock_timeout = 5
+    poll_interval = 0.02
+    lock_stripes = 64
+
+    def __init__(self, prefix, timeout=None):
+        self.prefix = prefix
+        self.timeout = timeout
+        self.hits = 0
+        self.misses = 0
+        self._stats_lock = threading.Lock()
+        self._locks = [threading.Lock() for _ in range(self.lock_stripes)]
+
+    def get_timeout(self):
+        return self.timeout if self.timeout is not None else settings.DETAIL_CACHE_TIMEOUT
+
+    def version_key(self, pk):
+        return f'{self.prefix}:{pk}:version'
+
+    def data_key(self, pk, version):
+        return f'{self.prefix}:{pk}:{version}'
+
+    def lock_key(self, pk):
+        return f'{self.prefix}:{pk}:lock'
+
+    def publish_key(self, pk):
+        return f'{self.prefix}:{pk}:publish'
+
+    def normalize(self, pk):
+        return str(uuid.UUID(str(pk)))
+
+    def get_or_load(self, pk, loader):
+        """
+        Return the cached payload for ``pk`` or build it with ``loader``.
+
+        ``loader`` returns a ``(version, data)`` pair and may raise (e.g.
+        ``Http404``); errors are never cached.
+        """
+        try:
+            pk = self.normalize(pk)
+        except ValueError:
+            return loader()[1]
+
+        data = self._lookup(pk)
+        if data is not None:
+            self._count(hit=True)
+            return data
+
+        self._count(hit=False)
+        with self._local_lock(pk):
+            # Another thread may have filled the cache while we waited.
+            data = self._lookup(pk)
+            if data is not None:
+                return data
+            if not cache.add(self.lock_key(pk), 1, self.lock_timeout):
+                data = self._wait_for_other_process(pk)
+                if data is not None:
+                    return data
+            try:
+                version, data = loader()
+                timeout = self.get_timeout()
+                cache.set(self.data_key(pk, version), data, timeout)
+                self._publish(pk, version)
+                return data
+            finally:
+                cache.delete(self.lock_key(pk))
+
+    async def aget_or_load(self, pk, loader):
+        """
+        ``get_or_load`` for async views; ``loader`` is a coroutine function.
+        Concurrent misses are collapsed through the shared cache lock only.
+        """
+        try:
+            pk = self.normalize(pk)
+        except ValueError:
+            return (await loader())[1]
+
+        data = await self._alookup(pk)
+        if data is not None:
+            self._count(hit=True)
+            return data
+
+        self._count(hit=False)
+        if not await cache.aadd(self.lock_key(pk), 1, self.lock_timeout):
+            deadline = time.monotonic() + self.lock_timeout
+            while time.monotonic() < deadline:
+                await asyncio.sleep(self.poll_interval)
+                data = await self._alookup(pk)
+                if data is not None:
+                    return data
+                if await cache.aadd(self.lock_key(pk), 1, self.lock_timeout):
+                    break
+        try:
+            version, data = await loader()
+            timeout = self.get_timeout()
+            await cache.aset(self.data_key(pk, version), data, timeout)
+            await self._apublish(pk, version)
+            return data
+        finally:
+            await cache.adelete(self.lock_key(pk))
+
+    def get_version(self, pk):
+        """
+        The cached version of ``pk``, or ``None`` when unknown or deleted.
+        """
+        try:
+            version = cache.get(self.version_key(self.normalize(pk)))
+        except ValueError:
+            return None
+        return None if version == DELETED else version
+
+    async def aget_version(self, pk):
+        try:
+            version = await cache.aget(self.version_key(self.normalize(pk)))
+        except ValueError:
+            return None
+        return None if version == DELETED else version
+
+    def set_version(self, pk, version):
+        self._publish(self.normalize(pk), version)
+
+    def invalidate(self, pk):
+        # Tombstone instead of delete, so an in-flight load can't re-add the old version.
+        self.set_version(pk, DELETED)
+
+    def stats(self):
+        with self._stats_lock:
+            total = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': round(self.hits / total, 4) if total else 0.0,
+            }
+
+    def _publish(self, pk, version):
+        # Compare-and-set; the lock makes the read and the write one step
+        deadline = time.monotonic() + self.lock_timeout
+        locked = cache.add(self.publish_key(pk), 1, self.lock_timeout)
+        while not locked and time.monotonic() < deadline:
+            time.sleep(self.poll_interval)
+            locked = cache.add(self.publish_key(pk), 1, self.lock_timeout)
+        try:
+            if is_newer(version, cache.get(self.version_key(pk))):
+                cache.set(self.version_key(pk), version, self.get_timeout())
+        finally:
+            if locked:
+                cache.delete(self.publish_key(pk))
+
+    async def _apublish(self, pk, version):
+        deadline = time.monotonic() + self.lock_timeout
+        locked = await cache.aadd(self.publish_key(pk), 1, self.lock_timeout)
+        while not locked and time.monotonic() < deadline:
+            await asyncio.sleep(self.poll_interval)
+            locked = await cache.aadd(self.publish_key(pk), 1, self.lock_timeout)
+        try:
+            if is_newer(version, await cache.aget(self.version_key(pk))):
+                await cache.aset(self.version_key(pk), version, self.get_timeout())
+        finally:
+            if locked:
+                await cache.adelete(self.publish_key(pk))
+
+    def _lookup(self, pk):
+        version = cache.get(self.version_key(pk))
+        if version is None or version == DELETED:
+            return None
+        return cache.get(self.data_key(pk, version))
+
+    async def _alookup(self, pk):
+        version = await cache.aget(self.version_key(pk))
+        if version is None or version == DELETED:
+            return None
+        return await cache.aget(self.data_key(pk, version))
+
+    def _wait_for_other_process(self, pk):
+        deadline = time.monotonic() + self.lock_timeout
+        while time.monotonic() < deadline:
+            time.sleep(self.poll_interval)
+            data = self._lookup(pk)
+            if data is not None:
+                return data
+            if cache.add(self.lock_key(pk), 1, self.lock_timeout):
+                return None
+        return None
+
+    def _local_lock(self, pk):
+        return self._locks[hash(pk) % self.lock_stripes]
+
+    def _count(self, hit):
+        with self._stats_lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+
+event_cache = ReadThroughCache('event-detail')
+ticket_cache = ReadThroughCache('ticket-detail')
+
+
+def cache_stats():
+    return {
+        'events': event_cache.stats(),
+        'tickets': ticket_cache.stats(),
+    }
+
+
+def touch(tickets=(), events=(), updated_at=None):
+    """
+    Publish a new version for rows changed with ``QuerySet.update()``.
+
+    Bulk updates skip ``post_save``, so callers that write ``updated_at``
+    themselves call this to move the cached versions forward once the
+    transaction commits.
+    """
+    version = updated_at.isoformat()
+    tickets, events = list(tickets), list(events)
+
+    def publish():
+        for pk in tickets:
+            ticket_cache.set_version(pk, version)
+        for pk in events:
+            event_cache.set_version(pk, version)
+
+    transaction.on_commit(publish)
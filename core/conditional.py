@@ -0,0 +1,88 @@
+import datetime
+import hashlib
+
+from django.core.exceptions import ValidationError
+from django.http import Http404
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
+
+
+def make_etag(*parts):
+    digest = hashlib.md5(':'.join(str(part) for part in parts).encode(), usedforsecurity=False).hexdigest()
+    return f'"{digest}"'
+
+
+class Validators:
+    """
+    ETag and Last-Modified of a response, computed before the body is built.
+
+    Call ``not_modified()`` first and only serialize when it returns
+    ``None``; ``apply()`` adds the headers to either response.
+    """
+
+    def __init__(self, etag, last_modified=None):
+        self.etag = etag
+        self.last_modified = last_modified
+
+    def not_modified(self, request):
+        return get_conditional_response(request, etag=self.etag, last_modified=self.last_modified)
+
+    def apply(self, response):
+        response['ETag'] = self.etag
+        if self.last_modified is not None:
+            response['Last-Modified'] = http_date(self.last_modified)
+        # Clients may keep a copy but must revalidate it on every use
+        patch_cache_control(response, private=True, no_cache=True)
+        return response
+
+
+def detail_validators(version):
+    """
+    Validators of a detail response from its ``updated_at`` version string.
+    """
+    modified = datetime.datetime.fromisoformat(version)
+    return Validators(make_etag(version), int(modified.timestamp()))
+
+
+def _version(row):
+    if row is None:
+        raise Http404
+    return max(value for value in row if value is not None).isoformat()
+
+
+def row_version(queryset, pk, fields=('updated_at',)):
+    """
+    Newest of ``fields`` for one row, read with a single primary key lookup.
+    """
+    try:
+        return _version(queryset.filter(pk=pk).values_list(*fields).first())
+    except ValidationError:
+        raise Http404
+
+
+async def arow_version(queryset, pk, fields=('updated_at',)):
+    try:
+        return _version(await queryset.filter(pk=pk).values_list(*fields).afirst())
+    except ValidationError:
+        raise Http404
+
+
+def _list_validators(rows):
+    # Deletes don't move max(updated_at), so the ETag covers which rows are
+    # on the page and only it is used to validate lists.
+    return Validators(make_etag(*(f'{pk}@{updated_at.isoformat()}' for pk, updated_at in rows)))
+
+
+def list_validators(page):
+    """
+    Validators of a list page from the ids and ``updated_at`` of its rows.
+
+    ``page`` is the bounded page queryset (``page_size + 1`` rows, the extra
+    one decides the next link), so the cost doesn't grow with the table and
+    the ordering index serves it like the page itself.
+    """
+    return _list_validators(page.values_list('pk', 'updated_at'))
+
+
+async def alist_validators(page):
+    return _list_validators([row async for row in page.values_list('pk', 'updated_at')])
@@ -0,0 +1,102 @@
+import csv
+import datetime
+import json
+import uuid
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+
+from .models import Registration
+
+
+# (header, column) pairs; one row per registration, payment columns are empty without a payment
+REGISTRATION_EXPORT_COLUMNS = (
+    ('registration_id', 'id'),
+    ('registered_at', 'created_at'),
+    ('user_id', 'user_id'),
+    ('username', 'user__username'),
+    ('email', 'user__email'),
+    ('first_name', 'user__first_name'),
+    ('last_name', 'user__last_name'),
+    ('ticket_id', 'ticket_id'),
+    ('ticket_name', 'ticket__name'),
+    ('ticket_type', 'ticket__type'),
+    ('ticket_price', 'ticket__price'),
+    ('payment_id', 'payment__id'),
+    ('payment_method', 'payment__payment_method'),
+    ('payment_status', 'payment__payment_status'),
+    ('amount_paid', 'payment__amount_paid'),
+    ('payment_confirmed_at', 'payment__confirmed_at'),
+)
+
+EXPORT_CONTENT_TYPES = {
+    'csv': 'text/csv; charset=utf-8',
+    'ndjson': 'application/x-ndjson',
+}
+
+
+def export_registrations(event_id, chunk_size=None):
+    """
+    Yield one tuple per registration of the event, joined with its user,
+    ticket and payment in a single query.
+
+    Rows are read with ``iterator()`` (a server-side cursor on PostgreSQL), so
+    only ``chunk_size`` rows are held in memory at a time.
+    """
+    queryset = (
+        Registration.objects
+        .filter(ticket__event_id=event_id)
+        .order_by('created_at', 'id')
+        .values_list(*[column for _, column in REGISTRATION_EXPORT_COLUMNS])
+    )
+    return queryset.iterator(chunk_size=chunk_size or settings.EXPORT_CHUNK_SIZE)
+
+
+def _batches(rows, size):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+class _Echo:
+    # csv.writer target that hands each line back instead of buffering it
+    def write(self, value):
+        return value
+
+
+def stream_csv(rows, batch_size=None):
+    """
+    Encode rows from ``export_registrations`` as CSV, a batch of lines per chunk.
+    """
+    encoder = DjangoJSONEncoder()
+    writer = csv.writer(_Echo())
+
+    def convert(value):
+        if isinstance(value, (datetime.datetime, uuid.UUID)):
+            return encoder.default(value)
+        return value
+
+    yield writer.writerow([header for header, _ in REGISTRATION_EXPORT_COLUMNS])
+    for batch in _batches(rows, batch_size or settings.EXPORT_CHUNK_SIZE):
+        yield ''.join(writer.writerow([convert(value) for value in row]) for row in batch)
+
+
+def stream_ndjson(rows, batch_size=None):
+    """
+    Encode rows from ``export_registrations`` as newline-delimited JSON objects.
+    """
+    headers = [header for header, _ in REGISTRATION_EXPORT_COLUMNS]
+    encoder = DjangoJSONEncoder()
+    for batch in _batches(rows, batch_size or settings.EXPORT_CHUNK_SIZE):
+        yield ''.join(encoder.encode(dict(zip(headers, row))) + '\n' for row in batch)
+
+
+STREAMERS = {
+    'csv': stream_csv,
+    'ndjson': stream_ndjson,
+}
@@ -0,0 +1,148 @@
+from django.conf import settings
+from django.db import models
+from django.utils import timezone
+from rest_framework.settings import ISO_8601, api_settings
+
+from .metrics import timed_serialization
+from .models import Event, Ticket, Registration, Payment
+
+
+def _uuid(value):
+    return str(value)
+
+
+def _datetime_converter():
+    """
+    Mirror ``rest_framework.fields.DateTimeField.to_representation`` for
+    aware values read from the database.
+    """
+    output_format = api_settings.DATETIME_FORMAT
+    field_timezone = timezone.get_current_timezone() if settings.USE_TZ else None
+
+    if output_format is None:
+        return None
+
+    def convert(value):
+        if field_timezone is not None:
+            value = value.astimezone(field_timezone)
+        if output_format.lower() != ISO_8601:
+            return value.strftime(output_format)
+        text = value.isoformat()
+        if text.endswith('+00:00'):
+            text = text[:-6] + 'Z'
+        return text
+
+    return convert
+
+
+class FastReadSerializer:
+    """
+    Read-only serializer for flat list rows.
+
+    Rows are fetched with ``values_list(named=True)`` and turned into dicts
+    with one converter per column, picked once from the model field type,
+    instead of instantiating and walking DRF fields for every row. The output
+    renders to the same JSON as the matching ``ModelSerializer``.
+
+    ``fields`` is a sequence of ``(output key, column)`` pairs in the order
+    of the ``ModelSerializer`` output.
+    """
+    model = None
+    fields = ()
+
+    @classmethod
+    def columns(cls):
+        return [column for _, column in cls.fields]
+
+    @classmethod
+    def get_queryset(cls, queryset):
+        return queryset.values_list(*cls.columns(), named=True)
+
+    @classmethod
+    def get_converters(cls):
+        datetime = _datetime_converter()
+        converters = []
+        for _, column in cls.fields:
+            field = cls.model._meta.get_field(column)
+            if isinstance(field, (models.UUIDField, models.ForeignKey)):
+                converters.append(_uuid)
+            elif isinstance(field, models.DateTimeField):
+                converters.append(datetime)
+            else:
+                converters.append(None)
+        return converters
+
+    @classmethod
+    @timed_serialization
+    def serialize(cls, rows):
+        keys = [key for key, _ in cls.fields]
+        converters = cls.get_converters()
+        converted = [
+            (index, convert) for index, convert in enumerate(converters) if convert is not None
+        ]
+        data = []
+        for row in rows:
+            values = list(row)
+            for index, convert in converted:
+                value = values[index]
+                if value is not None:
+                    values[index] = convert(value)
+            data.append(dict(zip(keys, values)))
+        return data
+
+
+class EventFastSerializer(FastReadSerializer):
+    model = Event
+    fields = (
+        ('id', 'id'),
+        ('name', 'name'),
+        ('description', 'description'),
+        ('location', 'location'),
+        ('status', 'status'),
+        ('category', 'category'),
+        ('quota', 'quota'),
+        ('start_time', 'start_time'),
+        ('end_time', 'end_time'),
+        ('created_at', 'created_at'),
+        ('updated_at', 'updated_at'),
+    )
+
+
+class TicketFastSerializer(FastReadSerializer):
+    model = Ticket
+    fields = (
+        ('id', 'id'),
+        ('event', 'event_id'),
+        ('name', 'name'),
+        ('type', 'type'),
+        ('price', 'price'),
+        ('quota', 'quota'),
+        ('sales_start', 'sales_start'),
+        ('sales_end', 'sales_end'),
+        ('created_at', 'created_at'),
+        ('updated_at', 'updated_at'),
+    )
+
+
+class RegistrationFastSerializer(FastReadSerializer):
+    model = Registration
+    fields = (
+        ('id', 'id'),
+        ('created_at', 'created_at'),
+        ('updated_at', 'updated_at'),
+        ('user', 'user_id'),
+        ('ticket', 'ticket_id'),
+    )
+
+
+class PaymentFastSerializer(FastReadSerializer):
+    model = Payment
+    fields = (
+        ('id', 'id'),
+        ('registration', 'registration_id'),
+        ('payment_method', 'payment_method'),
+        ('payment_status', 'payment_status'),
+        ('amount_paid', 'amount_paid'),
+        ('created_at', 'created_at'),
+        ('updated_at', 'updated_at'),
+    )
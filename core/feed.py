@@ -0,0 +1,251 @@
+import bisect
+import json
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+from django.utils import timezone
+
+from .conditional import Validators, make_etag
+from .fast_serializers import EventFastSerializer
+from .models import Event
+from .pagination import KeysetPagination
+from .renderers import JSONRenderer
+
+
+# Bumped when Snapshot changes shape, so old and new workers don't share one
+PREFIX = 'feed:upcoming:v2'
+VERSION_KEY = f'{PREFIX}:version'
+LOCK_KEY = f'{PREFIX}:lock'
+# Set when a change couldn't be patched in, the next reader rebuilds
+DIRTY_KEY = f'{PREFIX}:dirty'
+
+
+def data_key(version):
+    return f'{PREFIX}:{version}'
+
+
+class Snapshot:
+    """
+    The upcoming published events, ordered by ``(start_time, id)``.
+
+    ``rows`` are the events already rendered to JSON, so a page is a slice
+    joined into the response body; ``keys`` are their ``(start_time, id)``
+    sort keys for bisecting, ``cursors`` their pagination cursors.
+
+    ``truncated`` snapshots hold only the first ``FEED_MAX_EVENTS`` events;
+    pages past them are read from the database.
+    """
+
+    def __init__(self, version, built_at, keys, rows, cursors, truncated):
+        self.version = version
+        self.built_at = built_at
+        self.keys = keys
+        self.rows = rows
+        self.cursors = cursors
+        self.truncated = truncated
+
+    def page(self, after, size, now):
+        """
+        ``(start, rows, next cursor)`` of the ``size`` events after the
+        cursor key ``after``, skipping events that started since the snapshot
+        was built.
+        """
+        start = bisect.bisect_left(self.keys, (now, ''))
+        if after is not None:
+            start = max(start, bisect.bisect_right(self.keys, after))
+        end = start + size
+        rows = self.rows[start:end]
+        more = end < len(self.rows)
+        return start, rows, self.cursors[end - 1] if more else None
+
+    def without(self, event_ids):
+        keep = [index for index, (_, pk) in enumerate(self.keys) if pk not in event_ids]
+        return (
+            [self.keys[index] for index in keep],
+            [self.rows[index] for index in keep],
+            [self.cursors[index] for index in keep],
+        )
+
+
+_renderer = JSONRenderer()
+_paginator = KeysetPagination(ordering=('start_time', 'id'))
+
+
+def sort_key(start_time, pk):
+    # Lowercase hex compares like the database orders UUIDs
+    return start_time, str(pk)
+
+
+def load_rows(queryset):
+    """
+    ``(keys, rendered rows, cursors)`` of the events in ``queryset``, in order.
+    """
+    rows = list(EventFastSerializer.get_queryset(queryset))
+    data = EventFastSerializer.serialize(rows)
+    return (
+        [sort_key(row.start_time, row.id) for row in rows],
+        [_renderer.render(item) for item in data],
+        [_paginator.encode_cursor(row) for row in rows],
+    )
+
+
+def published_upcoming(queryset):
+    return queryset.filter(status='PUBLISHED', start_time__gte=timezone.now()).order_by('start_time', 'id')
+
+
+def upcoming_events():
+    # Primary: a rebuild right after a write must see that write
+    return published_upcoming(Event.objects.using(DEFAULT_DB_ALIAS))
+
+
+def read_past(snapshot, after, rows, size):
+    """
+    ``(rows, next cursor)`` of a page that runs past the end of a truncated
+    snapshot: ``rows`` from the snapshot topped up by a keyset query for the
+    events after its last one (or after the cursor, when further).
+    """
+    boundary = snapshot.keys[-1] if after is None else max(after, snapshot.keys[-1])
+    needed = size - len(rows)
+    queryset = published_upcoming(Event.objects.all()).filter(_paginator.get_keyset_filter(boundary))
+    _, extra, cursors = load_rows(queryset[:needed + 1])
+    if len(extra) <= needed:
+        return rows + extra, None
+    return rows + extra[:needed], cursors[needed - 1] if needed else snapshot.cursors[-1]
+
+
+def store(snapshot):
+    timeout = settings.FEED_CACHE_TIMEOUT
+    cache.set(data_key(snapshot.version), snapshot, timeout)
+    cache.set(VERSION_KEY, snapshot.version, timeout)
+    _local.snapshot, _local.checked = snapshot, time.monotonic()
+
+
+def rebuild():
+    """
+    Build the snapshot from the database (one query) and publish it.
+    """
+    limit = settings.FEED_MAX_EVENTS
+    # Before the query: a change committed while it runs marks the feed dirty again
+    cache.delete(DIRTY_KEY)
+    keys, rows, cursors = load_rows(upcoming_events()[:limit + 1])
+    snapshot = Snapshot(time.time_ns(), time.time(), keys[:limit], rows[:limit], cursors[:limit], len(keys) > limit)
+    store(snapshot)
+    return snapshot
+
+
+def update(event_ids):
+    """
+    Patch the changed events into the published snapshot with one query
+    for just those rows, instead of rebuilding it.
+
+    Writers are serialized through the cache lock; when it is busy (another
+    update or a rebuild that may have read the old rows) the feed is marked
+    dirty and the next reader rebuilds it.
+    """
+    event_ids = {str(pk) for pk in event_ids}
+    if not cache.add(LOCK_KEY, 1, settings.FEED_LOCK_TIMEOUT):
+        cache.set(DIRTY_KEY, True, settings.FEED_CACHE_TIMEOUT)
+        return
+    try:
+        version = cache.get(VERSION_KEY)
+        current = cache.get(data_key(version)) if version is not None else None
+        if current is None:
+            return
+        keys, rows, cursors = current.without(event_ids)
+        for key, row, cursor in zip(*load_rows(upcoming_events().filter(pk__in=event_ids))):
+            # Past the end of a truncated snapshot the event isn't in the top N
+            if current.truncated and keys and key > keys[-1]:
+                continue
+            index = bisect.bisect_left(keys, key)
+            keys.insert(index, key)
+            rows.insert(index, row)
+            cursors.insert(index, cursor)
+        limit = settings.FEED_MAX_EVENTS
+        truncated = current.truncated or len(keys) > limit
+        store(Snapshot(time.time_ns(), current.built_at, keys[:limit], rows[:limit], cursors[:limit], truncated))
+    finally:
+        cache.delete(LOCK_KEY)
+
+
+class LocalCopy(threading.local):
+    snapshot = None
+    dirty = False
+    checked = 0.0
+
+
+# Per thread, so no locking on the read path
+_local = LocalCopy()
+
+
+def current():
+    """
+    The snapshot to serve, from process memory.
+
+    The shared version is checked at most every ``FEED_LOCAL_SECONDS``. A
+    snapshot older than ``FEED_REFRESH_SECONDS`` is rebuilt by whichever
+    reader takes the lock while the others keep serving it; only a cold
+    cache makes readers wait.
+    """
+    now = time.monotonic()
+    snapshot = _local.snapshot
+    if snapshot is None or now - _local.checked >= settings.FEED_LOCAL_SECONDS:
+        shared = cache.get_many([VERSION_KEY, DIRTY_KEY])
+        version = shared.get(VERSION_KEY)
+        if snapshot is None or snapshot.version != version:
+            snapshot = cache.get(data_key(version)) if version is not None else None
+        _local.snapshot, _local.dirty, _local.checked = snapshot, DIRTY_KEY in shared, now
+    if (
+        snapshot is not None and not _local.dirty
+        and time.time() - snapshot.built_at < settings.FEED_REFRESH_SECONDS
+    ):
+        return snapshot
+    if cache.add(LOCK_KEY, 1, settings.FEED_LOCK_TIMEOUT):
+        try:
+            _local.dirty = False
+            return rebuild()
+        finally:
+            cache.delete(LOCK_KEY)
+    if snapshot is not None:
+        return snapshot
+    # Cold cache and another process is building it
+    deadline = now + settings.FEED_LOCK_TIMEOUT
+    while time.monotonic() < deadline:
+        time.sleep(0.02)
+        version = cache.get(VERSION_KEY)
+        snapshot = cache.get(data_key(version)) if version is not None else None
+        if snapshot is not None:
+            _local.snapshot, _local.checked = snapshot, time.monotonic()
+            return snapshot
+    return rebuild()
+
+
+def render_page(request):
+    """
+    ``(body, validators)`` of one feed page for ``request``; the body is
+    built from pre-rendered rows without touching the database, except for
+    pages past the end of a truncated snapshot.
+    """
+    snapshot = current()
+    size = _paginator.get_page_size(request)
+    cursor = _paginator.decode_cursor(request, Event)
+    after = sort_key(*cursor) if cursor is not None else None
+    start, rows, next_cursor = snapshot.page(after, size, timezone.now())
+    past = next_cursor is None and snapshot.truncated and snapshot.keys
+    if past:
+        rows, next_cursor = read_past(snapshot, after, rows, size)
+    paginator = KeysetPagination(ordering=_paginator.ordering)
+    paginator.request, paginator.next_cursor = request, next_cursor
+    body = b''.join([
+        b'{"events":[', b','.join(rows), b'],"next":', json.dumps(paginator.get_next_link()).encode(), b'}',
+    ])
+    if past:
+        # Rows read from the database aren't covered by the snapshot version;
+        # the rendered rows carry their id and updated_at
+        validators = Validators(make_etag(after, size, body.decode()))
+    else:
+        # The version is the publish time in ns; start covers both the cursor and events that started
+        validators = Validators(make_etag(snapshot.version, start, size), snapshot.version // 10**9)
+    return body, validators
@@ -0,0 +1,49 @@
+from django.conf import settings
+from django.contrib.auth import hashers
+
+
+# Same algorithm names as Django's hashers, so existing hashes still verify
+# and hashes made with other parameters are upgraded on the next login.
+# Costs are read from settings on use (override_settings applies) and never
+# drop below Django's own defaults.
+
+class Argon2PasswordHasher(hashers.Argon2PasswordHasher):
+    """
+    Argon2id, needs ``argon2-cffi``.
+    """
+
+    @property
+    def time_cost(self):
+        return max(settings.PASSWORD_ARGON2_TIME_COST, hashers.Argon2PasswordHasher.time_cost)
+
+    @property
+    def memory_cost(self):
+        return max(settings.PASSWORD_ARGON2_MEMORY_COST, hashers.Argon2PasswordHasher.memory_cost)
+
+    @property
+    def parallelism(self):
+        return max(settings.PASSWORD_ARGON2_PARALLELISM, hashers.Argon2PasswordHasher.parallelism)
+
+
+class ScryptPasswordHasher(hashers.ScryptPasswordHasher):
+    # hashlib refuses more than 32 MiB unless told otherwise
+    maxmem = 256 * 1024 * 1024
+
+    @property
+    def work_factor(self):
+        return max(settings.PASSWORD_SCRYPT_WORK_FACTOR, hashers.ScryptPasswordHasher.work_factor)
+
+    @property
+    def block_size(self):
+        return max(settings.PASSWORD_SCRYPT_BLOCK_SIZE, hashers.ScryptPasswordHasher.block_size)
+
+    @property
+    def parallelism(self):
+        return max(settings.PASSWORD_SCRYPT_PARALLELISM, hashers.ScryptPasswordHasher.parallelism)
+
+
+class PBKDF2PasswordHasher(hashers.PBKDF2PasswordHasher):
+
+    @property
+    def iterations(self):
+        return max(settings.PASSWORD_PBKDF2_ITERATIONS, hashers.PBKDF2PasswordHasher.iterations)
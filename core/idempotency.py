@@ -0,0 +1,179 @@
+import hashlib
+import json
+import threading
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.module_loading import import_string
+from rest_framework import exceptions, status
+from rest_framework.response import Response
+
+
+HEADER = 'HTTP_IDEMPOTENCY_KEY'
+MAX_KEY_LENGTH = 255
+
+
+class IdempotencyKeyReused(exceptions.APIException):
+    status_code = status.HTTP_422_UNPROCESSABLE_ENTITY
+    default_detail = 'This Idempotency-Key was used with a different request.'
+    default_code = 'idempotency_key_reused'
+
+
+class RequestInProgress(exceptions.APIException):
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = 'A request with this Idempotency-Key is still in progress, retry shortly.'
+    default_code = 'request_in_progress'
+
+
+class LocalIdempotencyStore:
+    """
+    Records in process memory, for tests and single-process runs. Waiters
+    are woken as soon as the first request finishes.
+    """
+
+    def __init__(self):
+        self._changed = threading.Condition()
+        self._records = {}
+
+    def _get(self, key, now):
+        record, expires = self._records.get(key, (None, 0))
+        if record is not None and expires <= now:
+            del self._records[key]
+            return None
+        return record
+
+    def claim(self, key, record, ttl):
+        with self._changed:
+            existing = self._get(key, time.monotonic())
+            if existing is not None:
+                return existing
+            self._records[key] = (record, time.monotonic() + ttl)
+            return None
+
+    def wait(self, key, timeout):
+        with self._changed:
+            record = self._get(key, time.monotonic())
+            if record is not None and 'status' not in record:
+                self._changed.wait(timeout)
+
+    def set(self, key, record, ttl):
+        with self._changed:
+            self._records[key] = (record, time.monotonic() + ttl)
+            self._changed.notify_all()
+
+    def delete(self, key):
+        with self._changed:
+            self._records.pop(key, None)
+            self._changed.notify_all()
+
+    def clear(self):
+        with self._changed:
+            self._records.clear()
+
+
+class CacheIdempotencyStore:
+    """
+    Records in the default cache, shared by every worker when the cache is.
+    ``cache.add`` makes claiming a key atomic; waiters poll.
+    """
+    key_prefix = 'idempotency'
+    poll_interval = 0.05
+
+    def claim(self, key, record, ttl):
+        key = f'{self.key_prefix}:{key}'
+        while not cache.add(key, record, ttl):
+            existing = cache.get(key)
+            # Otherwise it expired or was released between the two calls
+            if existing is not None:
+                return existing
+        return None
+
+    def wait(self, key, timeout):
+        time.sleep(min(timeout, self.poll_interval))
+
+    def set(self, key, record, ttl):
+        cache.set(f'{self.key_prefix}:{key}', record, ttl)
+
+    def delete(self, key):
+        cache.delete(f'{self.key_prefix}:{key}')
+
+
+_stores = {}
+
+
+def get_store():
+    path = settings.IDEMPOTENCY_STORE
+    if path not in _stores:
+        _stores[path] = import_string(path)()
+    return _stores[path]
+
+
+def fingerprint(request):
+    """
+    Hash of what the request asks for, so a key reused for another request
+    is refused instead of replaying the wrong response.
+    """
+    body = json.dumps(request.data, sort_keys=True, default=str)
+    return hashlib.sha256(f'{request.method} {request.path}\n{body}'.encode()).hexdigest()
+
+
+def replay(record):
+    response = Response(record['data'], status=record['status'])
+    for header, value in record['headers']:
+        response[header] = value
+    response['Idempotent-Replayed'] = 'true'
+    return response
+
+
+def idempotent(method):
+    """
+    Honour an ``Idempotency-Key`` header on an APIView handler.
+
+    The first request with a key runs and, when it succeeds (2xx), its
+    response is kept for ``IDEMPOTENCY_TTL`` seconds; retries with the same
+    key and body get that response back without running the handler.
+    Duplicates arriving while the first is still running wait up to
+    ``IDEMPOTENCY_WAIT_TIMEOUT`` seconds for it instead of running twice.
+    Failed requests release the key so a retry runs again. Keys are scoped
+    per user and path.
+    """
+    @wraps(method)
+    def wrapper(self, request, *args, **kwargs):
+        key = request.META.get(HEADER)
+        if not key:
+            return method(self, request, *args, **kwargs)
+        if len(key) > MAX_KEY_LENGTH:
+            raise exceptions.ValidationError({'Idempotency-Key': f'At most {MAX_KEY_LENGTH} characters.'})
+        store = get_store()
+        key = f'{request.user.pk}:{request.path}:{key}'
+        digest = fingerprint(request)
+        deadline = time.monotonic() + settings.IDEMPOTENCY_WAIT_TIMEOUT
+        # The lock TTL frees the key if this worker dies mid-request
+        while (record := store.claim(key, {'fingerprint': digest}, settings.IDEMPOTENCY_LOCK_TTL)) is not None:
+            if record['fingerprint'] != digest:
+                raise IdempotencyKeyReused()
+            if 'status' in record:
+                return replay(record)
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise RequestInProgress()
+            store.wait(key, remaining)
+
+        try:
+            response = method(self, request, *args, **kwargs)
+        except BaseException:
+            store.delete(key)
+            raise
+        if status.is_success(response.status_code) and not response.streaming:
+            store.set(key, {
+                'fingerprint': digest,
+                'status': response.status_code,
+                'data': response.data,
+                'headers': [(header, value) for header, value in response.items() if header.lower() != 'content-type'],
+            }, settings.IDEMPOTENCY_TTL)
+        else:
+            store.delete(key)
+        return response
+    return wrapper
@@ -0,0 +1,607 @@
+import json
+import logging
+import threading
+import time
+import uuid
+from collections import Counter, deque
+from datetime import datetime
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .availability import adjust
+from .cache import touch
+from .models import User, Event, Ticket, Registration
+
+
+logger = logging.getLogger('core.inventory')
+
+# take() results
+NOT_HOT = -1
+SOLD_OUT = 0
+TAKEN = 1
+
+
+class LocalInventoryStore:
+    """
+    Counter store in process memory, for tests and single-process runs.
+
+    Same operations and atomicity as ``RedisInventoryStore``: ``take``
+    checks and decrements the ticket and event counters in one step.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._clear()
+
+    def _clear(self):
+        self.tickets = {}
+        self.events = {}
+        self.event_tickets = {}
+        self.journal = deque()
+        self.processing = deque()
+        self.owner = None
+        self.owner_expires = 0
+
+    def load(self, ticket_id, event_id, ticket_quota, event_quota):
+        with self._lock:
+            self.tickets[ticket_id] = [ticket_quota, event_id]
+            tickets = self.event_tickets.setdefault(event_id, set())
+            if not tickets:
+                self.events[event_id] = event_quota
+            tickets.add(ticket_id)
+
+    def unload(self, ticket_id):
+        with self._lock:
+            _, event_id = self.tickets.pop(ticket_id, (None, None))
+            tickets = self.event_tickets.get(event_id, set())
+            tickets.discard(ticket_id)
+            if not tickets:
+                self.event_tickets.pop(event_id, None)
+                self.events.pop(event_id, None)
+
+    def hot_tickets(self):
+        with self._lock:
+            return {ticket_id: event_id for ticket_id, (_, event_id) in self.tickets.items()}
+
+    def remaining(self, ticket_id):
+        with self._lock:
+            entry = self.tickets.get(ticket_id)
+            return None if entry is None else (entry[0], self.events[entry[1]])
+
+    def is_hot_event(self, event_id):
+        with self._lock:
+            return event_id in self.events
+
+    def take(self, ticket_id, count=1):
+        with self._lock:
+            entry = self.tickets.get(ticket_id)
+            if entry is None:
+                return NOT_HOT
+            if entry[0] < count or self.events[entry[1]] < count:
+                return SOLD_OUT
+            entry[0] -= count
+            self.events[entry[1]] -= count
+            return TAKEN
+
+    def append(self, item):
+        with self._lock:
+            self.journal.append(item)
+
+    def give(self, ticket_id, count=1):
+        with self._lock:
+            entry = self.tickets.get(ticket_id)
+            if entry is not None:
+                entry[0] += count
+                self.events[entry[1]] += count
+
+    def cap(self, ticket_id, ticket_quota, event_quota):
+        with self._lock:
+            entry = self.tickets.get(ticket_id)
+            if entry is not None:
+                entry[0] = min(entry[0], ticket_quota)
+                self.events[entry[1]] = min(self.events[entry[1]], event_quota)
+
+    def claim(self, count):
+        with self._lock:
+            items = [self.journal.popleft() for _ in range(min(count, len(self.journal)))]
+            self.processing.extend(items)
+            return items
+
+    def lock(self, owner, ttl):
+        with self._lock:
+            now = time.monotonic()
+            if self.owner not in (None, owner) and self.owner_expires > now:
+                return False
+            self.owner, self.owner_expires = owner, now + ttl
+            return True
+
+    def unlock(self, owner):
+        with self._lock:
+            if self.owner == owner:
+                self.owner = None
+
+    def ack(self, count, owner):
+        with self._lock:
+            if self.owner != owner:
+                return
+            for _ in range(count):
+                self.processing.popleft()
+
+    def recover(self):
+        with self._lock:
+            self.journal.extendleft(reversed(self.processing))
+            self.processing.clear()
+
+    def pending(self):
+        with self._lock:
+            return len(self.journal) + len(self.processing)
+
+    def clear(self):
+        with self._lock:
+            self._clear()
+
+
+# Check-and-decrement of both counters, atomic in Redis
+_TAKE = """
+local ticket = redis.call('GET', KEYS[1])
+local event_id = redis.call('GET', KEYS[2])
+if not ticket or not event_id then return -1 end
+local event_key = ARGV[3] .. event_id
+local count = tonumber(ARGV[1])
+if tonumber(ticket) < count or tonumber(redis.call('GET', event_key) or '-1') < count then return 0 end
+redis.call('DECRBY', KEYS[1], count)
+redis.call('DECRBY', event_key, count)
+return 1
+"""
+
+_GIVE = """
+local event_id = redis.call('GET', KEYS[2])
+if not event_id or not redis.call('GET', KEYS[1]) then return 0 end
+redis.call('INCRBY', KEYS[1], ARGV[1])
+redis.call('INCRBY', ARGV[2] .. event_id, ARGV[1])
+return 1
+"""
+
+# Lower both counters to at most the given values, never raise them
+_CAP = """
+local event_id = redis.call('GET', KEYS[2])
+if not event_id or not redis.call('GET', KEYS[1]) then return 0 end
+if tonumber(redis.call('GET', KEYS[1])) > tonumber(ARGV[1]) then redis.call('SET', KEYS[1], ARGV[1]) end
+local event_key = ARGV[3] .. event_id
+if tonumber(redis.call('GET', event_key) or '0') > tonumber(ARGV[2]) then redis.call('SET', event_key, ARGV[2]) end
+return 1
+"""
+
+_CLAIM = """
+local items = {}
+for i = 1, tonumber(ARGV[1]) do
+  local item = redis.call('LMOVE', KEYS[1], KEYS[2], 'LEFT', 'RIGHT')
+  if not item then break end
+  items[i] = item
+end
+return items
+"""
+
+# Only the holder of the flusher lock may release it or drop what it claimed
+_UNLOCK = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then redis.call('DEL', KEYS[1]) end
+"""
+
+_ACK = """
+if redis.call('GET', KEYS[1]) ~= ARGV[1] then return 0 end
+redis.call('LTRIM', KEYS[2], ARGV[2], -1)
+return 1
+"""
+
+_RECOVER = """
+local moved = 0
+while true do
+  local item = redis.call('RPOP', KEYS[2])
+  if not item then return moved end
+  redis.call('LPUSH', KEYS[1], item)
+  moved = moved + 1
+end
+"""
+
+
+class RedisInventoryStore:
+    """
+    Counter store shared by every worker, in Redis (needs ``redis-py``).
+
+    Enable AOF persistence: the journal holds purchases that are not in the
+    database yet.
+    """
+    prefix = 'inventory'
+
+    def __init__(self):
+        import redis
+
+        self.redis = redis.Redis.from_url(settings.HOT_INVENTORY_REDIS_URL, decode_responses=True)
+        self._take = self.redis.register_script(_TAKE)
+        self._give = self.redis.register_script(_GIVE)
+        self._cap = self.redis.register_script(_CAP)
+        self._claim = self.redis.register_script(_CLAIM)
+        self._recover = self.redis.register_script(_RECOVER)
+        self._unlock = self.redis.register_script(_UNLOCK)
+        self._ack = self.redis.register_script(_ACK)
+
+    def key(self, *parts):
+        return ':'.join([self.prefix, *map(str, parts)])
+
+    def load(self, ticket_id, event_id, ticket_quota, event_quota):
+        pipe = self.redis.pipeline()
+        pipe.set(self.key('ticket', ticket_id), ticket_quota)
+        pipe.set(self.key('ticket-event', ticket_id), str(event_id))
+        pipe.set(self.key('event', event_id), event_quota, nx=True)
+        pipe.sadd(self.key('event-tickets', event_id), str(ticket_id))
+        pipe.sadd(self.key('hot'), str(ticket_id))
+        pipe.execute()
+
+    def unload(self, ticket_id):
+        event_id = self.redis.get(self.key('ticket-event', ticket_id))
+        pipe = self.redis.pipeline()
+        pipe.delete(self.key('ticket', ticket_id), self.key('ticket-event', ticket_id))
+        pipe.srem(self.key('hot'), str(ticket_id))
+        if event_id is not None:
+            pipe.srem(self.key('event-tickets', event_id), str(ticket_id))
+        pipe.execute()
+        if event_id is not None and not self.redis.scard(self.key('event-tickets', event_id)):
+            self.redis.delete(self.key('event', event_id))
+
+    def hot_tickets(self):
+        tickets = sorted(self.redis.smembers(self.key('hot')))
+        events = self.redis.mget([self.key('ticket-event', ticket_id) for ticket_id in tickets]) if tickets else []
+        return {uuid.UUID(ticket_id): uuid.UUID(event_id) for ticket_id, event_id in zip(tickets, events) if event_id}
+
+    def remaining(self, ticket_id):
+        event_id = self.redis.get(self.key('ticket-event', ticket_id))
+        if event_id is None:
+            return None
+        ticket, event = self.redis.mget(self.key('ticket', ticket_id), self.key('event', event_id))
+        return int(ticket), int(event)
+
+    def is_hot_event(self, event_id):
+        return bool(self.redis.exists(self.key('event', event_id)))
+
+    def take(self, ticket_id, count=1):
+        keys = [self.key('ticket', ticket_id), self.key('ticket-event', ticket_id)]
+        return int(self._take(keys=keys, args=[count, self.key('event', '')]))
+
+    def append(self, item):
+        self.redis.rpush(self.key('journal'), item)
+
+    def give(self, ticket_id, count=1):
+        self._give(keys=[self.key('ticket', ticket_id), self.key('ticket-event', ticket_id)], args=[count, self.key('event', '')])
+
+    def cap(self, ticket_id, ticket_quota, event_quota):
+        keys = [self.key('ticket', ticket_id), self.key('ticket-event', ticket_id)]
+        self._cap(keys=keys, args=[ticket_quota, event_quota, self.key('event', '')])
+
+    def claim(self, count):
+        return self._claim(keys=[self.key('journal'), self.key('processing')], args=[count])
+
+    def lock(self, owner, ttl):
+        key = self.key('flusher')
+        if self.redis.set(key, owner, nx=True, ex=ttl):
+            return True
+        return self.redis.get(key) == owner and bool(self.redis.expire(key, ttl))
+
+    def unlock(self, owner):
+        self._unlock(keys=[self.key('flusher')], args=[owner])
+
+    def ack(self, count, owner):
+        self._ack(keys=[self.key('flusher'), self.key('processing')], args=[owner, count])
+
+    def recover(self):
+        self._recover(keys=[self.key('journal'), self.key('processing')])
+
+    def pending(self):
+        return self.redis.llen(self.key('journal')) + self.redis.llen(self.key('processing'))
+
+
+_stores = {}
+
+
+def get_store():
+    """
+    The configured ``HOT_INVENTORY_STORE``, ``None`` when hot inventory is off.
+    """
+    path = settings.HOT_INVENTORY_STORE
+    if not path:
+        return None
+    if path not in _stores:
+        _stores[path] = import_string(path)()
+    return _stores[path]
+
+
+def is_hot(event_id):
+    """
+    Whether the seats of the event are sold from the counter store, so its
+    quotas may only change through it.
+    """
+    store = get_store()
+    return store is not None and store.is_hot_event(event_id)
+
+
+def purchase(user, ticket):
+    """
+    Sell one seat of a hot ticket from the counter store.
+
+    Returns the new, not yet saved ``Registration``; the row, the quota
+    decrements and the availability counters are written by ``flush()``.
+    Returns ``None`` when the ticket isn't hot, so the caller takes the
+    database path.
+
+    The purchase is journaled once the caller's transaction commits; if it
+    rolls back, ``settle()`` gives the seat back like for ``take()``.
+    """
+    store = get_store()
+    if store is None:
+        return None
+    settle()
+    registration = Registration(id=uuid.uuid4(), user=user, ticket=ticket)
+    registration.created_at = registration.updated_at = timezone.now()
+    item = json.dumps({
+        'id': str(registration.pk),
+        'user': str(user.pk),
+        'ticket': str(ticket.pk),
+        'event': str(ticket.event_id),
+        'created_at': registration.created_at.isoformat(),
+    })
+    result = store.take(ticket.pk)
+    if result == NOT_HOT:
+        return None
+    if result == SOLD_OUT:
+        from .reservations import TicketSoldOut
+        raise TicketSoldOut()
+    _track(ticket.pk, 1, lambda: store.append(item))
+    return registration
+
+
+class Uncommitted(threading.local):
+    """
+    Seats this thread took from the counters in transactions that haven't
+    committed yet, by token; a commit removes its entries.
+    """
+
+    def __init__(self):
+        self.seats = {}
+
+
+_uncommitted = Uncommitted()
+
+
+def take(ticket, count=1):
+    """
+    Take seats of a hot ticket from the counters before the database path
+    takes them from the rows (holds). ``False`` when the ticket isn't hot.
+
+    Call inside the transaction that takes them from the rows. If it rolls
+    back, ``settle()`` gives the seats back.
+    """
+    store = get_store()
+    if store is None:
+        return False
+    settle()
+    result = store.take(ticket.pk, count)
+    if result == SOLD_OUT:
+        from .reservations import TicketSoldOut
+        raise TicketSoldOut()
+    if result != TAKEN:
+        return False
+    _track(ticket.pk, count)
+    return True
+
+
+def _track(ticket_id, count, committed=None):
+    token = object()
+    _uncommitted.seats[token] = (ticket_id, count)
+
+    def commit():
+        _uncommitted.seats.pop(token, None)
+        if committed is not None:
+            committed()
+
+    transaction.on_commit(commit)
+
+
+def settle(**kwargs):
+    """
+    Give back the seats ``take()`` took in transactions of this thread that
+    rolled back: once no transaction is open, any entry its commit didn't
+    remove never committed. Runs at the end of every request (a
+    ``request_finished`` receiver) and before each take.
+    """
+    if not _uncommitted.seats or transaction.get_connection().in_atomic_block:
+        return
+    seats, _uncommitted.seats = _uncommitted.seats, {}
+    store = get_store()
+    for ticket_id, count in seats.values():
+        store.give(ticket_id, count)
+
+
+def give(ticket_id, count=1):
+    """
+    Put returned seats back into the counters once the transaction commits.
+    """
+    store = get_store()
+    if store is not None:
+        transaction.on_commit(lambda: store.give(ticket_id, count))
+
+
+def take_quota(model, pk, count, now):
+    """
+    Take ``count`` from the quota of a row with the usual ``quota >= count``
+    guard. When the guard fails the purchases were sold anyway, so the quota
+    is floored at zero instead of going negative; returns ``False`` then.
+    """
+    if model.objects.filter(pk=pk, quota__gte=count).update(quota=F('quota') - count, updated_at=now):
+        return True
+    model.objects.filter(pk=pk).update(quota=0, updated_at=now)
+    return False
+
+
+def flush(batch_size=None, wait=False):
+    """
+    Write one batch of journaled purchases to the database and return its size.
+
+    Only one flusher works at a time, under a lock in the store. When
+    another one holds it this returns 0, or with ``wait`` waits its turn.
+    Items still claimed when the lock is taken were left by a flusher that
+    died or failed mid-batch and are put back first.
+
+    Rows already present (a batch that committed before a crash) are
+    skipped, so replaying the journal is safe. Purchases whose user was
+    deleted in the meantime are dropped and their seats given back, those
+    whose ticket was deleted are dropped.
+
+    The quotas are taken with the same guard as the database path. If the
+    rows have fewer seats than the counters sold (they drifted apart), the
+    quota stops at zero, the oversale is logged and the counters of the
+    ticket are lowered to the rows so no more seats are sold.
+    """
+    store = get_store()
+    if store is None:
+        return 0
+    owner = uuid.uuid4().hex
+    while not store.lock(owner, settings.HOT_INVENTORY_FLUSH_LOCK_TTL):
+        if not wait:
+            return 0
+        time.sleep(0.05)
+    try:
+        store.recover()
+        return _flush(store, owner, batch_size)
+    finally:
+        store.unlock(owner)
+
+
+def _flush(store, owner, batch_size):
+    items = [json.loads(item) for item in store.claim(batch_size or settings.HOT_INVENTORY_FLUSH_BATCH)]
+    if not items:
+        return 0
+    now = timezone.now()
+    with transaction.atomic():
+        ids = [uuid.UUID(item['id']) for item in items]
+        existing = set(Registration.objects.filter(pk__in=ids).values_list('pk', flat=True))
+        users = set(User.objects.filter(pk__in={item['user'] for item in items}).values_list('pk', flat=True))
+        tickets = set(Ticket.objects.filter(pk__in={item['ticket'] for item in items}).values_list('pk', flat=True))
+        registrations, purchased, dropped, orphaned = [], [], Counter(), Counter()
+        for item in items:
+            if uuid.UUID(item['id']) in existing:
+                continue
+            if uuid.UUID(item['ticket']) not in tickets:
+                orphaned[item['ticket']] += 1
+                continue
+            if uuid.UUID(item['user']) not in users:
+                dropped[item['ticket']] += 1
+                continue
+            registrations.append(Registration(id=item['id'], user_id=item['user'], ticket_id=item['ticket']))
+            # Journals written before purchases carried their time fall back to now
+            purchased.append(datetime.fromisoformat(item['created_at']) if 'created_at' in item else now)
+        Registration.objects.bulk_create(registrations)
+        # created_at is auto_now_add, so bulk_create stamped the flush time; put the purchase time back
+        for registration, created_at in zip(registrations, purchased):
+            registration.created_at = created_at
+        Registration.objects.bulk_update(registrations, ['created_at'])
+
+        per_ticket = Counter(str(registration.ticket_id) for registration in registrations)
+        events = {item['ticket']: item['event'] for item in items}
+        per_event = Counter()
+        for ticket_id, count in per_ticket.items():
+            per_event[events[ticket_id]] += count
+        short = set()
+        for ticket_id, count in per_ticket.items():
+            if not take_quota(Ticket, ticket_id, count, now):
+                short.add(ticket_id)
+        for event_id, count in per_event.items():
+            if not take_quota(Event, event_id, count, now):
+                short.update(ticket_id for ticket_id in per_ticket if events[ticket_id] == event_id)
+        # Counters last, after the quota rows, in the order purchases lock them
+        for ticket_id, count in per_ticket.items():
+            adjust(ticket_id, events[ticket_id], updated_at=now, sold=count)
+        touch(tickets=per_ticket, events=per_event, updated_at=now)
+    # A flusher that outlived its lock doesn't ack; the next one replays the batch and skips the rows
+    store.ack(len(items), owner)
+    for ticket_id, count in dropped.items():
+        logger.warning('Dropped %d hot purchase(s) of ticket %s, the user no longer exists', count, ticket_id)
+        store.give(uuid.UUID(ticket_id), count)
+    for ticket_id, count in orphaned.items():
+        logger.warning('Dropped %d hot purchase(s) of ticket %s, the ticket no longer exists', count, ticket_id)
+    if short:
+        logger.error('Hot tickets %s sold more seats than the database had, lowering their counters', sorted(short))
+        for ticket_id, ticket_quota, event_quota in Ticket.objects.filter(pk__in=short).values_list('id', 'quota', 'event__quota'):
+            store.cap(ticket_id, ticket_quota, event_quota)
+    return len(items)
+
+
+def drain(batch_size=None):
+    flushed = 0
+    while True:
+        handled = flush(batch_size, wait=True)
+        if not handled:
+            return flushed
+        flushed += handled
+
+
+def enable(ticket_id):
+    """
+    Serve a ticket, and every other ticket of its event, from the counter
+    store, starting from their database quotas.
+
+    The whole event moves at once: the event counter must see every sale of
+    the event, and a ticket left on the database path would sell from
+    ``Event.quota`` behind its back. Do it before the sale opens; a
+    database-path purchase racing with this call is not seen by the
+    counters. Tickets can't be added to the event or change quota until it
+    is disabled.
+    """
+    store = get_store()
+    with transaction.atomic():
+        event_id = Ticket.objects.values_list('event_id', flat=True).get(pk=ticket_id)
+        event = Event.objects.select_for_update().get(pk=event_id)
+        for ticket in Ticket.objects.select_for_update().filter(event_id=event_id).order_by('pk'):
+            store.load(ticket.pk, event.pk, ticket.quota, event.quota)
+
+
+def disable(ticket_id):
+    """
+    Send a ticket and the rest of its event back to the database path and
+    write their pending purchases.
+    """
+    store = get_store()
+    event_id = Ticket.objects.values_list('event_id', flat=True).filter(pk=ticket_id).first()
+    hot = store.hot_tickets()
+    for hot_ticket_id, hot_event_id in hot.items():
+        if hot_ticket_id == ticket_id or hot_event_id == event_id:
+            store.unload(hot_ticket_id)
+    return drain()
+
+
+def reconcile():
+    """
+    Crash recovery: write the whole journal, including purchases a dead
+    flusher had claimed, then reload every hot ticket's counters from the
+    database. Run with sales of the hot tickets paused (e.g. before the
+    workers start), since a purchase in flight would be counted twice.
+    Returns ``(flushed, tickets)``.
+    """
+    store = get_store()
+    flushed = drain()
+    hot = store.hot_tickets()
+    for ticket_id in hot:
+        store.unload(ticket_id)
+    # enable() loads the whole event, one ticket of each is enough
+    events = set()
+    for ticket_id, event_id in hot.items():
+        if event_id in events:
+            continue
+        try:
+            enable(ticket_id)
+        except Ticket.DoesNotExist:
+            continue
+        events.add(event_id)
+    return flushed, len(store.hot_tickets())
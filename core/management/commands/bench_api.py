@@ -0,0 +1,233 @@
+import datetime
+import gc
+import json
+import platform
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.auth.models import Group
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from core import feed, waiting_room
+from core.analytics import rollup_events
+from core.benchmark import Scenario, summarize, format_summary, compare_to_baseline
+from core.models import Event, Ticket, Registration, Payment
+from core.reservations import hold_ticket
+from core.seed import seed_volume, delete_dataset
+from core.serializers import RoleTokenObtainPairSerializer
+
+
+DEFAULT_BASELINE = Path(settings.BASE_DIR) / 'benchmarks' / 'baseline.json'
+
+
+def _ticket(fixtures, index):
+    start = timezone.now()
+    return {
+        'event_id': fixtures['event'], 'name': f'bench {index}', 'type': 'REGULAR', 'price': 50000,
+        'quota': 100, 'sales_start': start.isoformat(), 'sales_end': (start + datetime.timedelta(days=1)).isoformat(),
+    }
+
+
+# Every route of core/urls.py; writes create new rows, updates and deletes
+# are left out so the dataset stays the same for every scenario.
+SCENARIOS = [
+    Scenario('events list', 'get', '/api/events/'),
+    Scenario('events search', 'get', '/api/events/?status=PUBLISHED&category=TECH&ordering=start_time'),
+    Scenario('events create', 'post', '/api/events/', lambda f, i: {
+        'name': f'{f["prefix"]} bench {i}', 'description': 'Benchmark event', 'location': 'Jakarta', 'status': 'DRAFT',
+        'quota': 100, 'start_time': f['start'], 'end_time': f['end'], 'organizer_id': f['admin'],
+    }, status=201),
+    Scenario('events upcoming', 'get', '/api/events/upcoming/'),
+    Scenario('events upcoming page 2', 'get', lambda f, i: f'/api/events/upcoming/?cursor={f["feed_cursor"]}'),
+    Scenario('events detail', 'get', lambda f, i: f'/api/events/{f["event"]}'),
+    Scenario('events export csv', 'get', lambda f, i: f'/api/events/{f["event"]}/registrations.csv'),
+    Scenario('events stats', 'get', lambda f, i: f'/api/events/{f["event"]}/stats/'),
+    Scenario('organizer stats', 'get', lambda f, i: f'/api/organizers/{f["admin"]}/stats/'),
+    Scenario('registrations list', 'get', '/api/registrations/'),
+    Scenario('registrations create', 'post', '/api/registrations/', lambda f, i: {
+        'user_id': f['users'][i % len(f['users'])], 'ticket_id': f['ticket'],
+    }, status=201),
+    Scenario('registrations bulk', 'post', '/api/registrations/bulk/', lambda f, i: [
+        {'user_id': user, 'ticket_id': f['ticket']} for user in f['users'][:10]
+    ], status=201),
+    Scenario('registrations detail', 'get', lambda f, i: f'/api/registrations/{f["registration"]}'),
+    Scenario('reservations create', 'post', '/api/reservations/', lambda f, i: {'ticket_id': f['ticket']}, status=201),
+    Scenario('reservations detail', 'get', lambda f, i: f'/api/reservations/{f["reservation"]}'),
+    Scenario('queue join', 'post', '/api/queue/', lambda f, i: {'ticket_id': f['queued_ticket']}, status=201),
+    Scenario('queue status', 'get', lambda f, i: f'/api/queue/{f["queue_token"]}'),
+    Scenario('tickets list', 'get', '/api/tickets/'),
+    Scenario('tickets create', 'post', '/api/tickets/', _ticket, status=201),
+    Scenario('tickets bulk', 'post', '/api/tickets/bulk/', lambda f, i: [_ticket(f, n) for n in range(10)], status=201),
+    Scenario('tickets detail', 'get', lambda f, i: f'/api/tickets/{f["ticket"]}'),
+    Scenario('payments list', 'get', '/api/payments/'),
+    Scenario('payments create', 'post', '/api/payments/', lambda f, i: {
+        'registration_id': f['unpaid'][i], 'payment_method': 'TRANSFER', 'payment_status': 'PENDING', 'amount_paid': 0,
+    }, status=201),
+    Scenario('payments detail', 'get', lambda f, i: f'/api/payments/{f["payment"]}'),
+    Scenario('register', 'post', '/api/register/', lambda f, i: {
+        'username': f'{f["prefix"]}-signup-{i}', 'email': f'signup-{i}@example.com', 'password': 'B3nchmark-pass',
+    }, status=201),
+    Scenario('groups list', 'get', '/api/groups/'),
+    Scenario('groups detail', 'get', lambda f, i: f'/api/groups/{f["group"]}'),
+    Scenario('assign roles', 'post', '/api/assign-roles/', lambda f, i: {
+        'user_id': f['users'][i % len(f['users'])], 'group_id': f['group'],
+    }, status=201),
+    Scenario('cache stats', 'get', '/api/cache-stats/'),
+    Scenario('metrics', 'get', '/api/metrics/'),
+    Scenario('users list', 'get', '/api/users/'),
+    Scenario('users detail', 'get', lambda f, i: f'/api/users/{f["users"][0]}'),
+]
+
+
+class Command(BaseCommand):
+    help = (
+        'Seed a production-like dataset and drive every endpoint of core/urls.py '
+        'in-process through the full middleware stack, reporting req/s, p50/p95/p99 '
+        'and queries per request. --save-baseline stores the results, --compare '
+        'fails when a later run has more queries or a slower p95 than the baseline.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=2000)
+        parser.add_argument('--events', type=int, default=500)
+        parser.add_argument('--tickets-per-event', type=int, default=3)
+        parser.add_argument('--registrations', type=int, default=20000)
+        parser.add_argument('--requests', type=int, default=100, help='Measured requests per scenario.')
+        parser.add_argument('--warmup', type=int, default=5, help='Unmeasured requests per scenario.')
+        parser.add_argument('--only', action='append', default=[], help='Run scenarios whose name contains this.')
+        parser.add_argument('--save-baseline', nargs='?', const=str(DEFAULT_BASELINE), metavar='PATH')
+        parser.add_argument('--compare', nargs='?', const=str(DEFAULT_BASELINE), metavar='PATH')
+        parser.add_argument('--tolerance', type=float, default=0.25, help='Allowed p95 slowdown as a fraction.')
+        parser.add_argument('--min-delta', type=float, default=1.0, help='Ignore p95 slowdowns below this many ms.')
+
+    def handle(self, *args, **options):
+        baseline = None
+        if options['compare']:
+            try:
+                baseline = json.loads(Path(options['compare']).read_text())
+            except FileNotFoundError:
+                raise CommandError(f'No baseline at {options["compare"]}, run with --save-baseline first.')
+
+        scenarios = [
+            scenario for scenario in SCENARIOS
+            if not options['only'] or any(part in scenario.name for part in options['only'])
+        ]
+        started = time.perf_counter()
+        admin = seed_volume(
+            options['users'], options['events'], options['tickets_per_event'], options['registrations'],
+            prefix='bench-api',
+        )
+        self.stdout.write(f'seeded in {time.perf_counter() - started:.1f}s')
+        # Measure the endpoints, not the rate limits; queues live in process
+        limits = override_settings(
+            ALLOWED_HOSTS=['testserver'], RATE_LIMITS={},
+            WAITING_ROOM_STORE='core.waiting_room.LocalWaitingRoomStore',
+        )
+        limits.enable()
+        group = Group.objects.create(name=f'{admin.username}-group')
+        results = {}
+        try:
+            fixtures = self.fixtures(admin, group, options['warmup'] + options['requests'])
+            client = APIClient()
+            client.credentials(HTTP_AUTHORIZATION=f'Bearer {fixtures["token"]}')
+            for scenario in scenarios:
+                results[scenario.name] = self.run(client, scenario, fixtures, options)
+        finally:
+            limits.disable()
+            group.delete()
+            delete_dataset(admin)
+
+        if options['save_baseline']:
+            path = Path(options['save_baseline'])
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_text(json.dumps({'meta': self.meta(options), 'scenarios': results}, indent=2) + '\n')
+            self.stdout.write(f'baseline saved to {path}')
+        if baseline is not None:
+            if baseline.get('meta', {}).get('volumes') != self.meta(options)['volumes']:
+                self.stderr.write('Baseline was recorded with other volumes, timings may not compare.')
+            regressions = compare_to_baseline(results, baseline['scenarios'], options['tolerance'], options['min_delta'])
+            for message in regressions:
+                self.stdout.write(self.style.ERROR(message))
+            if regressions:
+                raise CommandError(f'{len(regressions)} regression(s) against {options["compare"]}')
+            self.stdout.write(self.style.SUCCESS('No regressions against the baseline.'))
+
+    def fixtures(self, admin, group, count):
+        event = Event.objects.filter(organizer=admin, tickets__isnull=False).order_by('start_time').first()
+        ticket = Ticket.objects.filter(event=event).first()
+        # Room for every registration and hold the write scenarios make
+        Ticket.objects.filter(pk=ticket.pk).update(quota=ticket.quota + 10 * count + 1000)
+        Event.objects.filter(pk=event.pk).update(quota=event.quota + 10 * count + 1000)
+        users = [str(pk) for pk in admin.__class__.objects.filter(username__startswith=f'{admin.username}-').values_list('pk', flat=True)[:100]]
+        registration = Registration.objects.filter(ticket__event__organizer=admin, payment__isnull=False).first()
+        unpaid = Registration.objects.bulk_create([Registration(user_id=users[0], ticket=ticket) for _ in range(count)])
+        reservation = hold_ticket(admin, ticket)
+        start = timezone.now() + datetime.timedelta(days=30)
+        rollup_events([event.pk])
+        # A queue on another ticket, so the purchase scenarios aren't gated
+        queued_ticket = Ticket.objects.filter(event__organizer=admin).exclude(pk=ticket.pk).first()
+        waiting_room.get_store().clear()
+        waiting_room.open_queue(queued_ticket.pk, [queued_ticket.pk])
+        return {
+            'prefix': admin.username,
+            'token': str(RoleTokenObtainPairSerializer.get_token(admin).access_token),
+            'admin': str(admin.pk),
+            'users': users,
+            'event': str(event.pk),
+            'ticket': str(ticket.pk),
+            'registration': str(registration.pk),
+            'payment': str(Payment.objects.get(registration=registration).pk),
+            'unpaid': [str(registration.pk) for registration in unpaid],
+            'reservation': str(reservation.pk),
+            'queued_ticket': str(queued_ticket.pk),
+            'queue_token': waiting_room.join(admin, queued_ticket.pk)['token'],
+            'feed_cursor': feed.rebuild().cursors[0],
+            'group': group.pk,
+            'start': start.isoformat(),
+            'end': (start + datetime.timedelta(hours=2)).isoformat(),
+        }
+
+    def run(self, client, scenario, fixtures, options):
+        latencies = []
+        queries = 0
+        # Don't bill the previous scenario's garbage to this one
+        gc.collect()
+        for index in range(options['warmup'] + options['requests']):
+            path, data = scenario.request(fixtures, index)
+            with CaptureQueriesContext(connection) as context:
+                start = time.perf_counter()
+                if scenario.method == 'get':
+                    response = client.get(path)
+                else:
+                    response = getattr(client, scenario.method)(path, data, format='json')
+                # Consume streaming bodies, they run their queries while iterating
+                response.getvalue()
+                elapsed = time.perf_counter() - start
+            if response.status_code != scenario.status:
+                raise CommandError(
+                    f'{scenario.name}: {scenario.method.upper()} {path} returned {response.status_code}, '
+                    f'expected {scenario.status}: {response.getvalue()[:500]!r}'
+                )
+            if index >= options['warmup']:
+                latencies.append(elapsed)
+                queries = max(queries, len(context))
+        summary = summarize(latencies, sum(latencies))
+        summary['queries'] = queries
+        self.stdout.write(f'{format_summary(scenario.name, summary)}  {queries:>3} queries')
+        return summary
+
+    def meta(self, options):
+        return {
+            'volumes': {
+                name: options[name] for name in ('users', 'events', 'tickets_per_event', 'registrations', 'requests')
+            },
+            'database': connection.vendor,
+            'python': platform.python_version(),
+            'recorded_at': timezone.now().isoformat(),
+        }
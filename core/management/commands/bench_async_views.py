@@ -0,0 +1,97 @@
+import asyncio
+import threading
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import RequestFactory, AsyncRequestFactory, override_settings
+
+from core import views
+from core.async_views import ASYNC_VARIANTS
+from core.benchmark import summarize, format_summary
+from core.models import Event
+from core.seed import seed_dataset, delete_dataset
+from core.serializers import RoleTokenObtainPairSerializer
+
+
+class Command(BaseCommand):
+    help = (
+        'Load the event list and detail GETs through the sync DRF views (WSGI '
+        'path) and their async variants (ASGI path) and compare req/s and p99.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=500)
+        parser.add_argument('--requests', type=int, default=2000)
+        parser.add_argument('--concurrency', type=int, default=32)
+
+    def handle(self, *args, **options):
+        admin = seed_dataset(options['rows'], prefix='bench-async')
+        # Request factories always send Host: testserver
+        allowed_hosts = override_settings(ALLOWED_HOSTS=['testserver'])
+        allowed_hosts.enable()
+        try:
+            token = str(RoleTokenObtainPairSerializer.get_token(admin).access_token)
+            event_id = str(Event.objects.filter(organizer=admin).values_list('id', flat=True).first())
+            cases = [
+                ('events list', views.EventView, '/api/events/', {}),
+                ('events detail', views.EventDetailView, f'/api/events/{event_id}', {'id': event_id}),
+            ]
+            for label, view, path, kwargs in cases:
+                sync = self.run_sync(view.as_view(), path, kwargs, token, options)
+                self.stdout.write(format_summary(f'{label} (sync)', sync))
+                view_async = ASYNC_VARIANTS[view].as_view()
+                result = asyncio.run(self.run_async(view_async, path, kwargs, token, options))
+                self.stdout.write(format_summary(f'{label} (async)', result))
+        finally:
+            allowed_hosts.disable()
+            delete_dataset(admin)
+
+    def get_headers(self, token):
+        return {'Authorization': f'Bearer {token}'}
+
+    def run_sync(self, view, path, kwargs, token, options):
+        factory = RequestFactory()
+        headers = self.get_headers(token)
+        remaining = iter(range(options['requests']))
+        latencies = []
+        lock = threading.Lock()
+
+        def worker():
+            try:
+                while True:
+                    with lock:
+                        if next(remaining, None) is None:
+                            return
+                    started = time.perf_counter()
+                    response = view(factory.get(path, headers=headers), **kwargs)
+                    response.render()
+                    elapsed = time.perf_counter() - started
+                    with lock:
+                        latencies.append(elapsed)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=worker) for _ in range(options['concurrency'])]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return summarize(latencies, time.perf_counter() - started)
+
+    async def run_async(self, view, path, kwargs, token, options):
+        factory = AsyncRequestFactory()
+        headers = self.get_headers(token)
+        semaphore = asyncio.Semaphore(options['concurrency'])
+        latencies = []
+
+        async def one():
+            async with semaphore:
+                started = time.perf_counter()
+                await view(factory.get(path, headers=headers), **kwargs)
+                latencies.append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(one() for _ in range(options['requests'])))
+        return summarize(latencies, time.perf_counter() - started)
@@ -0,0 +1,55 @@
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from core.models import User, Event
+
+
+class Command(BaseCommand):
+    help = 'Compare creating tickets one POST at a time against a single bulk POST.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=10000)
+
+    def handle(self, *args, **options):
+        rows = options['rows']
+        now = timezone.now()
+        organizer = User.objects.create(username=f'bench-{now.timestamp()}', is_superuser=True)
+        event = Event.objects.create(
+            name='bench', description='', location='', status='PUBLISHED',
+            quota=rows, start_time=now, end_time=now + timedelta(hours=1),
+            organizer=organizer,
+        )
+        client = APIClient(SERVER_NAME='localhost')
+        client.force_authenticate(organizer)
+        payload = [
+            {
+                'name': f'tier {i}', 'price': 0, 'quota': 1, 'event_id': str(event.id),
+                'sales_start': now.isoformat(), 'sales_end': (now + timedelta(hours=1)).isoformat(),
+            }
+            for i in range(rows)
+        ]
+
+        try:
+            started = time.perf_counter()
+            for item in payload:
+                client.post('/api/tickets/', item, format='json')
+            single = time.perf_counter() - started
+
+            event.tickets.all().delete()
+
+            started = time.perf_counter()
+            response = client.post('/api/tickets/bulk/', payload, format='json')
+            bulk = time.perf_counter() - started
+            if response.status_code != 201:
+                self.stderr.write(str(response.data))
+
+            self.stdout.write(f'rows={rows}')
+            self.stdout.write(f'per-request: {single:.3f}s ({rows / single:.0f} rows/s)')
+            self.stdout.write(f'bulk:        {bulk:.3f}s ({rows / bulk:.0f} rows/s)')
+            self.stdout.write(f'speedup:     {single / bulk:.1f}x')
+        finally:
+            organizer.delete()
@@ -0,0 +1,81 @@
+import time
+
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.db.backends.signals import connection_created
+from django.test import override_settings
+
+from core.benchmark import summarize, format_summary, wsgi_environ
+from core.seed import seed_dataset, delete_dataset
+from core.serializers import RoleTokenObtainPairSerializer
+
+
+class Command(BaseCommand):
+    help = (
+        'Send requests through the full WSGI handler, so connections are opened and '
+        'closed exactly as in production, and report how many database connections '
+        'were opened with the configured CONN_MAX_AGE versus closing after every request.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=500)
+        parser.add_argument('--path', default='/api/events/')
+
+    def handle(self, *args, **options):
+        admin = seed_dataset(10, prefix='bench-conn')
+        allowed_hosts = override_settings(ALLOWED_HOSTS=['localhost'])
+        allowed_hosts.enable()
+        connection_created.connect(self.count_connection)
+        configured = connection.settings_dict['CONN_MAX_AGE']
+        try:
+            token = str(RoleTokenObtainPairSerializer.get_token(admin).access_token)
+            handler = WSGIHandler()
+            if 'pool' in connection.settings_dict['OPTIONS']:
+                # A pool needs CONN_MAX_AGE=0; connections are handed back instead of closed
+                cases = [('pool', 0)]
+            else:
+                cases = [(f'CONN_MAX_AGE={configured}', configured)]
+                if configured != 0:
+                    cases.append(('CONN_MAX_AGE=0', 0))
+            for label, max_age in cases:
+                self.run(handler, label, max_age, token, options)
+        finally:
+            connection_created.disconnect(self.count_connection)
+            self.set_max_age(configured)
+            allowed_hosts.disable()
+            delete_dataset(admin)
+
+    def count_connection(self, sender, connection, **kwargs):
+        self.opened += 1
+
+    def set_max_age(self, max_age):
+        # close_at is computed when connecting, so start from a fresh connection
+        connection.close()
+        connection.settings_dict['CONN_MAX_AGE'] = max_age
+
+    def run(self, handler, label, max_age, token, options):
+        self.set_max_age(max_age)
+        self.opened = 0
+        backends = set()
+        latencies = []
+        started = time.perf_counter()
+        for _ in range(options['requests']):
+            start = time.perf_counter()
+            response = handler(wsgi_environ(options['path'], token), lambda status, headers: None)
+            b''.join(response)
+            # request_finished closes (or keeps) the connection here
+            response.close()
+            latencies.append(time.perf_counter() - start)
+            if response.status_code != 200:
+                self.stderr.write(f'{options["path"]} returned {response.status_code}')
+                return
+            if connection.vendor == 'postgresql' and connection.connection is not None:
+                backends.add(connection.connection.info.backend_pid)
+        summary = summarize(latencies, time.perf_counter() - started)
+        self.stdout.write(format_summary(label, summary))
+        line = f'{"":<28} {self.opened} connection(s) opened for {len(latencies)} request(s)'
+        if backends:
+            line += f', {len(backends)} distinct backend(s)'
+        self.stdout.write(line)
+
@@ -0,0 +1,52 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from core.analytics import RAW, ROLLUP, dashboard_stats, rollup_events
+from core.benchmark import format_summary, summarize
+from core.models import Registration, EventRollup
+from core.seed import seed_sales
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare the dashboard stats of one event computed from raw registrations and '
+        'payments against the hourly rollups. Seeds data in a transaction that is rolled back; '
+        'run with --rows 10000000 on PostgreSQL for production-sized numbers.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=100000, help='Registrations (and payments) seeded.')
+        parser.add_argument('--batch-size', type=int, default=10000, help='Registrations per seeded hour.')
+        parser.add_argument('--repeat', type=int, default=10, help='Dashboard loads timed per source.')
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            start = time.perf_counter()
+            _, event = seed_sales(options['rows'], prefix='dashboard', batch_size=options['batch_size'])
+            self.stdout.write(f'seeded {options["rows"]} payments in {time.perf_counter() - start:.1f}s')
+
+            start = time.perf_counter()
+            rows = rollup_events([event.pk])
+            self.stdout.write(f'built {rows} rollup rows in {time.perf_counter() - start:.2f}s')
+
+            raw, raw_stats = self.run(Registration.objects.filter(ticket__event_id=event.pk), RAW, options['repeat'])
+            rollup, rollup_stats = self.run(EventRollup.objects.filter(event_id=event.pk), ROLLUP, options['repeat'])
+            transaction.set_rollback(True)
+
+        self.stdout.write(format_summary('raw aggregation', raw))
+        self.stdout.write(format_summary('rollups', rollup))
+        if raw_stats != rollup_stats:
+            raise CommandError('Rollup stats differ from the raw aggregation.')
+        speedup = raw['p50'] / rollup['p50'] if rollup['p50'] else 0.0
+        self.stdout.write(self.style.SUCCESS(f'Rollups match the raw aggregation, p50 {speedup:.1f}x faster.'))
+
+    def run(self, queryset, source, repeat):
+        latencies = []
+        started = time.perf_counter()
+        for _ in range(repeat):
+            start = time.perf_counter()
+            stats = dashboard_stats(queryset, source)
+            latencies.append(time.perf_counter() - start)
+        return summarize(latencies, time.perf_counter() - started), stats
@@ -0,0 +1,73 @@
+import time
+import tracemalloc
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from core.models import Event
+from core.seed import seed_dataset
+from core.views import EventRegistrationExportView
+
+
+class Command(BaseCommand):
+    help = (
+        'Stream the registration export of a small and a large synthetic event and '
+        'check that peak Python memory does not grow with the number of rows. '
+        'Seeds data in a transaction that is rolled back.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=100000, help='Registrations in the large event.')
+        parser.add_argument('--format', choices=['csv', 'ndjson'], default='csv')
+        parser.add_argument(
+            '--max-growth', type=float, default=2.0,
+            help='Allowed ratio between the large and the small export peak.',
+        )
+
+    def handle(self, *args, **options):
+        rows = options['rows']
+        with transaction.atomic():
+            small = self.seed_event(max(rows // 10, 1), 'export-small')
+            large = self.seed_event(rows, 'export-large')
+            small_peak = self.measure(small, options['format'])
+            large_peak = self.measure(large, options['format'])
+            transaction.set_rollback(True)
+
+        ratio = large_peak / small_peak if small_peak else 0.0
+        self.stdout.write(f'peak growth {ratio:.2f}x (limit {options["max_growth"]:.2f}x)')
+        if ratio > options['max_growth']:
+            raise CommandError('Export memory grows with the number of rows.')
+        self.stdout.write(self.style.SUCCESS('Export memory is bounded.'))
+
+    def seed_event(self, rows, prefix):
+        admin = seed_dataset(rows, prefix=prefix)
+        # seed_dataset registers every user on the tickets of its first event
+        event = Event.objects.get(name=admin.username)
+        return admin, event
+
+    def measure(self, seeded, export_format):
+        admin, event = seeded
+        request = APIRequestFactory().get(f'/api/events/{event.pk}/registrations.{export_format}')
+        force_authenticate(request, user=admin)
+
+        tracemalloc.start()
+        try:
+            start = time.perf_counter()
+            response = EventRegistrationExportView.as_view()(request, id=event.pk, export_format=export_format)
+            if response.status_code != 200:
+                raise CommandError(f'Export returned {response.status_code}')
+            size = lines = 0
+            for chunk in response.streaming_content:
+                size += len(chunk)
+                lines += chunk.count(b'\n')
+            elapsed = time.perf_counter() - start
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+        self.stdout.write(
+            f'{event.name:<40} {lines:>8} lines  {size / 1024 / 1024:>8.1f} MiB  '
+            f'{elapsed:>6.2f}s  peak {peak / 1024 / 1024:>6.2f} MiB'
+        )
+        return peak
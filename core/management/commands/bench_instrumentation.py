@@ -0,0 +1,103 @@
+import statistics
+import time
+from contextlib import ExitStack, contextmanager
+
+from django.conf import settings
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.backends.signals import connection_created
+from django.test import override_settings
+
+from core.benchmark import summarize, format_summary, wsgi_environ
+from core.metrics import install_query_recorder, record_query, registry
+from core.seed import seed_dataset, delete_dataset
+from core.serializers import RoleTokenObtainPairSerializer
+
+
+METRICS_MIDDLEWARE = 'core.middleware.MetricsMiddleware'
+
+
+class Command(BaseCommand):
+    help = (
+        'Send the same requests through the WSGI handler with and without '
+        'MetricsMiddleware, in alternating rounds, and check that the median '
+        'overhead of the instrumentation stays under --max-overhead percent.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=50)
+        parser.add_argument('--requests', type=int, default=200, help='Requests per round.')
+        parser.add_argument('--rounds', type=int, default=10)
+        parser.add_argument('--path', default='/api/events/')
+        parser.add_argument('--max-overhead', type=float, default=3.0, help='Allowed overhead in percent.')
+
+    def handle(self, *args, **options):
+        admin = seed_dataset(options['rows'], prefix='bench-metrics')
+        allowed_hosts = override_settings(ALLOWED_HOSTS=['localhost'])
+        allowed_hosts.enable()
+        try:
+            token = str(RoleTokenObtainPairSerializer.get_token(admin).access_token)
+            instrumented = WSGIHandler()
+            with override_settings(MIDDLEWARE=[name for name in settings.MIDDLEWARE if name != METRICS_MIDDLEWARE]):
+                plain = WSGIHandler()
+
+            # Warm up caches and the connection before timing anything
+            self.run(instrumented, token, options)
+            self.run(plain, token, options, recorder=False)
+            registry.reset()
+
+            timings = {'instrumented': [], 'plain': []}
+            ratios = []
+            for round_index in range(options['rounds']):
+                # Alternate the order so drift doesn't favour one side
+                if round_index % 2:
+                    off = self.run(plain, token, options, recorder=False)
+                    on = self.run(instrumented, token, options)
+                else:
+                    on = self.run(instrumented, token, options)
+                    off = self.run(plain, token, options, recorder=False)
+                timings['instrumented'] += on
+                timings['plain'] += off
+                ratios.append(sum(on) / sum(off))
+        finally:
+            allowed_hosts.disable()
+            delete_dataset(admin)
+
+        for label, latencies in timings.items():
+            self.stdout.write(format_summary(label, summarize(latencies, sum(latencies))))
+        overhead = (statistics.median(ratios) - 1) * 100
+        self.stdout.write(f'median overhead {overhead:+.2f}% (limit {options["max_overhead"]:.2f}%)')
+        if overhead > options['max_overhead']:
+            raise CommandError('Instrumentation overhead is above the limit.')
+        self.stdout.write(self.style.SUCCESS('Instrumentation overhead is within budget.'))
+
+    def run(self, handler, token, options, recorder=True):
+        with ExitStack() as stack:
+            if not recorder:
+                stack.enter_context(self.without_recorder())
+            latencies = []
+            for _ in range(options['requests']):
+                start = time.perf_counter()
+                response = handler(wsgi_environ(options['path'], token), lambda status, headers: None)
+                b''.join(response)
+                response.close()
+                latencies.append(time.perf_counter() - start)
+                if response.status_code != 200:
+                    raise CommandError(f'{options["path"]} returned {response.status_code}')
+            return latencies
+
+    @contextmanager
+    def without_recorder(self):
+        # The query recorder is a pass-through without the middleware, but
+        # take it off too so the plain rounds measure stock Django.
+        connection_created.disconnect(install_query_recorder)
+        installed = record_query in connection.execute_wrappers
+        if installed:
+            connection.execute_wrappers.remove(record_query)
+        try:
+            yield
+        finally:
+            connection_created.connect(install_query_recorder)
+            if installed and record_query not in connection.execute_wrappers:
+                connection.execute_wrappers.append(record_query)
@@ -0,0 +1,85 @@
+import os
+import threading
+import time
+from importlib.util import find_spec
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.test import override_settings
+from rest_framework.test import APIClient
+
+from core.models import User
+
+
+STRATEGIES = {
+    'pbkdf2': 'core.hashers.PBKDF2PasswordHasher',
+    'scrypt': 'core.hashers.ScryptPasswordHasher',
+    'argon2': 'core.hashers.Argon2PasswordHasher',
+}
+
+
+class Command(BaseCommand):
+    help = (
+        'Measure signups/s and logins/s per core through /api/register/ and '
+        '/api/login/ for each password hasher, and raw hashes/s on '
+        '--workers threads hashing at once.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=20, help='Signups and logins per hasher.')
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+        parser.add_argument('--hasher', action='append', choices=list(STRATEGIES), default=[])
+
+    def handle(self, *args, **options):
+        strategies = options['hasher'] or [name for name in STRATEGIES if name != 'argon2' or find_spec('argon2')]
+        self.stdout.write(f'{os.cpu_count()} core(s), {options["workers"]} thread(s), preferred hasher: {settings.PASSWORD_HASHER}')
+        prefix = f'bench-password-{time.time()}'
+        limits = override_settings(ALLOWED_HOSTS=['testserver'], RATE_LIMITS={})
+        limits.enable()
+        try:
+            for name in strategies:
+                with override_settings(PASSWORD_HASHERS=[STRATEGIES[name]]):
+                    signups, logins = self.run_endpoints(f'{prefix}-{name}', options['requests'])
+                    threaded = self.run_threads(options['workers'], options['requests'])
+                self.stdout.write(
+                    f'{name:<8} signup {signups:>7.1f}/s  login {logins:>7.1f}/s  '
+                    f'threads {threaded:>7.1f} hashes/s ({threaded / min(options["workers"], os.cpu_count() or 1):.1f}/s per core)'
+                )
+        finally:
+            limits.disable()
+            User.objects.filter(username__startswith=prefix).delete()
+
+    def run_endpoints(self, prefix, count):
+        client = APIClient()
+        password = 'B3nchmark-pass'
+        start = time.perf_counter()
+        for index in range(count):
+            response = client.post('/api/register/', {
+                'username': f'{prefix}-{index}', 'email': f'{index}@example.com', 'password': password,
+            }, format='json')
+            if response.status_code != 201:
+                raise CommandError(f'/api/register/ returned {response.status_code}: {response.content[:200]!r}')
+        signups = count / (time.perf_counter() - start)
+
+        start = time.perf_counter()
+        for index in range(count):
+            response = client.post('/api/login/', {'username': f'{prefix}-{index}', 'password': password}, format='json')
+            if response.status_code != 200:
+                raise CommandError(f'/api/login/ returned {response.status_code}: {response.content[:200]!r}')
+        logins = count / (time.perf_counter() - start)
+        return signups, logins
+
+    def run_threads(self, workers, count):
+        # hashlib and argon2 release the GIL, so threads hash on separate cores
+        per_thread = max(1, count // workers)
+        threads = [
+            threading.Thread(target=lambda: [make_password('B3nchmark-pass') for _ in range(per_thread)])
+            for _ in range(workers)
+        ]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return per_thread * workers / (time.perf_counter() - start)
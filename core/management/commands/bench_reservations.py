@@ -0,0 +1,92 @@
+import threading
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.utils import timezone
+
+from core import inventory
+from core.models import User, Event, Ticket
+from core.reservations import take_inventory, TicketSoldOut
+
+
+class Command(BaseCommand):
+    help = (
+        'Race N concurrent buyers against a single ticket and report throughput. '
+        'Run against PostgreSQL; SQLite serialises every writer.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--buyers', type=int, default=50)
+        parser.add_argument('--attempts', type=int, default=40, help='Purchase attempts per buyer.')
+        parser.add_argument('--quota', type=int, default=1000)
+        parser.add_argument(
+            '--hot', action='store_true',
+            help='Sell from the hot inventory counters (HOT_INVENTORY_STORE) and flush afterwards.',
+        )
+
+    def handle(self, *args, **options):
+        buyers, attempts, quota = options['buyers'], options['attempts'], options['quota']
+        now = timezone.now()
+        organizer = User.objects.create(username=f'bench-{now.timestamp()}')
+        event = Event.objects.create(
+            name='bench', description='', location='', status='PUBLISHED',
+            quota=buyers * attempts, start_time=now, end_time=now + timedelta(hours=1),
+            organizer=organizer,
+        )
+        ticket = Ticket.objects.create(
+            name='bench', price=0, quota=quota,
+            sales_start=now, sales_end=now + timedelta(hours=1), event=event,
+        )
+
+        if options['hot']:
+            if inventory.get_store() is None:
+                raise CommandError('Hot inventory is off, set HOT_INVENTORY_STORE.')
+            inventory.enable(ticket.pk)
+            take = lambda: inventory.purchase(organizer, ticket)
+        else:
+            take = lambda: take_inventory(ticket)
+
+        sold = []
+        lock = threading.Lock()
+        start_gate = threading.Barrier(buyers)
+
+        def buyer():
+            count = 0
+            try:
+                start_gate.wait()
+                for _ in range(attempts):
+                    try:
+                        take()
+                        count += 1
+                    except TicketSoldOut:
+                        pass
+            finally:
+                connection.close()
+            with lock:
+                sold.append(count)
+
+        threads = [threading.Thread(target=buyer) for _ in range(buyers)]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+        if options['hot']:
+            # Write-behind is not part of the measured sale
+            inventory.disable(ticket.pk)
+
+        ticket.refresh_from_db()
+        total_sold = sum(sold)
+        total_attempts = buyers * attempts
+        try:
+            self.stdout.write(f'buyers={buyers} attempts={total_attempts} quota={quota}')
+            self.stdout.write(f'sold={total_sold} remaining={ticket.quota} elapsed={elapsed:.3f}s')
+            self.stdout.write(f'throughput={total_attempts / elapsed:.0f} attempts/s')
+            if total_sold != min(quota, total_attempts) or ticket.quota != quota - total_sold:
+                raise CommandError('Oversell detected: sold seats do not match the ticket quota.')
+            self.stdout.write(self.style.SUCCESS('No oversell.'))
+        finally:
+            organizer.delete()
@@ -0,0 +1,57 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from rest_framework.renderers import JSONRenderer
+
+from core.fast_serializers import (
+    EventFastSerializer, TicketFastSerializer, RegistrationFastSerializer, PaymentFastSerializer,
+)
+from core.models import Event, Ticket, Registration, Payment
+from core.seed import seed_dataset
+from core.serializers import EventSerializer, TicketSerializer, RegistrationSerializer, PaymentSerializer
+
+
+PAIRS = [
+    (Event, EventSerializer, EventFastSerializer),
+    (Ticket, TicketSerializer, TicketFastSerializer),
+    (Registration, RegistrationSerializer, RegistrationFastSerializer),
+    (Payment, PaymentSerializer, PaymentFastSerializer),
+]
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare rows/sec of the DRF model serializers and the fast read path, '
+        'and check that both render to identical JSON.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=2000)
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def handle(self, *args, **options):
+        renderer = JSONRenderer()
+        with transaction.atomic():
+            seed_dataset(options['rows'], prefix='bench')
+            for model, serializer_class, fast_class in PAIRS:
+                objects = list(model.objects.order_by('created_at', 'id'))
+                rows = list(fast_class.get_queryset(model.objects.order_by('created_at', 'id')))
+
+                if renderer.render(serializer_class(objects, many=True).data) != renderer.render(fast_class.serialize(rows)):
+                    raise CommandError(f'{fast_class.__name__} output differs from {serializer_class.__name__}')
+
+                slow = self.rows_per_second(lambda: serializer_class(objects, many=True).data, len(objects), options['repeat'])
+                fast = self.rows_per_second(lambda: fast_class.serialize(rows), len(rows), options['repeat'])
+                self.stdout.write(
+                    f'{model.__name__:<13} drf: {slow:>10.0f} rows/s  fast: {fast:>10.0f} rows/s  ({fast / slow:.1f}x)'
+                )
+            transaction.set_rollback(True)
+
+    def rows_per_second(self, serialize, count, repeat):
+        best = float('inf')
+        for _ in range(repeat):
+            started = time.perf_counter()
+            serialize()
+            best = min(best, time.perf_counter() - started)
+        return count / best
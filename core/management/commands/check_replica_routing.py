@@ -0,0 +1,87 @@
+import json
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+
+from core.benchmark import wsgi_environ
+from core.models import Event
+from core.seed import seed_dataset, delete_dataset
+from core.serializers import RoleTokenObtainPairSerializer
+
+
+class Command(BaseCommand):
+    help = (
+        'Send requests through the full WSGI handler and check where their reads go: '
+        'a user who just wrote reads from the primary, everyone else from a replica. '
+        'Needs at least one alias in REPLICA_DATABASES (DATABASE_REPLICA_HOSTS); '
+        'for a local SQLite replica run "migrate --database replica0" first.'
+    )
+
+    def handle(self, *args, **options):
+        if not settings.REPLICA_DATABASES:
+            raise CommandError('No replica configured, set DATABASE_REPLICA_HOSTS.')
+
+        admin = seed_dataset(1, prefix='replica-check')
+        reader = admin.__class__.objects.get(username=f'{admin.username}-0')
+        allowed_hosts = override_settings(ALLOWED_HOSTS=['localhost'])
+        allowed_hosts.enable()
+        try:
+            writer_token = self.token(admin)
+            reader_token = self.token(reader)
+            handler = WSGIHandler()
+            failures = []
+
+            body = json.dumps({
+                'name': f'{admin.username}-event',
+                'description': 'replica routing check',
+                'location': 'Online',
+                'start_time': '2030-01-01T10:00:00Z',
+                'end_time': '2030-01-01T12:00:00Z',
+                'quota': 10,
+                'status': 'published',
+                'organizer_id': str(admin.pk),
+                'category': 'check',
+            }).encode()
+            checks = [
+                ('writer POST /api/events/', writer_token, 'POST', body, 201, False),
+                ('writer GET /api/events/', writer_token, 'GET', b'', 200, False),
+                ('reader GET /api/events/', reader_token, 'GET', b'', 200, True),
+            ]
+            for label, token, method, payload, expected, on_replica in checks:
+                status_code, primary, replica = self.send(handler, token, method, payload)
+                # Role checks always read the primary, so only the replica count tells them apart
+                served = 'replica' if replica else 'primary'
+                line = f'{label:<28} {status_code}  primary {primary:>2} queries  replica {replica:>2} queries'
+                if status_code != expected or served != ('replica' if on_replica else 'primary'):
+                    failures.append(label)
+                    self.stdout.write(self.style.ERROR(f'{line}  expected {"replica" if on_replica else "primary"}'))
+                else:
+                    self.stdout.write(f'{line}  ok')
+        finally:
+            allowed_hosts.disable()
+            Event.objects.filter(name=f'{admin.username}-event').delete()
+            delete_dataset(admin)
+
+        if failures:
+            raise CommandError(f'Misrouted: {", ".join(failures)}')
+        self.stdout.write(self.style.SUCCESS('Replica routing ok.'))
+
+    def token(self, user):
+        return str(RoleTokenObtainPairSerializer.get_token(user).access_token)
+
+    def send(self, handler, token, method, body):
+        with ExitStack() as stack:
+            primary = stack.enter_context(CaptureQueriesContext(connections[DEFAULT_DB_ALIAS]))
+            replicas = [
+                stack.enter_context(CaptureQueriesContext(connections[alias]))
+                for alias in settings.REPLICA_DATABASES
+            ]
+            response = handler(wsgi_environ('/api/events/', token, method, body), lambda status, headers: None)
+            b''.join(response)
+            response.close()
+        return response.status_code, len(primary), sum(len(context) for context in replicas)
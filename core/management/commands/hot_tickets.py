@@ -0,0 +1,44 @@
+import uuid
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core import inventory
+from core.models import Ticket
+
+
+class Command(BaseCommand):
+    help = (
+        'Move tickets (with every other ticket of their event) to or from the '
+        'hot inventory counters, list them, or reconcile the counters with the '
+        'database after a crash.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--enable', nargs='+', type=uuid.UUID, default=[], metavar='TICKET_ID')
+        parser.add_argument('--disable', nargs='+', type=uuid.UUID, default=[], metavar='TICKET_ID')
+        parser.add_argument(
+            '--reconcile', action='store_true',
+            help='Replay claimed purchases, write the journal and reload every counter from the database.',
+        )
+
+    def handle(self, *args, **options):
+        store = inventory.get_store()
+        if store is None:
+            raise CommandError('Hot inventory is off, set HOT_INVENTORY_STORE.')
+
+        for ticket_id in options['enable']:
+            try:
+                inventory.enable(ticket_id)
+            except Ticket.DoesNotExist:
+                raise CommandError(f'Ticket {ticket_id} does not exist.')
+        for ticket_id in options['disable']:
+            flushed = inventory.disable(ticket_id)
+            self.stdout.write(f'Disabled {ticket_id}, wrote {flushed} pending purchase(s).')
+        if options['reconcile']:
+            flushed, reloaded = inventory.reconcile()
+            self.stdout.write(f'Wrote {flushed} pending purchase(s), reloaded {reloaded} ticket(s).')
+
+        for ticket_id in store.hot_tickets():
+            ticket, event = store.remaining(ticket_id)
+            self.stdout.write(f'{ticket_id}  ticket remaining {ticket:>8}  event remaining {event:>8}')
+        self.stdout.write(f'{store.pending()} purchase(s) waiting for the flusher.')
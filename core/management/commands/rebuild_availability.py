@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+
+from core.availability import rebuild_availability
+from core.models import Event
+
+
+class Command(BaseCommand):
+    help = 'Recompute event and ticket availability counters from registrations, holds and payments.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500, help='Events rebuilt per transaction.')
+        parser.add_argument('--event', action='append', dest='events', help='Only rebuild this event (repeatable).')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        queryset = Event.objects.order_by('pk').values_list('pk', flat=True)
+        if options['events']:
+            queryset = queryset.filter(pk__in=options['events'])
+
+        events = tickets = 0
+        batch = []
+        for pk in queryset.iterator(chunk_size=batch_size):
+            batch.append(pk)
+            if len(batch) == batch_size:
+                counts = rebuild_availability(batch)
+                events, tickets = events + counts[0], tickets + counts[1]
+                batch = []
+        if batch:
+            counts = rebuild_availability(batch)
+            events, tickets = events + counts[0], tickets + counts[1]
+        self.stdout.write(f'Rebuilt availability for {events} event(s) and {tickets} ticket(s).')
@@ -0,0 +1,32 @@
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+
+from core import feed
+
+
+class Command(BaseCommand):
+    help = (
+        'Rebuild the upcoming events feed snapshot, once (after a deploy or a '
+        'cache flush) or every --interval seconds so no reader ever rebuilds it.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=float, default=None)
+
+    def handle(self, *args, **options):
+        while True:
+            if not cache.add(feed.LOCK_KEY, 1, settings.FEED_LOCK_TIMEOUT):
+                if options['interval'] is None:
+                    raise CommandError('The feed is being updated, try again.')
+            else:
+                try:
+                    snapshot = feed.rebuild()
+                finally:
+                    cache.delete(feed.LOCK_KEY)
+                self.stdout.write(f'{len(snapshot.rows)} upcoming event(s) in the feed.')
+            if options['interval'] is None:
+                return
+            time.sleep(options['interval'])
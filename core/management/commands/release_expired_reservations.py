@@ -0,0 +1,23 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from core.reservations import release_expired_holds
+
+
+class Command(BaseCommand):
+    help = 'Release expired ticket holds and give their seats back.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--loop', action='store_true', help='Keep sweeping until interrupted.')
+        parser.add_argument('--interval', type=float, default=5.0, help='Seconds between sweeps with --loop.')
+
+    def handle(self, *args, **options):
+        while True:
+            released = release_expired_holds(batch_size=options['batch_size'])
+            if released:
+                self.stdout.write(f'Released {released} expired reservation(s).')
+            if not options['loop']:
+                return
+            time.sleep(options['interval'])
@@ -0,0 +1,51 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from core.analytics import record_run, refresh_rollups, rollup_events
+from core.models import Event
+
+
+class Command(BaseCommand):
+    help = (
+        'Maintain the hourly event rollups read by the dashboard endpoints. '
+        'Rebuilds only buckets changed since the last run unless --full is given.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--full', action='store_true', help='Rebuild every event from scratch.')
+        parser.add_argument('--batch-size', type=int, default=200, help='Events rebuilt per transaction with --full.')
+        parser.add_argument('--loop', action='store_true', help='Keep refreshing until interrupted.')
+        parser.add_argument('--interval', type=float, default=60.0, help='Seconds between runs with --loop.')
+
+    def handle(self, *args, **options):
+        while True:
+            result = None if options['full'] else refresh_rollups()
+            if result is None:
+                events, rows = self.rebuild_all(options['batch_size'])
+                self.stdout.write(f'Rebuilt rollups of {events} event(s): {rows} row(s).')
+            else:
+                events, rows = result
+                if events:
+                    self.stdout.write(f'Refreshed rollups of {events} event(s): {rows} row(s).')
+            if not options['loop']:
+                return
+            options['full'] = False
+            time.sleep(options['interval'])
+
+    def rebuild_all(self, batch_size):
+        computed_at = timezone.now()
+        events = rows = 0
+        batch = []
+        for pk in Event.objects.order_by('pk').values_list('pk', flat=True).iterator(chunk_size=batch_size):
+            batch.append(pk)
+            if len(batch) == batch_size:
+                rows += rollup_events(batch, computed_at=computed_at)
+                events += len(batch)
+                batch = []
+        if batch:
+            rows += rollup_events(batch, computed_at=computed_at)
+            events += len(batch)
+        record_run(computed_at)
+        return events, rows
@@ -0,0 +1,26 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core import inventory
+
+
+class Command(BaseCommand):
+    help = 'Write hot-ticket purchases from the counter store to the database in batches.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=None)
+        parser.add_argument('--once', action='store_true', help='Drain the journal and exit.')
+        parser.add_argument('--interval', type=float, default=0.2, help='Seconds to sleep when idle.')
+
+    def handle(self, *args, **options):
+        if inventory.get_store() is None:
+            raise CommandError('Hot inventory is off, set HOT_INVENTORY_STORE.')
+        while True:
+            handled = inventory.flush(batch_size=options['batch_size'])
+            if handled:
+                self.stdout.write(f'Wrote {handled} purchase(s).')
+                continue
+            if options['once']:
+                return
+            time.sleep(options['interval'])
@@ -0,0 +1,24 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from core.outbox import process_batch
+
+
+class Command(BaseCommand):
+    help = 'Process pending outbox messages, e.g. payment confirmations.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=100)
+        parser.add_argument('--once', action='store_true', help='Drain due messages and exit.')
+        parser.add_argument('--interval', type=float, default=1.0, help='Seconds to sleep when idle.')
+
+    def handle(self, *args, **options):
+        while True:
+            handled = process_batch(batch_size=options['batch_size'])
+            if handled:
+                self.stdout.write(f'Handled {handled} message(s).')
+                continue
+            if options['once']:
+                return
+            time.sleep(options['interval'])
@@ -0,0 +1,26 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core import waiting_room
+
+
+class Command(BaseCommand):
+    help = (
+        'Admit buyers from every open waiting room at its rate. Run exactly one, '
+        'a second scheduler would double the admission rate.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=float, default=0.1, help='Seconds between admission steps.')
+
+    def handle(self, *args, **options):
+        if waiting_room.get_store() is None:
+            raise CommandError('The waiting room is off, set WAITING_ROOM_STORE.')
+        credits = {}
+        last = time.monotonic()
+        while True:
+            time.sleep(options['interval'])
+            now = time.monotonic()
+            waiting_room.schedule(credits, now - last)
+            last = now
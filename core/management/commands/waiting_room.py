@@ -0,0 +1,43 @@
+import uuid
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core import waiting_room
+from core.models import Event, Ticket
+
+
+class Command(BaseCommand):
+    help = (
+        'Open or close waiting rooms for tickets or whole events and list the '
+        'open queues with their admission progress.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--ticket', nargs='+', type=uuid.UUID, default=[], metavar='TICKET_ID', help='Open one queue per ticket.')
+        parser.add_argument('--event', nargs='+', type=uuid.UUID, default=[], metavar='EVENT_ID', help='Open one queue shared by the event\'s tickets.')
+        parser.add_argument('--rate', type=float, default=None, help='Admissions per second, WAITING_ROOM_RATE by default.')
+        parser.add_argument('--close', nargs='+', default=[], metavar='QUEUE_ID')
+
+    def handle(self, *args, **options):
+        store = waiting_room.get_store()
+        if store is None:
+            raise CommandError('The waiting room is off, set WAITING_ROOM_STORE.')
+
+        for ticket_id in options['ticket']:
+            if not Ticket.objects.filter(pk=ticket_id).exists():
+                raise CommandError(f'Ticket {ticket_id} does not exist.')
+            waiting_room.open_queue(ticket_id, [ticket_id], options['rate'])
+        for event_id in options['event']:
+            if not Event.objects.filter(pk=event_id).exists():
+                raise CommandError(f'Event {event_id} does not exist.')
+            # Tickets added to the event later need the command run again
+            waiting_room.open_queue(event_id, Ticket.objects.filter(event_id=event_id).values_list('pk', flat=True), options['rate'])
+        for queue_id in options['close']:
+            waiting_room.close_queue(queue_id)
+            self.stdout.write(f'Closed {queue_id}.')
+
+        for queue_id, queue in store.queues_info().items():
+            self.stdout.write(
+                f'{queue_id}  {queue["rate"]:>6g}/s  admitted {queue["head"]:>8}  '
+                f'waiting {queue["tail"] - queue["head"]:>8}'
+            )
@@ -0,0 +1,213 @@
+import logging
+import random
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+
+from django.conf import settings
+
+
+logger = logging.getLogger('core.metrics')
+
+_current = ContextVar('request_metrics', default=None)
+
+# Upper bounds (seconds) of the request duration histogram
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class RequestMetrics:
+    """
+    Measurements of one request, filled in by ``record_query`` and
+    ``serialize_timer`` while the request runs.
+    """
+
+    def __init__(self, sampled):
+        self.started = time.perf_counter()
+        self.db_time = 0.0
+        self.queries = 0
+        self.serialize_time = 0.0
+        # SQL is only kept for requests sampled for the slow-request log
+        self.statements = [] if sampled else None
+
+
+def record_query(execute, sql, params, many, context):
+    """
+    ``execute_wrapper`` installed on every connection (see
+    ``install_query_recorder``); a pass-through outside instrumented requests.
+    """
+    metrics = _current.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        metrics.db_time += time.perf_counter() - start
+        metrics.queries += 1
+        if metrics.statements is not None and len(metrics.statements) < settings.METRICS_SLOW_REQUEST_MAX_QUERIES:
+            metrics.statements.append(sql)
+
+
+def install_query_recorder(sender, connection, **kwargs):
+    # connection_created fires again on reconnect, install only once per wrapper
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+@contextmanager
+def serialize_timer():
+    metrics = _current.get()
+    if metrics is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics.serialize_time += time.perf_counter() - start
+
+
+def timed_serialization(func):
+    """
+    Count the time spent in ``func`` as serializer time of the current request.
+    """
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        with serialize_timer():
+            return func(*args, **kwargs)
+    return wrapper
+
+
+class EndpointStats:
+    def __init__(self):
+        self.requests = 0
+        self.duration = 0.0
+        self.buckets = [0] * len(DURATION_BUCKETS)
+        self.db_time = 0.0
+        self.queries = 0
+        self.serialize_time = 0.0
+        self.response_bytes = 0
+        self.slow = 0
+
+
+class MetricsRegistry:
+    """
+    Per-endpoint totals of this process, rendered in the Prometheus text
+    format.
+
+    Like the cache stats, the numbers live in process memory, so each worker
+    process is its own scrape target.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._endpoints = {}
+
+    def observe(self, route, method, duration, metrics, size, slow):
+        with self._lock:
+            stats = self._endpoints.get((route, method))
+            if stats is None:
+                stats = self._endpoints[(route, method)] = EndpointStats()
+            stats.requests += 1
+            stats.duration += duration
+            for index, bound in enumerate(DURATION_BUCKETS):
+                if duration <= bound:
+                    stats.buckets[index] += 1
+                    break
+            stats.db_time += metrics.db_time
+            stats.queries += metrics.queries
+            stats.serialize_time += metrics.serialize_time
+            stats.response_bytes += size
+            stats.slow += slow
+
+    def reset(self):
+        with self._lock:
+            self._endpoints.clear()
+
+    def render(self):
+        with self._lock:
+            endpoints = sorted(
+                ((route, method, self._copy(stats)) for (route, method), stats in self._endpoints.items()),
+                key=lambda item: item[:2],
+            )
+
+        lines = []
+
+        def family(name, kind, help_text, value):
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} {kind}')
+            for route, method, stats in endpoints:
+                lines.append(f'{name}{{{_labels(route, method)}}} {value(stats)}')
+
+        family('http_requests_total', 'counter', 'Requests served.', lambda s: s.requests)
+        lines.append('# HELP http_request_duration_seconds Wall time from the first to the last middleware.')
+        lines.append('# TYPE http_request_duration_seconds histogram')
+        for route, method, stats in endpoints:
+            labels = _labels(route, method)
+            cumulative = 0
+            for bound, count in zip(DURATION_BUCKETS, stats.buckets):
+                cumulative += count
+                lines.append(f'http_request_duration_seconds_bucket{{{labels},le="{bound}"}} {cumulative}')
+            lines.append(f'http_request_duration_seconds_bucket{{{labels},le="+Inf"}} {stats.requests}')
+            lines.append(f'http_request_duration_seconds_sum{{{labels}}} {stats.duration:.6f}')
+            lines.append(f'http_request_duration_seconds_count{{{labels}}} {stats.requests}')
+        family('http_db_duration_seconds_total', 'counter', 'Time spent executing SQL.', lambda s: f'{s.db_time:.6f}')
+        family('http_db_queries_total', 'counter', 'SQL statements executed.', lambda s: s.queries)
+        family(
+            'http_serialize_duration_seconds_total', 'counter',
+            'Time spent serializing and rendering response bodies.', lambda s: f'{s.serialize_time:.6f}',
+        )
+        family('http_response_bytes_total', 'counter', 'Response body bytes, streaming responses excluded.', lambda s: s.response_bytes)
+        family('http_slow_requests_total', 'counter', 'Requests slower than METRICS_SLOW_REQUEST_MS.', lambda s: s.slow)
+        return '\n'.join(lines) + '\n'
+
+    @staticmethod
+    def _copy(stats):
+        copy = EndpointStats()
+        copy.__dict__.update(stats.__dict__, buckets=list(stats.buckets))
+        return copy
+
+
+def _escape(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(route, method):
+    return f'route="{_escape(route)}",method="{method}"'
+
+
+registry = MetricsRegistry()
+
+
+def route_name(request):
+    """
+    URL name of the resolved view, its route pattern for unnamed URLs.
+    """
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return 'unmatched'
+    return match.url_name or match.route
+
+
+def start_request():
+    sampled = random.random() < settings.METRICS_SLOW_REQUEST_SAMPLE_RATE
+    metrics = RequestMetrics(sampled)
+    return metrics, _current.set(metrics)
+
+
+def finish_request(request, response, metrics, token):
+    _current.reset(token)
+    duration = time.perf_counter() - metrics.started
+    route = route_name(request)
+    size = 0 if response.streaming else len(response.content)
+    slow = duration * 1000 >= settings.METRICS_SLOW_REQUEST_MS
+    registry.observe(route, request.method, duration, metrics, size, slow)
+    if slow and metrics.statements is not None:
+        logger.warning(
+            'Slow request %s %s (%s) %d: %.1fms, %d queries in %.1fms, serialize %.1fms\n%s',
+            request.method, request.path, route, response.status_code, duration * 1000,
+            metrics.queries, metrics.db_time * 1000, metrics.serialize_time * 1000,
+            '\n'.join(metrics.statements),
+        )
@@ -0,0 +1,63 @@
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.utils.deprecation import MiddlewareMixin
+
+from .metrics import start_request as metrics_start, finish_request as metrics_finish
+from .routers import start_request, end_request
+
+
+class ReplicaRoutingMiddleware(MiddlewareMixin):
+    """
+    Let ``PrimaryReplicaRouter`` send the reads of GET/HEAD requests to a
+    replica when the view sets ``read_from_replica = True``, and remember
+    users who wrote so their next reads stay on the primary.
+    """
+
+    def process_request(self, request):
+        request.replica_routing = start_request(request)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        state = getattr(request, 'replica_routing', None)
+        if state is None or request.method not in ('GET', 'HEAD'):
+            return None
+        # DRF views expose the class as .cls, plain Django views as .view_class
+        view_class = getattr(view_func, 'cls', None) or getattr(view_func, 'view_class', None)
+        state.replica_reads = getattr(view_class, 'read_from_replica', False)
+        return None
+
+    def process_response(self, request, response):
+        state = getattr(request, 'replica_routing', None)
+        if state is not None:
+            state.finish()
+            end_request()
+        return response
+
+
+class MetricsMiddleware:
+    """
+    Record wall time, SQL time and count, serializer time and response size
+    of every request per URL name and method (see ``core.metrics``).
+
+    Place it first so the timing covers the other middleware too.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        metrics, token = metrics_start()
+        response = self.get_response(request)
+        metrics_finish(request, response, metrics, token)
+        return response
+
+    async def __acall__(self, request):
+        metrics, token = metrics_start()
+        response = await self.get_response(request)
+        metrics_finish(request, response, metrics, token)
+        return response
@@ -0,0 +1,57 @@
+from django.contrib.postgres.indexes import GinIndex, OpClass
+from django.db import migrations
+from django.db.models.functions import Upper
+
+
+# Django renders ``name__icontains`` as ``UPPER("name"::text) LIKE UPPER(%s)``
+# on PostgreSQL, which a pg_trgm GIN index on ``UPPER(name)`` can serve.
+SEARCH_INDEXES = [
+    GinIndex(OpClass(Upper('name'), name='gin_trgm_ops'), name='event_name_trgm_idx'),
+    GinIndex(OpClass(Upper('description'), name='gin_trgm_ops'), name='event_description_trgm_idx'),
+]
+
+
+class AddSearchIndexes(migrations.operations.base.Operation):
+    """
+    ``TrigramExtension`` plus the indexes above, on PostgreSQL only. Other
+    backends (SQLite in tests) have no equivalent and simply scan, so the
+    indexes stay out of the model state.
+    """
+    reversible = True
+
+    def state_forwards(self, app_label, state):
+        pass
+
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor != 'postgresql':
+            return
+        # Needs psycopg, which only PostgreSQL deployments install
+        from django.contrib.postgres.operations import TrigramExtension
+
+        TrigramExtension().database_forwards(app_label, schema_editor, from_state, to_state)
+        model = to_state.apps.get_model(app_label, 'event')
+        for index in SEARCH_INDEXES:
+            # Created by hand before this migration existed
+            schema_editor.execute(f'DROP INDEX IF EXISTS {schema_editor.quote_name(index.name)}')
+            schema_editor.add_index(model, index)
+
+    def database_backwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor != 'postgresql':
+            return
+        model = from_state.apps.get_model(app_label, 'event')
+        for index in SEARCH_INDEXES:
+            schema_editor.remove_index(model, index)
+
+    def describe(self):
+        return 'Create the pg_trgm search indexes of Event on PostgreSQL'
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0001_initial'),
+    ]
+
+    operations = [
+        AddSearchIndexes(),
+    ]
@@ -8,6 +8,8 @@ class User(AbstractUser):
     id = models.UUIDField(default=uuid.uuid4, unique=True, primary_key=True, editable=False)
     first_name = models.CharField(max_length=255, blank=True, default="", null=False)
     last_name = models.CharField(max_length=255, blank=True, default="", null=False)
+    # Dinaikkan setiap kali group, is_superuser atau is_active berubah, token dengan versi lama ditolak
+    role_version = models.PositiveIntegerField(default=0, editable=False)
 
     @property
     def full_name(self):
@@ -28,6 +30,16 @@ class Event(models.Model):
     
     # Relation
     organizer = models.ForeignKey(User, on_delete=models.CASCADE, related_name="events")
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['created_at', 'id'], name='event_created_id_idx'),
+            models.Index(fields=['updated_at'], name='event_updated_idx'),
+            models.Index(fields=['status', 'start_time', 'id'], name='event_status_start_idx'),
+            models.Index(fields=['category', 'start_time'], name='event_category_start_idx'),
+            models.Index(fields=['location', 'start_time'], name='event_location_start_idx'),
+            models.Index(fields=['start_time', 'id'], name='event_start_id_idx'),
+        ]
     
     def __str__(self) -> str:
         return self.name
@@ -46,6 +58,12 @@ class Ticket(models.Model):
     # Relation
     event = models.ForeignKey(Event, on_delete=models.CASCADE, related_name="tickets")
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['created_at', 'id'], name='ticket_created_id_idx'),
+            models.Index(fields=['updated_at'], name='ticket_updated_idx'),
+        ]
+
 class Registration(models.Model):
         
     id = models.UUIDField(default=uuid.uuid4, unique=True, primary_key=True, editable=False)
@@ -55,7 +73,13 @@ class Registration(models.Model):
     # Relation
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="registrations")
     
-    ticket = models.OneToOneField(Ticket, on_delete=models.CASCADE, related_name="registration", null=True, blank=True)
+    ticket = models.ForeignKey(Ticket, on_delete=models.CASCADE, related_name="registrations", null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['created_at', 'id'], name='registration_created_id_idx'),
+            models.Index(fields=['updated_at'], name='registration_updated_idx'),
+        ]
 
 
 class Payment(models.Model):
@@ -64,8 +88,149 @@ class Payment(models.Model):
     payment_method = models.CharField(max_length=255)
     payment_status = models.CharField(max_length=255)
     amount_paid = models.IntegerField()
+    # Diisi oleh outbox worker setelah konfirmasi selesai diproses
+    confirmed_at = models.DateTimeField(null=True, blank=True, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
     # Relations
-    registration = models.OneToOneField(Registration, on_delete=models.CASCADE, related_name="payment", null=True, blank=True)
\ No newline at end of file
+    registration = models.OneToOneField(Registration, on_delete=models.CASCADE, related_name="payment", null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['created_at', 'id'], name='payment_created_id_idx'),
+            models.Index(fields=['updated_at'], name='payment_updated_idx'),
+        ]
+
+
+class Reservation(models.Model):
+    """
+    A short-lived hold on one seat of a ticket.
+
+    The seat is taken from ``Ticket.quota`` when the hold is created and is
+    given back when the hold expires without being turned into a registration.
+    """
+    HELD = 'HELD'
+    CONFIRMED = 'CONFIRMED'
+    RELEASED = 'RELEASED'
+    STATUS_CHOICES = [
+        (HELD, 'Held'),
+        (CONFIRMED, 'Confirmed'),
+        (RELEASED, 'Released'),
+    ]
+
+    id = models.UUIDField(default=uuid.uuid4, unique=True, primary_key=True, editable=False)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=HELD)
+    expires_at = models.DateTimeField()
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    # Relations
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="reservations")
+    ticket = models.ForeignKey(Ticket, on_delete=models.CASCADE, related_name="reservations")
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'expires_at'], name='reservation_status_exp_idx'),
+        ]
+
+
+class TicketAvailability(models.Model):
+    """
+    Sales counters of one ticket, changed in the same transaction as the
+    registration, hold or payment write behind them (see ``core.availability``).
+
+    Seats left are ``Ticket.quota`` itself. ``manage.py rebuild_availability``
+    recomputes the counters from scratch.
+    """
+    ticket = models.OneToOneField(Ticket, on_delete=models.CASCADE, primary_key=True, related_name="availability")
+    sold = models.IntegerField(default=0)
+    reserved = models.IntegerField(default=0)
+    # Total amount_paid of confirmed payments
+    revenue = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+
+class EventAvailability(models.Model):
+    """
+    ``TicketAvailability`` summed over every ticket of an event.
+    """
+    event = models.OneToOneField(Event, on_delete=models.CASCADE, primary_key=True, related_name="availability")
+    sold = models.IntegerField(default=0)
+    reserved = models.IntegerField(default=0)
+    revenue = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+
+class EventRollup(models.Model):
+    """
+    Hourly registration and payment totals of an event, one row per ticket
+    type and payment method of the registrations created in that hour.
+
+    Built from the raw tables by ``manage.py rollup_stats``; the dashboard
+    endpoints read only this table (see ``core.analytics``).
+    """
+    event = models.ForeignKey(Event, on_delete=models.CASCADE, related_name="rollups")
+    # Awal jam (UTC) saat registrasi dibuat
+    bucket = models.DateTimeField()
+    ticket_type = models.CharField(max_length=255, null=True)
+    payment_method = models.CharField(max_length=255, null=True)
+    registrations = models.IntegerField(default=0)
+    payments = models.IntegerField(default=0)
+    confirmed_payments = models.IntegerField(default=0)
+    revenue = models.BigIntegerField(default=0)
+    computed_at = models.DateTimeField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['event', 'bucket'], name='rollup_event_bucket_idx'),
+            models.Index(fields=['computed_at'], name='rollup_computed_idx'),
+        ]
+
+
+class RollupRun(models.Model):
+    """
+    Start time of the last ``rollup_stats`` run, also when it changed no
+    rollup rows.
+    """
+    computed_at = models.DateTimeField()
+
+
+class StaleRollupBucket(models.Model):
+    """
+    An hour of an event whose rollups lost a registration that moved to
+    another ticket; the next refresh rebuilds it.
+    """
+    event = models.ForeignKey(Event, on_delete=models.CASCADE, related_name="stale_rollup_buckets")
+    bucket = models.DateTimeField()
+
+
+class OutboxMessage(models.Model):
+    """
+    Work written in the same transaction as the change that caused it and
+    processed later by the outbox worker (``manage.py run_outbox_worker``).
+    """
+    PENDING = 'PENDING'
+    DONE = 'DONE'
+    FAILED = 'FAILED'
+    STATUS_CHOICES = [
+        (PENDING, 'Pending'),
+        (DONE, 'Done'),
+        (FAILED, 'Failed'),
+    ]
+
+    topic = models.CharField(max_length=100)
+    # Satu pesan per key, enqueue ulang diabaikan
+    key = models.CharField(max_length=255, unique=True)
+    payload = models.JSONField(default=dict)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=PENDING)
+    attempts = models.PositiveIntegerField(default=0)
+    last_error = models.TextField(blank=True, default="")
+    available_at = models.DateTimeField()
+    processed_at = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'available_at'], name='outbox_status_avail_idx'),
+        ]
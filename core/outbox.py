@@ -0,0 +1,74 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .models import OutboxMessage
+
+
+HANDLERS = {}
+
+
+def handler(topic):
+    """
+    Register ``func(payload)`` as the handler of ``topic``. Handlers must be
+    idempotent: a message can be delivered again after a crash.
+    """
+    def register(func):
+        HANDLERS[topic] = func
+        return func
+    return register
+
+
+def enqueue(topic, key, payload):
+    """
+    Add a message in the current transaction. A message with the same key is
+    only stored once.
+    """
+    OutboxMessage.objects.bulk_create(
+        [OutboxMessage(topic=topic, key=key, payload=payload, available_at=timezone.now())],
+        ignore_conflicts=True,
+    )
+
+
+def retry_delay(attempts):
+    delay = settings.OUTBOX_RETRY_BASE_SECONDS * 2 ** (attempts - 1)
+    return timedelta(seconds=min(delay, settings.OUTBOX_RETRY_MAX_SECONDS))
+
+
+def process_batch(batch_size=100):
+    """
+    Handle up to ``batch_size`` due messages in one transaction.
+
+    Rows are claimed with ``SKIP LOCKED`` so several workers can run side by
+    side. Each handler runs in its own savepoint; a failure is rescheduled
+    with exponential backoff and marked FAILED after
+    ``OUTBOX_MAX_ATTEMPTS``. Returns the number of messages handled.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        messages = list(
+            OutboxMessage.objects
+            .select_for_update(skip_locked=True)
+            .filter(status=OutboxMessage.PENDING, available_at__lte=now)
+            .order_by('available_at', 'id')[:batch_size]
+        )
+        done = []
+        for message in messages:
+            try:
+                with transaction.atomic():
+                    HANDLERS[message.topic](message.payload)
+            except Exception as exc:
+                message.attempts += 1
+                message.last_error = f'{type(exc).__name__}: {exc}'
+                if message.attempts >= settings.OUTBOX_MAX_ATTEMPTS:
+                    message.status = OutboxMessage.FAILED
+                else:
+                    message.available_at = now + retry_delay(message.attempts)
+                message.save(update_fields=['attempts', 'last_error', 'status', 'available_at'])
+            else:
+                done.append(message.pk)
+
+        OutboxMessage.objects.filter(pk__in=done).update(status=OutboxMessage.DONE, processed_at=timezone.now())
+    return len(messages)
@@ -0,0 +1,113 @@
+import base64
+import json
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.utils.urls import replace_query_param
+
+
+def query_params(request):
+    # DRF Request or plain HttpRequest (async views)
+    return getattr(request, 'query_params', request.GET)
+
+
+class KeysetPagination:
+    """
+    Cursor pagination over a fixed, unique ordering.
+
+    The cursor stores the ordering values of the last row of a page, so the
+    next page is fetched with a ``WHERE (a, b) > (x, y)`` style filter that
+    an index on the ordering columns can serve directly, no matter how deep
+    the client pages. Rows inserted while paging never shift existing pages.
+    """
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    invalid_cursor_message = 'Invalid cursor'
+
+    def __init__(self, ordering=('created_at', 'id')):
+        self.ordering = tuple(ordering)
+        self.next_cursor = None
+        self.request = None
+
+    def get_page_size(self, request):
+        page_size = settings.API_PAGE_SIZE
+        try:
+            requested = int(query_params(request)[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return page_size
+        if requested <= 0:
+            return page_size
+        return min(requested, self.max_page_size)
+
+    def encode_cursor(self, obj):
+        values = []
+        for field in self.ordering:
+            value = getattr(obj, field)
+            values.append(value.isoformat() if hasattr(value, 'isoformat') else str(value))
+        return base64.urlsafe_b64encode(json.dumps(values).encode()).decode().rstrip('=')
+
+    def decode_cursor(self, request, model):
+        encoded = query_params(request).get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            padded = encoded + '=' * (-len(encoded) % 4)
+            values = json.loads(base64.urlsafe_b64decode(padded.encode()).decode())
+            if not isinstance(values, list) or len(values) != len(self.ordering):
+                raise ValueError
+            return [
+                model._meta.get_field(field).to_python(value)
+                for field, value in zip(self.ordering, values)
+            ]
+        except (TypeError, ValueError, ValidationError, UnicodeDecodeError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def get_keyset_filter(self, values):
+        # (a, b) > (x, y)  <=>  a > x OR (a = x AND b > y)
+        condition = Q()
+        for index, field in enumerate(self.ordering):
+            term = Q(**{f'{field}__gt': values[index]})
+            for previous, value in zip(self.ordering[:index], values[:index]):
+                term &= Q(**{previous: value})
+            condition |= term
+        return condition
+
+    def get_window(self, queryset, request):
+        """
+        Rows from the requested cursor onwards, in page order.
+        """
+        cursor = self.decode_cursor(request, queryset.model)
+        queryset = queryset.order_by(*self.ordering)
+        if cursor is not None:
+            queryset = queryset.filter(self.get_keyset_filter(cursor))
+        return queryset
+
+    def get_page_queryset(self, queryset, request):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        # Fetch one extra row to know whether another page exists.
+        return self.get_window(queryset, request)[:self.page_size + 1]
+
+    def finish_page(self, rows):
+        if len(rows) > self.page_size:
+            rows = rows[:self.page_size]
+            self.next_cursor = self.encode_cursor(rows[-1])
+        else:
+            self.next_cursor = None
+        return rows
+
+    def paginate_queryset(self, queryset, request, view=None):
+        return self.finish_page(list(self.get_page_queryset(queryset, request)))
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        rows = [row async for row in self.get_page_queryset(queryset, request)]
+        return self.finish_page(rows)
+
+    def get_next_link(self):
+        if self.next_cursor is None:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.next_cursor)
@@ -0,0 +1,50 @@
+from django.utils import timezone
+
+from .cache import touch
+from .models import Payment, Ticket
+from .outbox import enqueue, handler
+
+
+PAYMENT_CONFIRMED = 'payment.confirmed'
+CONFIRMED = 'CONFIRMED'
+
+
+def enqueue_confirmation(payment):
+    """
+    Schedule the downstream work of a payment that just became confirmed.
+    Call inside the transaction that saved the new status.
+
+    The key carries the ``updated_at`` of that save, so a retried request
+    is stored once but a payment confirmed again after being un-confirmed
+    gets a new message.
+    """
+    key = f'{PAYMENT_CONFIRMED}:{payment.pk}:{payment.updated_at.isoformat()}'
+    enqueue(PAYMENT_CONFIRMED, key, {'payment_id': str(payment.pk)})
+
+
+@handler(PAYMENT_CONFIRMED)
+def confirm_payment(payload):
+    """
+    Stamp ``confirmed_at`` and mark the ticket of the paid registration as
+    changed, the ticket write ``PaymentDetailView.put`` used to do inside
+    the request.
+
+    Database only, so it commits or rolls back with the outbox row: a
+    replay, or a message of a confirmation withdrawn since, finds the
+    payment stamped or no longer confirmed and does nothing.
+    """
+    now = timezone.now()
+    stamped = Payment.objects.filter(
+        pk=payload['payment_id'],
+        payment_status=CONFIRMED,
+        confirmed_at__isnull=True,
+    ).update(confirmed_at=now, updated_at=now)
+    if not stamped:
+        return
+    ticket_id = (
+        Payment.objects.filter(pk=payload['payment_id'], registration__ticket__isnull=False)
+        .values_list('registration__ticket_id', flat=True).first()
+    )
+    if ticket_id is not None:
+        Ticket.objects.filter(pk=ticket_id).update(updated_at=now)
+        touch(tickets=[ticket_id], updated_at=now)
@@ -1,4 +1,8 @@
+import hmac
+
+from django.conf import settings
 from rest_framework.permissions import BasePermission
+from .roles import has_role
 
 class IsSuperUser(BasePermission):
 
@@ -13,14 +17,14 @@ class IsAdmin(BasePermission):
     Allows access to admin.
     """
     def has_permission(self, request, view):
-        return request.user and request.user.is_authenticated and request.user.groups.filter(name='admin').exists()
+        return has_role(request.user, 'admin')
     
 class IsUser(BasePermission):
     """
     Allows access to Organizer Events.
     """
     def has_permission(self, request, view):
-        return request.user and request.user.is_authenticated and request.user.groups.filter(name='user').exists()
+        return has_role(request.user, 'user')
     
 class IsAdminOrSuperUser(BasePermission):
     """
@@ -29,7 +33,7 @@ class IsAdminOrSuperUser(BasePermission):
     def has_permission(self, request, view):
         return (
             request.user and request.user.is_authenticated and (
-                request.user.is_superuser or request.user.groups.filter(name='admin').exists()
+                request.user.is_superuser or has_role(request.user, 'admin')
             )
         )
 
@@ -43,7 +47,15 @@ class IsOwnerOrAdminOrSuperUser(BasePermission):
             and request.user.is_authenticated 
             and (
                 request.user.is_superuser 
-                or request.user.groups.filter(name='admin').exists() 
+                or has_role(request.user, 'admin')
                 or obj == request.user
             )
-        )
\ No newline at end of file
+        )
+
+class HasMetricsToken(BasePermission):
+    """
+    Allows access to scrapers sending "Authorization: Metrics <METRICS_TOKEN>".
+    """
+    def has_permission(self, request, view):
+        header = request.META.get('HTTP_AUTHORIZATION', '')
+        return bool(settings.METRICS_TOKEN) and hmac.compare_digest(header, f'Metrics {settings.METRICS_TOKEN}')
@@ -0,0 +1,13 @@
+from rest_framework import renderers
+
+from .metrics import timed_serialization
+
+
+class JSONRenderer(renderers.JSONRenderer):
+    """
+    DRF's ``JSONRenderer``, with rendering counted as serializer time.
+    """
+
+    @timed_serialization
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return super().render(data, accepted_media_type, renderer_context)
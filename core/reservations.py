@@ -0,0 +1,195 @@
+from collections import Counter
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.exceptions import APIException, ValidationError
+
+from . import inventory
+from .availability import adjust
+from .cache import touch
+from .models import Event, Ticket, Reservation
+
+
+HOT_EVENT_MESSAGE = 'Seats of this event are sold from hot inventory, disable it first.'
+
+
+class TicketSoldOut(APIException):
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = 'Ticket is sold out.'
+    default_code = 'sold_out'
+
+
+class ReservationUnavailable(APIException):
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = 'Reservation has expired or was already used.'
+    default_code = 'reservation_unavailable'
+
+
+def take_inventory(ticket, count=1):
+    """
+    Take ``count`` seats from the ticket and its event.
+
+    Each decrement is a single conditional ``UPDATE ... WHERE quota >= count``,
+    so the row lock is held only for the statement instead of a
+    read-modify-write cycle and concurrent buyers can never push quota
+    below zero. Hot tickets (``core.inventory``) are checked against their
+    counters first, which stay in step with the rows.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        inventory.take(ticket, count)
+        taken = Ticket.objects.filter(pk=ticket.pk, quota__gte=count).update(
+            quota=F('quota') - count, updated_at=now
+        )
+        if not taken:
+            raise TicketSoldOut()
+        taken = Event.objects.filter(pk=ticket.event_id, quota__gte=count).update(
+            quota=F('quota') - count, updated_at=now
+        )
+        if not taken:
+            raise TicketSoldOut()
+        touch(tickets=[ticket.pk], events=[ticket.event_id], updated_at=now)
+
+
+def return_inventory(ticket, count=1):
+    """
+    Give ``count`` seats back to the ticket and its event.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        Ticket.objects.filter(pk=ticket.pk).update(quota=F('quota') + count, updated_at=now)
+        Event.objects.filter(pk=ticket.event_id).update(quota=F('quota') + count, updated_at=now)
+        touch(tickets=[ticket.pk], events=[ticket.event_id], updated_at=now)
+        inventory.give(ticket.pk, count)
+
+
+def change_quota(instance, quota):
+    """
+    Set the seats left on a Ticket or Event to ``quota`` as the caller read
+    them, applied as a delta so sales made since then are kept.
+
+    The row is never saved with the value read earlier: that would undo
+    every ``take_inventory`` that ran in between and sell those seats again.
+    """
+    delta = quota - instance.quota
+    if not delta:
+        return
+    if inventory.is_hot(instance.event_id if isinstance(instance, Ticket) else instance.pk):
+        raise ValidationError({'quota': HOT_EVENT_MESSAGE})
+    now = timezone.now()
+    changed = type(instance).objects.filter(pk=instance.pk, quota__gte=max(0, -delta)).update(
+        quota=F('quota') + delta, updated_at=now
+    )
+    if not changed:
+        raise ValidationError({'quota': 'Fewer seats are left than this would remove.'})
+    if isinstance(instance, Ticket):
+        touch(tickets=[instance.pk], updated_at=now)
+    else:
+        touch(events=[instance.pk], updated_at=now)
+    instance.refresh_from_db(fields=['quota', 'updated_at'])
+
+
+def delete_inventory(instance):
+    """
+    Delete a Ticket or Event. Refused while the event is hot: purchases in
+    the journal still point at its tickets.
+    """
+    event_id = instance.event_id if isinstance(instance, Ticket) else instance.pk
+    with transaction.atomic():
+        # enable() loads the event under the same row lock
+        Event.objects.select_for_update().filter(pk=event_id).first()
+        if inventory.is_hot(event_id):
+            raise ValidationError({'detail': HOT_EVENT_MESSAGE})
+        instance.delete()
+
+
+def hold_ticket(user, ticket, ttl=None):
+    """
+    Take one seat and keep it for ``user`` until the hold expires.
+    """
+    ttl = ttl or settings.RESERVATION_HOLD_TTL
+    with transaction.atomic():
+        take_inventory(ticket)
+        reservation = Reservation.objects.create(
+            user=user,
+            ticket=ticket,
+            expires_at=timezone.now() + ttl,
+        )
+        adjust(ticket.pk, ticket.event_id, reserved=1)
+        return reservation
+
+
+def confirm_hold(reservation_id, user, ticket):
+    """
+    Turn an active hold into a confirmed purchase.
+
+    The seat was already taken when the hold was created, so confirming only
+    flips the hold status. The caller records the sale.
+    """
+    confirmed = Reservation.objects.filter(
+        pk=reservation_id,
+        user=user,
+        ticket=ticket,
+        status=Reservation.HELD,
+        expires_at__gt=timezone.now(),
+    ).update(status=Reservation.CONFIRMED)
+    if not confirmed:
+        raise ReservationUnavailable()
+
+
+def cancel_hold(reservation):
+    """
+    Release a hold before it expires and give its seat back.
+    """
+    with transaction.atomic():
+        released = Reservation.objects.filter(
+            pk=reservation.pk, status=Reservation.HELD
+        ).update(status=Reservation.RELEASED)
+        if released:
+            return_inventory(reservation.ticket)
+            adjust(reservation.ticket_id, reservation.ticket.event_id, reserved=-1)
+    return bool(released)
+
+
+def release_expired_holds(now=None, batch_size=500):
+    """
+    Release expired holds in batches and give their seats back.
+
+    Rows are locked with ``SKIP LOCKED`` so several sweepers can run at once
+    and never wait on a hold that is being confirmed. Returns the number of
+    released holds.
+    """
+    now = now or timezone.now()
+    released = 0
+    while True:
+        with transaction.atomic():
+            rows = list(
+                Reservation.objects
+                .select_for_update(skip_locked=True)
+                .filter(status=Reservation.HELD, expires_at__lte=now)
+                .values_list('id', 'ticket_id')[:batch_size]
+            )
+            if not rows:
+                return released
+
+            Reservation.objects.filter(pk__in=[pk for pk, _ in rows]).update(status=Reservation.RELEASED)
+
+            per_ticket = Counter(ticket_id for _, ticket_id in rows)
+            per_event = Counter()
+            ticket_events = dict(Ticket.objects.filter(pk__in=per_ticket).values_list('id', 'event_id'))
+            for ticket_id, event_id in ticket_events.items():
+                per_event[event_id] += per_ticket[ticket_id]
+            updated_at = timezone.now()
+            for ticket_id, count in per_ticket.items():
+                Ticket.objects.filter(pk=ticket_id).update(quota=F('quota') + count, updated_at=updated_at)
+            for event_id, count in per_event.items():
+                Event.objects.filter(pk=event_id).update(quota=F('quota') + count, updated_at=updated_at)
+            touch(tickets=per_ticket, events=per_event, updated_at=updated_at)
+            for ticket_id, count in per_ticket.items():
+                adjust(ticket_id, ticket_events[ticket_id], reserved=-count)
+                inventory.give(ticket_id, count)
+
+            released += len(rows)
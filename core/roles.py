@@ -0,0 +1,112 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+from django.db.models import F
+
+
+ROLE_ATTR = '_role_names'
+
+# Role data is cached across requests, so it is always read from the
+# primary; a lagging replica would otherwise pin stale roles in the cache.
+
+
+def role_cache_key(user_id):
+    return f'user-roles:{user_id}'
+
+
+def role_version_cache_key(user_id):
+    return f'user-role-version:{user_id}'
+
+
+def get_roles(user):
+    """
+    Return the group names of ``user`` as a frozenset.
+
+    Names are kept on the user object for the rest of the request and in the
+    shared cache across requests, so stacked permission checks cost at most
+    one query per user until their groups change.
+    """
+    roles = getattr(user, ROLE_ATTR, None)
+    if roles is not None:
+        return roles
+
+    key = role_cache_key(user.pk)
+    roles = cache.get(key)
+    if roles is None:
+        roles = frozenset(user.groups.using(DEFAULT_DB_ALIAS).values_list('name', flat=True))
+        cache.set(key, roles, settings.ROLE_CACHE_TIMEOUT)
+    setattr(user, ROLE_ATTR, roles)
+    return roles
+
+
+def has_role(user, name):
+    return bool(user and user.is_authenticated and name in get_roles(user))
+
+
+async def aget_roles(user):
+    roles = getattr(user, ROLE_ATTR, None)
+    if roles is not None:
+        return roles
+
+    key = role_cache_key(user.pk)
+    roles = await cache.aget(key)
+    if roles is None:
+        roles = frozenset([name async for name in user.groups.using(DEFAULT_DB_ALIAS).values_list('name', flat=True)])
+        await cache.aset(key, roles, settings.ROLE_CACHE_TIMEOUT)
+    setattr(user, ROLE_ATTR, roles)
+    return roles
+
+
+async def ahas_role(user, name):
+    return bool(user and user.is_authenticated and name in await aget_roles(user))
+
+
+def get_role_version(user_id):
+    """
+    Return the current role version of a user, cached like the role names.
+    ``None`` when the user is gone or inactive.
+    """
+    from .models import User
+
+    key = role_version_cache_key(user_id)
+    version = cache.get(key)
+    if version is None:
+        version = User.objects.using(DEFAULT_DB_ALIAS).filter(pk=user_id, is_active=True).values_list('role_version', flat=True).first()
+        if version is None:
+            return None
+        cache.set(key, version, settings.ROLE_CACHE_TIMEOUT)
+    return version
+
+
+async def aget_role_version(user_id):
+    from .models import User
+
+    key = role_version_cache_key(user_id)
+    version = await cache.aget(key)
+    if version is None:
+        version = await User.objects.using(DEFAULT_DB_ALIAS).filter(pk=user_id, is_active=True).values_list('role_version', flat=True).afirst()
+        if version is None:
+            return None
+        await cache.aset(key, version, settings.ROLE_CACHE_TIMEOUT)
+    return version
+
+
+def bump_role_version(user_ids, users=()):
+    """
+    Revoke role claims embedded in tokens already issued to these users.
+
+    ``users`` are instances the caller still holds; they get the new version
+    so saving them later doesn't write the old one back.
+    """
+    from .models import User
+
+    User.objects.filter(pk__in=user_ids).update(role_version=F('role_version') + 1)
+    for user in users:
+        user.refresh_from_db(fields=['role_version'])
+
+
+def invalidate_roles(user_ids):
+    keys = []
+    for user_id in user_ids:
+        keys += [role_cache_key(user_id), role_version_cache_key(user_id)]
+    cache.delete_many(keys)
@@ -0,0 +1,97 @@
+import random
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.utils.functional import LazyObject
+
+
+_routing = ContextVar('replica_routing', default=None)
+
+
+def sticky_key(user_id):
+    return f'replica-sticky:{user_id}'
+
+
+def request_user(request):
+    # Only a user set by DRF/async authentication; resolving Django's lazy
+    # session user here would itself run a query through the router.
+    user = request.__dict__.get('user')
+    if user is None or isinstance(user, LazyObject) or not user.is_authenticated:
+        return None
+    return user
+
+
+class RequestRouting:
+    """
+    Routing state of one request, see ``ReplicaRoutingMiddleware``.
+
+    Reads go to one replica per request, picked once so the ETag check and
+    the body see the same snapshot, unless the view isn't marked
+    ``read_from_replica``, the request already wrote, a transaction is
+    open, or the user wrote within ``REPLICA_STICKY_SECONDS``.
+    """
+
+    def __init__(self, request):
+        self.request = request
+        self.replica_reads = False
+        self.wrote = False
+        self.alias = None
+        self.sticky = None
+
+    def read_alias(self):
+        if not self.replica_reads or self.wrote or connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return None
+        if self.is_sticky():
+            return None
+        if self.alias is None:
+            self.alias = random.choice(settings.REPLICA_DATABASES)
+        return self.alias
+
+    def is_sticky(self):
+        if self.sticky is None:
+            user = request_user(self.request)
+            if user is None:
+                # Not authenticated yet, check again on the next query
+                return False
+            self.sticky = cache.get(sticky_key(user.pk)) is not None
+        return self.sticky
+
+    def finish(self):
+        user = request_user(self.request)
+        if self.wrote and user is not None:
+            cache.set(sticky_key(user.pk), 1, settings.REPLICA_STICKY_SECONDS)
+
+
+def start_request(request):
+    state = RequestRouting(request) if settings.REPLICA_DATABASES else None
+    _routing.set(state)
+    return state
+
+
+def end_request():
+    _routing.set(None)
+
+
+class PrimaryReplicaRouter:
+    """
+    Send reads of replica-enabled GET views to ``REPLICA_DATABASES`` and
+    everything else, including every write, to ``default``.
+    """
+
+    def db_for_read(self, model, **hints):
+        state = _routing.get()
+        if state is None:
+            return None
+        return state.read_alias() or DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        state = _routing.get()
+        if state is not None:
+            state.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same rows as the primary
+        return True
@@ -0,0 +1,26 @@
+from django.db.models import Q
+
+
+RANGE_FILTERS = {
+    'start_time_after': 'start_time__gte',
+    'start_time_before': 'start_time__lte',
+    'end_time_after': 'end_time__gte',
+    'end_time_before': 'end_time__lte',
+}
+
+
+def filter_events(queryset, filters):
+    """
+    Apply validated ``EventFilterSerializer`` data to an Event queryset.
+    """
+    for field in ('status', 'category', 'location'):
+        if filters.get(field):
+            queryset = queryset.filter(**{field: filters[field]})
+    for param, lookup in RANGE_FILTERS.items():
+        if filters.get(param):
+            queryset = queryset.filter(**{lookup: filters[param]})
+    if filters.get('q'):
+        # Served by the pg_trgm indexes of migration 0002 on PostgreSQL
+        query = filters['q']
+        queryset = queryset.filter(Q(name__icontains=query) | Q(description__icontains=query))
+    return queryset
@@ -0,0 +1,160 @@
+import random
+from datetime import timedelta
+from itertools import cycle
+
+from django.utils import timezone
+
+from .availability import rebuild_availability
+from .models import User, Event, Ticket, Registration, Payment
+
+
+def seed_dataset(rows, prefix='seed'):
+    """
+    Insert ``rows`` users, events, tickets, registrations and payments with
+    ``bulk_create`` and return a superuser that can call every endpoint.
+
+    Used by the benchmark commands, usually inside a transaction that is
+    rolled back afterwards, and by the query-budget tests.
+    """
+    now = timezone.now()
+    stamp = f'{prefix}-{now.timestamp()}'
+    admin = User.objects.create(username=stamp, is_superuser=True)
+    users = User.objects.bulk_create([User(username=f'{stamp}-{i}') for i in range(rows)])
+    event = Event.objects.create(
+        name=stamp, description='', location='', status='PUBLISHED',
+        quota=rows, start_time=now, end_time=now + timedelta(hours=1), organizer=admin,
+    )
+    Event.objects.bulk_create([
+        Event(name=f'{stamp} {i}', description='', location='', status='PUBLISHED', quota=1,
+              start_time=now, end_time=now + timedelta(hours=1), organizer=admin)
+        for i in range(rows)
+    ])
+    tickets = Ticket.objects.bulk_create([
+        Ticket(name=f'{stamp} {i}', price=0, quota=1, sales_start=now,
+               sales_end=now + timedelta(hours=1), event=event)
+        for i in range(rows)
+    ])
+    registrations = Registration.objects.bulk_create([
+        Registration(user=user, ticket=ticket) for user, ticket in zip(users, tickets)
+    ])
+    Payment.objects.bulk_create([
+        Payment(registration=registration, payment_method='TRANSFER', payment_status='PENDING', amount_paid=0)
+        for registration in registrations
+    ])
+    # bulk_create skips the signals that create availability rows
+    rebuild_availability(Event.objects.filter(organizer=admin).values_list('id', flat=True))
+    return admin
+
+
+def seed_sales(rows, prefix='sales', batch_size=10000):
+    """
+    Insert one event with ``rows`` registrations, each with a payment, spread
+    over ticket types, payment methods and statuses. Every batch of
+    ``batch_size`` registrations is dated one hour earlier than the previous
+    one. Returns ``(admin, event)``.
+
+    Unlike ``seed_dataset`` nothing is built in memory up front, so it scales
+    to millions of rows.
+    """
+    now = timezone.now()
+    stamp = f'{prefix}-{now.timestamp()}'
+    admin = User.objects.create(username=stamp, is_superuser=True)
+    users = User.objects.bulk_create([User(username=f'{stamp}-{i}') for i in range(min(rows, 1000))])
+    event = Event.objects.create(
+        name=stamp, description='', location='', status='PUBLISHED',
+        quota=rows, start_time=now, end_time=now + timedelta(hours=1), organizer=admin,
+    )
+    tickets = Ticket.objects.bulk_create([
+        Ticket(name=f'{stamp} {type}', type=type, price=price, quota=rows, sales_start=now,
+               sales_end=now + timedelta(hours=1), event=event)
+        for type, price in (('REGULAR', 50000), ('VIP', 150000), ('EARLY_BIRD', 35000))
+    ])
+
+    user_cycle, ticket_cycle = cycle(users), cycle(tickets)
+    method_cycle = cycle(['TRANSFER', 'CREDIT_CARD', 'E_WALLET', 'VIRTUAL_ACCOUNT'])
+    status_cycle = cycle(['CONFIRMED', 'CONFIRMED', 'PENDING', 'FAILED'])
+    for hour, start in enumerate(range(0, rows, batch_size)):
+        count = min(batch_size, rows - start)
+        registrations = Registration.objects.bulk_create([
+            Registration(user=next(user_cycle), ticket=next(ticket_cycle)) for _ in range(count)
+        ])
+        Registration.objects.filter(pk__in=[registration.pk for registration in registrations]).update(
+            created_at=now - timedelta(hours=hour)
+        )
+        Payment.objects.bulk_create([
+            Payment(registration=registration, payment_method=next(method_cycle),
+                    payment_status=next(status_cycle), amount_paid=registration.ticket.price)
+            for registration in registrations
+        ])
+    rebuild_availability([event.pk])
+    return admin, event
+
+
+def seed_volume(users, events, tickets_per_event=3, registrations=0, paid_ratio=0.8,
+                prefix='volume', batch_size=5000, seed=0):
+    """
+    Insert a production-like mix for load tests: ``users`` attendees,
+    ``events`` events spread over the next 90 days with varied status,
+    category and location, ``tickets_per_event`` ticket types each, and
+    ``registrations`` registrations on random tickets, ``paid_ratio`` of them
+    with a payment. Returns a superuser that owns every event.
+
+    Rows are generated and inserted ``batch_size`` at a time from a fixed
+    ``seed``, so two runs with the same arguments build the same shape.
+    """
+    rng = random.Random(seed)
+    now = timezone.now()
+    stamp = f'{prefix}-{now.timestamp()}'
+    admin = User.objects.create(username=stamp, is_superuser=True)
+
+    user_ids = []
+    for start in range(0, users, batch_size):
+        batch = [User(username=f'{stamp}-{i}') for i in range(start, min(start + batch_size, users))]
+        user_ids += [user.pk for user in User.objects.bulk_create(batch)]
+
+    categories = ['MUSIC', 'TECH', 'SPORT', 'ART', 'EDUCATION', None]
+    locations = ['Jakarta', 'Bandung', 'Surabaya', 'Yogyakarta', 'Online']
+    statuses = ['PUBLISHED'] * 8 + ['DRAFT', 'CANCELLED']
+    ticket_types = [('REGULAR', 50000), ('VIP', 150000), ('EARLY_BIRD', 35000), ('FREE', 0)]
+    tickets = []
+    for start in range(0, events, batch_size):
+        batch = []
+        for i in range(start, min(start + batch_size, events)):
+            start_time = now + timedelta(hours=rng.randrange(24 * 90))
+            batch.append(Event(
+                name=f'{stamp} {i}', description='', location=rng.choice(locations),
+                status=rng.choice(statuses), category=rng.choice(categories), quota=registrations or 100,
+                start_time=start_time, end_time=start_time + timedelta(hours=rng.choice([2, 4, 8])),
+                organizer=admin,
+            ))
+        Event.objects.bulk_create(batch)
+        batch = [
+            Ticket(name=f'{event.name} {type}', type=type, price=price, quota=registrations or 100,
+                   sales_start=now, sales_end=event.start_time, event=event)
+            for event in batch
+            for type, price in ticket_types[:tickets_per_event]
+        ]
+        tickets += [(ticket.pk, ticket.price) for ticket in Ticket.objects.bulk_create(batch)]
+
+    methods = ['TRANSFER', 'CREDIT_CARD', 'E_WALLET', 'VIRTUAL_ACCOUNT']
+    payment_statuses = ['CONFIRMED'] * 3 + ['PENDING', 'FAILED']
+    for start in range(0, registrations if user_ids and tickets else 0, batch_size):
+        picked = [rng.choice(tickets) for _ in range(min(batch_size, registrations - start))]
+        created = Registration.objects.bulk_create([
+            Registration(user_id=rng.choice(user_ids), ticket_id=ticket_id) for ticket_id, _ in picked
+        ])
+        Payment.objects.bulk_create([
+            Payment(registration=registration, payment_method=rng.choice(methods),
+                    payment_status=rng.choice(payment_statuses), amount_paid=price)
+            for registration, (_, price) in zip(created, picked)
+            if rng.random() < paid_ratio
+        ])
+    rebuild_availability(Event.objects.filter(organizer=admin).values_list('id', flat=True))
+    return admin
+
+
+def delete_dataset(admin):
+    """
+    Remove everything created by ``seed_dataset`` for ``admin``.
+    """
+    User.objects.filter(username__startswith=admin.username).delete()
@@ -1,8 +1,28 @@
 from rest_framework import serializers
-from .models import User, Event, Registration, Ticket, Payment
+from .models import User, Event, Registration, Ticket, Payment, Reservation
+from . import inventory
+from .reservations import take_inventory, return_inventory, confirm_hold, change_quota, HOT_EVENT_MESSAGE
+from .availability import adjust, confirmed_amount, rebuild_availability
+from django.db import transaction
 from datetime import date, datetime
 from rest_framework.reverse import reverse
 from django.contrib.auth.models import Group
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
+
+def update_keeping_quota(instance, validated_data):
+    """
+    ``ModelSerializer.update`` for models whose ``quota`` is the live count
+    of seats left: every other field is saved with ``update_fields`` and a
+    new quota goes through ``change_quota``.
+    """
+    quota = validated_data.pop('quota', None)
+    for attr, value in validated_data.items():
+        setattr(instance, attr, value)
+    with transaction.atomic():
+        instance.save(update_fields=[*validated_data, 'updated_at'])
+        if quota is not None:
+            change_quota(instance, quota)
+    return instance
 
 class UserSerializer(serializers.ModelSerializer):
     class Meta:
@@ -94,7 +114,7 @@ class EventSerializer(serializers.ModelSerializer):
         if organizer_id:
             organizer = User.objects.get(pk=organizer_id)
             validated_data['organizer'] = organizer
-        return super().update(instance, validated_data)
+        return update_keeping_quota(instance, validated_data)
     
     def validate(self, data):
         start_date = data.get('start_date')
@@ -108,6 +128,27 @@ class EventSerializer(serializers.ModelSerializer):
 
         return data
     
+class EventFilterSerializer(serializers.Serializer):
+    status = serializers.CharField(required=False)
+    category = serializers.CharField(required=False)
+    location = serializers.CharField(required=False)
+    start_time_after = serializers.DateTimeField(required=False)
+    start_time_before = serializers.DateTimeField(required=False)
+    end_time_after = serializers.DateTimeField(required=False)
+    end_time_before = serializers.DateTimeField(required=False)
+    # Minimal 3 huruf supaya bisa pakai trigram index di PostgreSQL
+    q = serializers.CharField(required=False, min_length=3)
+    ordering = serializers.ChoiceField(choices=['created_at', 'start_time'], required=False, default='created_at')
+
+class StatsFilterSerializer(serializers.Serializer):
+    start = serializers.DateField(required=False)
+    end = serializers.DateField(required=False)
+
+    def validate(self, attrs):
+        if attrs.get('start') and attrs.get('end') and attrs['start'] > attrs['end']:
+            raise serializers.ValidationError({'end': 'End date must not be before start date.'})
+        return attrs
+
 class RegistrationSerializer(serializers.ModelSerializer):
     user_id = serializers.PrimaryKeyRelatedField(
         write_only=True,
@@ -119,6 +160,8 @@ class RegistrationSerializer(serializers.ModelSerializer):
         source='ticket',
         queryset=Ticket.objects.all()
     )
+    # Optional hold created through /api/reservations/, the seat is already taken
+    reservation_id = serializers.UUIDField(write_only=True, required=False)
 
     class Meta:
         model = Registration
@@ -130,10 +173,36 @@ class RegistrationSerializer(serializers.ModelSerializer):
 
     def create(self, validated_data):
         # Setelah menggunakan PrimaryKeyRelatedField, DRF sudah mengubah UUID menjadi instance
-        return super().create(validated_data)
+        reservation_id = validated_data.pop('reservation_id', None)
+        ticket = validated_data['ticket']
+        with transaction.atomic():
+            if reservation_id:
+                confirm_hold(reservation_id, validated_data['user'], ticket)
+            else:
+                # Tiket hot: dijual dari counter, row ditulis belakangan oleh flusher
+                registration = inventory.purchase(validated_data['user'], ticket)
+                if registration is not None:
+                    return registration
+                take_inventory(ticket)
+            registration = super().create(validated_data)
+            adjust(ticket.pk, ticket.event_id, sold=1, reserved=-1 if reservation_id else 0)
+            return registration
 
     def update(self, instance, validated_data):
-        return super().update(instance, validated_data)
+        validated_data.pop('reservation_id', None)
+        ticket = validated_data.get('ticket')
+        with transaction.atomic():
+            # Pindah ticket -> ambil seat baru, kembalikan seat lama
+            if ticket is not None and ticket.pk != instance.ticket_id:
+                old_ticket = instance.ticket
+                # Pembayaran yang sudah CONFIRMED ikut pindah ke ticket baru
+                revenue = confirmed_amount(getattr(instance, 'payment', None))
+                take_inventory(ticket)
+                if old_ticket is not None:
+                    return_inventory(old_ticket)
+                    adjust(old_ticket.pk, old_ticket.event_id, sold=-1, revenue=-revenue)
+                adjust(ticket.pk, ticket.event_id, sold=1, revenue=revenue)
+            return super().update(instance, validated_data)
 
 class TicketSerializer(serializers.ModelSerializer):
     event_id = serializers.UUIDField(write_only=True)
@@ -146,17 +215,28 @@ class TicketSerializer(serializers.ModelSerializer):
     def create(self, validated_data):
         event_id = validated_data.pop('event_id')
         event = Event.objects.get(pk=event_id)
+        if inventory.is_hot(event.pk):
+            raise serializers.ValidationError({'event_id': HOT_EVENT_MESSAGE})
         validated_data['event'] = event
         return super().create(validated_data)
 
     def update(self, instance, validated_data):
         event_id = validated_data.pop('event_id', None)
+        old_event_id = instance.event_id
         if event_id:
             event = Event.objects.get(pk=event_id)
+            if event.pk != old_event_id and (inventory.is_hot(old_event_id) or inventory.is_hot(event.pk)):
+                raise serializers.ValidationError({'event_id': HOT_EVENT_MESSAGE})
             validated_data['event'] = event
-        return super().update(instance, validated_data)
+        with transaction.atomic():
+            ticket = update_keeping_quota(instance, validated_data)
+            # Ticket pindah event -> hitung ulang counter kedua event
+            if ticket.event_id != old_event_id:
+                rebuild_availability([old_event_id, ticket.event_id])
+            return ticket
     def get_event(self, obj):
-        return str(obj.event.id)
+        # event_id sudah ada di row ticket, tidak perlu load Event
+        return str(obj.event_id)
 
     
 class PaymentSerializer(serializers.ModelSerializer):
@@ -171,6 +251,27 @@ class PaymentSerializer(serializers.ModelSerializer):
         fields = ['id', 'registration', 'registration_id', 'payment_method', 'payment_status', 'amount_paid', 'created_at', 'updated_at']
         read_only_fields = ['id', 'registration', 'created_at', 'updated_at']
 
+class RegistrationBulkSerializer(serializers.Serializer):
+    # Plain UUIDs, users and tickets are resolved in bulk by core.bulk
+    user_id = serializers.UUIDField()
+    ticket_id = serializers.UUIDField()
+
+class ReservationSerializer(serializers.ModelSerializer):
+    ticket_id = serializers.PrimaryKeyRelatedField(
+        write_only=True,
+        source='ticket',
+        queryset=Ticket.objects.all()
+    )
+
+    class Meta:
+        model = Reservation
+        fields = ['id', 'ticket', 'ticket_id', 'user', 'status', 'expires_at', 'created_at']
+        read_only_fields = ['id', 'ticket', 'user', 'status', 'expires_at', 'created_at']
+
+class QueueJoinSerializer(serializers.Serializer):
+    # No database lookup, the waiting room store knows which tickets have a queue
+    ticket_id = serializers.UUIDField()
+
 class GroupSerializer(serializers.ModelSerializer):
     class Meta:
         model = Group
@@ -179,4 +280,19 @@ class GroupSerializer(serializers.ModelSerializer):
 
 class AssignRoleSerializer(serializers.Serializer):
     user_id = serializers.UUIDField()
-    group_id = serializers.IntegerField()
\ No newline at end of file
+    group_id = serializers.IntegerField()
+
+
+class RoleTokenObtainPairSerializer(TokenObtainPairSerializer):
+    """
+    Embeds identity and role claims so StatelessJWTAuthentication can
+    authorize requests without loading the user.
+    """
+    @classmethod
+    def get_token(cls, user):
+        token = super().get_token(user)
+        token['username'] = user.username
+        token['is_superuser'] = user.is_superuser
+        token['roles'] = sorted(user.groups.values_list('name', flat=True))
+        token['role_version'] = user.role_version
+        return token
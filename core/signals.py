@@ -0,0 +1,123 @@
+from django.db import transaction
+from django.contrib.auth.models import Group
+from django.core.signals import request_finished
+from django.db.models.signals import pre_save, post_save, post_delete, pre_delete, m2m_changed
+from django.dispatch import receiver
+
+from . import feed, inventory
+from .cache import event_cache, ticket_cache
+from .analytics import hour_of
+from .models import User, Event, Ticket, Registration, EventAvailability, TicketAvailability, StaleRollupBucket
+from .roles import invalidate_roles, bump_role_version
+
+
+@receiver(post_save, sender=Event)
+def create_event_availability(sender, instance, created, **kwargs):
+    if created:
+        EventAvailability.objects.get_or_create(event=instance)
+
+
+@receiver(post_save, sender=Ticket)
+def create_ticket_availability(sender, instance, created, **kwargs):
+    if created:
+        TicketAvailability.objects.get_or_create(ticket=instance)
+
+
+@receiver(post_save, sender=Event)
+def refresh_event_cache(sender, instance, **kwargs):
+    pk, version = instance.pk, instance.updated_at.isoformat()
+    transaction.on_commit(lambda: event_cache.set_version(pk, version))
+
+
+@receiver(post_delete, sender=Event)
+def invalidate_event_cache(sender, instance, **kwargs):
+    # instance.pk is cleared once the delete finishes
+    pk = instance.pk
+    transaction.on_commit(lambda: event_cache.invalidate(pk))
+
+
+@receiver(post_save, sender=Event)
+@receiver(post_delete, sender=Event)
+def update_feed(sender, instance, **kwargs):
+    # Quota changes made with QuerySet.update() show up on the next rebuild
+    pk = instance.pk
+    transaction.on_commit(lambda: feed.update([pk]))
+
+
+@receiver(post_save, sender=Ticket)
+def refresh_ticket_cache(sender, instance, **kwargs):
+    pk, version = instance.pk, instance.updated_at.isoformat()
+    transaction.on_commit(lambda: ticket_cache.set_version(pk, version))
+
+
+@receiver(post_delete, sender=Ticket)
+def invalidate_ticket_cache(sender, instance, **kwargs):
+    pk = instance.pk
+    transaction.on_commit(lambda: ticket_cache.invalidate(pk))
+
+
+@receiver(m2m_changed, sender=User.groups.through)
+def invalidate_user_roles(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'pre_clear', 'post_clear'):
+        return
+    users = ()
+    if not reverse:
+        # user.groups.add(...) -> instance is the user
+        user_ids, users = [instance.pk], [instance]
+    elif action == 'pre_clear':
+        # group.user_set.clear() -> pk_set is empty, remember members before they go
+        instance._cleared_user_ids = list(instance.user_set.values_list('pk', flat=True))
+        return
+    elif action == 'post_clear':
+        user_ids = getattr(instance, '_cleared_user_ids', [])
+    else:
+        user_ids = list(pk_set or ())
+    bump_role_version(user_ids, users)
+    transaction.on_commit(lambda: invalidate_roles(user_ids))
+
+
+@receiver(pre_save, sender=User)
+def revoke_changed_user_tokens(sender, instance, raw=False, **kwargs):
+    # Token claims carry is_superuser, and an inactive user must be refused
+    if raw or instance._state.adding:
+        return
+    row = User.objects.filter(pk=instance.pk).values('is_superuser', 'is_active', 'role_version').first()
+    if row is None or (row['is_superuser'], row['is_active']) == (instance.is_superuser, instance.is_active):
+        return
+    instance.role_version = row['role_version'] + 1
+    user_ids = [instance.pk]
+    transaction.on_commit(lambda: invalidate_roles(user_ids))
+
+
+@receiver(post_save, sender=Group)
+def invalidate_group_roles(sender, instance, created, **kwargs):
+    if created:
+        return
+    # Group renamed -> every member resolves a different role name
+    user_ids = list(instance.user_set.values_list('pk', flat=True))
+    bump_role_version(user_ids)
+    transaction.on_commit(lambda: invalidate_roles(user_ids))
+
+
+@receiver(pre_delete, sender=Group)
+def invalidate_deleted_group_roles(sender, instance, **kwargs):
+    user_ids = list(instance.user_set.values_list('pk', flat=True))
+    bump_role_version(user_ids)
+    transaction.on_commit(lambda: invalidate_roles(user_ids))
+
+
+@receiver(pre_save, sender=Registration)
+def mark_moved_registration_rollup(sender, instance, raw=False, **kwargs):
+    # The rollup refresh finds a changed registration under its new event only
+    if raw or instance._state.adding:
+        return
+    row = Registration.objects.filter(pk=instance.pk).values_list('ticket_id', 'ticket__event_id', 'created_at').first()
+    if row is None or row[0] == instance.ticket_id or row[1] is None:
+        return
+    StaleRollupBucket.objects.create(event_id=row[1], bucket=hour_of(row[2]))
+
+
+@receiver(request_finished)
+def settle_inventory(sender, **kwargs):
+    # Seats taken from the hot counters by a transaction that rolled back
+    inventory.settle()
@@ -1,3 +1,1100 @@
-from django.test import TestCase
+import csv
+import json
+import threading
+import time
+import tracemalloc
+import uuid
+from contextlib import ExitStack
+from io import StringIO
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+
+from django.contrib.auth.hashers import get_hasher
+from django.contrib.auth.models import Group
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.test import AsyncRequestFactory, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.exceptions import PermissionDenied
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient, APIRequestFactory, force_authenticate
+from rest_framework_simplejwt.authentication import JWTAuthentication
+
+from . import feed, idempotency, inventory, views, waiting_room
+from .analytics import RAW, ROLLUP, dashboard_stats, rollups_as_of
+from .async_views import ASYNC_VARIANTS
+from .cache import ReadThroughCache, event_cache
+from .models import User, Event, Ticket, Registration, Payment, OutboxMessage, TicketAvailability, EventAvailability, EventRollup
+from .reservations import take_inventory, hold_ticket
+from .routers import RequestRouting, sticky_key
+from .seed import seed_dataset
+from .fast_serializers import EventFastSerializer, TicketFastSerializer, RegistrationFastSerializer, PaymentFastSerializer
+from .serializers import EventSerializer, TicketSerializer, RegistrationSerializer, PaymentSerializer, RoleTokenObtainPairSerializer
+from .outbox import process_batch
+from .throttling import TokenBucketThrottle, get_store, password_limiter
+from .metrics import registry as metrics_registry
+
+
+def make_event(quota=10, ticket_quota=2):
+    organizer = User.objects.create_superuser('organizer', 'organizer@example.com', 'pw')
+    now = timezone.now()
+    event = Event.objects.create(
+        name='Event', description='Event', location='Jakarta', status='PUBLISHED', quota=quota,
+        start_time=now + timedelta(days=1), end_time=now + timedelta(days=1, hours=2), organizer=organizer,
+    )
+    ticket = Ticket.objects.create(
+        name='Regular', price=100, quota=ticket_quota, sales_start=now,
+        sales_end=now + timedelta(days=1), event=event,
+    )
+    client = APIClient()
+    client.force_authenticate(organizer)
+    return organizer, event, ticket, client
+
+
+class QuotaUpdateTests(TestCase):
+    def test_update_keeps_concurrent_sales(self):
+        organizer, event, ticket, client = make_event(ticket_quota=2)
+        stale = Ticket.objects.get(pk=ticket.pk)
+        take_inventory(ticket)
+        take_inventory(ticket)
+        response = client.put(f'/api/tickets/{ticket.pk}', {'name': 'Renamed'}, format='json')
+        self.assertEqual(response.status_code, 200, response.content)
+        ticket.refresh_from_db()
+        self.assertEqual((ticket.name, ticket.quota), ('Renamed', 0))
+
+        # A copy read before the sales, as a PUT racing them would hold
+        serializer = TicketSerializer(stale, data={'name': 'Stale'}, partial=True)
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+        ticket.refresh_from_db()
+        self.assertEqual(ticket.quota, 0)
+
+    def test_quota_change_is_a_guarded_delta(self):
+        organizer, event, ticket, client = make_event(quota=10, ticket_quota=5)
+        stale = Event.objects.get(pk=event.pk)
+        take_inventory(ticket)
+        serializer = EventSerializer(stale, data={'quota': 12}, partial=True)
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+        event.refresh_from_db()
+        # 10 read, 12 asked: +2 on top of the 9 left after the sale
+        self.assertEqual(event.quota, 11)
+
+        response = client.put(f'/api/tickets/{ticket.pk}', {'quota': -1}, format='json')
+        self.assertEqual(response.status_code, 400)
+        response = client.put(f'/api/tickets/{ticket.pk}', {'quota': 0}, format='json')
+        self.assertEqual(response.status_code, 200, response.content)
+        ticket.refresh_from_db()
+        self.assertEqual(ticket.quota, 0)
+
+
+def access_token(user):
+    return str(RoleTokenObtainPairSerializer.get_token(user).access_token)
+
+
+class RoleQueryTests(TestCase):
+    """
+    Authentication plus every permission check of a protected endpoint runs
+    a fixed number of queries, whatever the number of groups or checks.
+    """
+    # (view, method) guarded by IsAdminOrSuperUser / IsOwnerOrAdminOrSuperUser
+    ADMIN_ENDPOINTS = [
+        (views.UserView, 'get'),
+        (views.UserView, 'delete'),
+        (views.UserDetailView, 'get'),
+        (views.EventView, 'post'),
+        (views.EventDetailView, 'put'),
+        (views.EventRegistrationExportView, 'get'),
+        (views.RegistrationView, 'get'),
+        (views.RegistrationBulkView, 'post'),
+        (views.RegistrationDetailView, 'get'),
+        (views.TicketView, 'post'),
+        (views.TicketBulkView, 'post'),
+        (views.TicketDetailView, 'put'),
+        (views.PaymentView, 'get'),
+        (views.PaymentDetailView, 'get'),
+    ]
+    SUPERUSER_ENDPOINTS = [
+        (views.GroupListCreateView, 'get'),
+        (views.GroupDetailView, 'get'),
+        (views.AssignRoleView, 'post'),
+        (views.CacheStatsView, 'get'),
+        (views.MetricsView, 'get'),
+    ]
+
+    def setUp(self):
+        cache.clear()
+        self.admin = User.objects.create_user('admin', 'admin@example.com', 'pw')
+        groups = [Group.objects.create(name=name) for name in ('admin', 'user', 'staff', 'finance', 'support')]
+        self.admin.groups.add(*groups)
+        self.superuser = User.objects.create_superuser('root', 'root@example.com', 'pw')
+
+    def authorize(self, view_class, method, token):
+        """
+        Run authentication, permission and throttle checks of the endpoint
+        the way ``dispatch`` does, without the handler.
+        """
+        view = view_class()
+        view.args, view.kwargs, view.format_kwarg, view.headers = (), {}, None, {}
+        request = getattr(APIRequestFactory(), method)('/', HTTP_AUTHORIZATION=f'Bearer {token}')
+        request = view.initialize_request(request)
+        view.request = request
+        view.initial(request)
+        if view_class is views.UserDetailView:
+            view.check_object_permissions(request, self.superuser)
+
+    def expected_queries(self, view_class):
+        # JWTAuthentication loads the user row, StatelessJWTAuthentication
+        # only checks the cached role version
+        return 1 if JWTAuthentication in view_class.authentication_classes else 0
+
+    def test_admin_endpoints(self):
+        token = access_token(self.admin)
+        for view_class, method in self.ADMIN_ENDPOINTS:
+            with self.subTest(view=view_class.__name__, method=method):
+                cache.clear()
+                # Cold cache: one query for the role version or the groups
+                with self.assertNumQueries(self.expected_queries(view_class) + 1):
+                    self.authorize(view_class, method, token)
+                with self.assertNumQueries(self.expected_queries(view_class)):
+                    self.authorize(view_class, method, token)
+
+    def test_superuser_endpoints(self):
+        token, refused = access_token(self.superuser), access_token(self.admin)
+        for view_class, method in self.SUPERUSER_ENDPOINTS:
+            with self.subTest(view=view_class.__name__, method=method):
+                with self.assertNumQueries(self.expected_queries(view_class)):
+                    self.authorize(view_class, method, token)
+                # Roles aren't looked up to refuse an admin either
+                with self.assertNumQueries(self.expected_queries(view_class)), self.assertRaises(PermissionDenied):
+                    self.authorize(view_class, method, refused)
+
+    def test_assigned_role_applies_immediately(self):
+        member = User.objects.create_user('member', 'member@example.com', 'pw')
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {access_token(member)}')
+        # Warm both caches with the old roles
+        self.assertEqual(client.get('/api/users/').status_code, 403)
+        self.assertEqual(client.get('/api/registrations/').status_code, 403)
+
+        root = APIClient()
+        root.credentials(HTTP_AUTHORIZATION=f'Bearer {access_token(self.superuser)}')
+        with self.captureOnCommitCallbacks(execute=True):
+            response = root.post('/api/assign-roles/', {
+                'user_id': str(member.pk), 'group_id': Group.objects.get(name='admin').pk,
+            }, format='json')
+        self.assertEqual(response.status_code, 201, response.content)
+
+        # Loaded user: the cached role names were dropped
+        self.assertEqual(client.get('/api/users/').status_code, 200)
+        # Role claims in the old token: refused until the member logs in again
+        self.assertEqual(client.get('/api/registrations/').status_code, 401)
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {access_token(User.objects.get(pk=member.pk))}')
+        self.assertEqual(client.get('/api/registrations/').status_code, 200)
+
+    def test_saving_a_user_keeps_the_bumped_version(self):
+        version = self.admin.role_version
+        self.admin.groups.remove(Group.objects.get(name='finance'))
+        self.admin.first_name = 'Renamed'
+        self.admin.save()
+        self.assertEqual(User.objects.get(pk=self.admin.pk).role_version, version + 1)
+
+    def test_demoted_or_deactivated_user_is_refused(self):
+        boss = User.objects.create_superuser('boss', 'boss@example.com', 'pw')
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {access_token(boss)}')
+        self.assertEqual(client.get('/api/registrations/').status_code, 200)
+        root = APIClient()
+        root.credentials(HTTP_AUTHORIZATION=f'Bearer {access_token(self.superuser)}')
+        with self.captureOnCommitCallbacks(execute=True):
+            response = root.put(f'/api/users/{boss.pk}', {
+                'username': 'boss', 'password': 'pw', 'is_superuser': False,
+            }, format='json')
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual(client.get('/api/registrations/').status_code, 401)
+
+        member = User.objects.get(pk=self.admin.pk)
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {access_token(member)}')
+        self.assertEqual(client.get('/api/registrations/').status_code, 200)
+        member.is_active = False
+        with self.captureOnCommitCallbacks(execute=True):
+            member.save()
+        self.assertEqual(client.get('/api/registrations/').status_code, 401)
+
+
+class KeysetPaginationTests(TestCase):
+    def test_pages_follow_a_stable_order(self):
+        organizer, event, ticket, client = make_event()
+        for i in range(6):
+            Event.objects.create(
+                name=f'Event {i}', description='', location='', status='PUBLISHED', quota=1,
+                start_time=event.start_time, end_time=event.end_time, organizer=organizer,
+            )
+        # Ties on created_at are broken by id
+        Event.objects.update(created_at=timezone.now() - timedelta(hours=1))
+        expected = [str(pk) for pk in Event.objects.order_by('created_at', 'id').values_list('pk', flat=True)]
+
+        ids, url = [], '/api/events/?page_size=3'
+        while url:
+            page = client.get(url).json()
+            ids += [item['id'] for item in page['events']]
+            url = page['next']
+            if len(ids) == 3:
+                # Created while paging: lands after the rows already seen
+                late = Event.objects.create(
+                    name='Late', description='', location='', status='PUBLISHED', quota=1,
+                    start_time=event.start_time, end_time=event.end_time, organizer=organizer,
+                )
+        self.assertEqual(ids, [*expected, str(late.pk)])
+
+    def test_tampered_cursor_is_rejected(self):
+        organizer, event, ticket, client = make_event()
+        for cursor in ('not-a-cursor', 'WyJ4Il0', 'WyIyMDI2LTAxLTAxIiwgIm5vdC1hLXV1aWQiXQ'):
+            with self.subTest(cursor=cursor):
+                self.assertEqual(client.get('/api/events/', {'cursor': cursor}).status_code, 404)
+
+
+class BulkCreateTests(TestCase):
+    def test_errors_line_up_with_items(self):
+        organizer, event, ticket, client = make_event(ticket_quota=2)
+        missing = '00000000-0000-0000-0000-000000000000'
+        item = {'user_id': str(organizer.pk), 'ticket_id': str(ticket.pk)}
+        response = client.post('/api/registrations/bulk/', [item, {**item, 'user_id': missing}, {'user_id': 'x'}], format='json')
+        self.assertEqual(response.status_code, 400)
+        # Malformed items are reported by index
+        self.assertEqual(list(response.data['errors']), [2])
+        self.assertEqual(sorted(response.data['errors'][2]), ['ticket_id', 'user_id'])
+        response = client.post('/api/registrations/bulk/', [item, {**item, 'user_id': missing}], format='json')
+        self.assertEqual(response.data['errors'], [{}, {'user_id': ['User not found.']}])
+        # Three seats asked, two left: every item of the ticket fails, nothing is written
+        response = client.post('/api/registrations/bulk/', [item] * 3, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual([list(error) for error in response.data['errors']], [['ticket_id']] * 3)
+        ticket.refresh_from_db()
+        self.assertEqual((ticket.quota, Registration.objects.count()), (2, 0))
+
+        response = client.post('/api/registrations/bulk/', [item] * 2, format='json')
+        self.assertEqual(response.status_code, 201, response.content)
+        ticket.refresh_from_db()
+        self.assertEqual((ticket.quota, Registration.objects.count()), (0, 2))
+
+    def test_ticket_errors_line_up_with_items(self):
+        organizer, event, ticket, client = make_event()
+        item = {'name': 'Bulk', 'price': 1, 'quota': 1, 'sales_start': ticket.sales_start, 'sales_end': ticket.sales_end}
+        response = client.post('/api/tickets/bulk/', [
+            {**item, 'event_id': str(event.pk)}, {**item, 'event_id': '00000000-0000-0000-0000-000000000000'},
+        ], format='json')
+        self.assertEqual(response.data['errors'], [{}, {'event_id': ['Event not found.']}])
+        self.assertEqual(Ticket.objects.count(), 1)
+
+
+class FastSerializerTests(TestCase):
+    PAIRS = [
+        (EventFastSerializer, EventSerializer),
+        (TicketFastSerializer, TicketSerializer),
+        (RegistrationFastSerializer, RegistrationSerializer),
+        (PaymentFastSerializer, PaymentSerializer),
+    ]
+
+    def test_output_is_byte_identical_to_drf(self):
+        seed_dataset(10, prefix='fast')
+        # Nullable columns and a whole-second timestamp take their own paths
+        Payment.objects.create(payment_method='cash', payment_status='PENDING', amount_paid=0)
+        Event.objects.filter(pk=Event.objects.order_by('pk').first().pk).update(
+            category=None, updated_at=timezone.now().replace(microsecond=0),
+        )
+        renderer = JSONRenderer()
+        for fast, drf in self.PAIRS:
+            with self.subTest(serializer=drf.__name__):
+                queryset = fast.model.objects.order_by('created_at', 'id')
+                self.assertEqual(
+                    renderer.render(fast.serialize(fast.get_queryset(queryset))),
+                    renderer.render(drf(queryset, many=True).data),
+                )
+
+
+class AsyncReadViewTests(TestCase):
+    def test_same_responses_as_the_sync_views(self):
+        cache.clear()
+        organizer, event, ticket, _ = make_event()
+        registration = Registration.objects.create(user=organizer, ticket=ticket)
+        token = access_token(organizer)
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+        factory = AsyncRequestFactory()
+        cases = [
+            (views.EventView, '/api/events/?page_size=1', {}),
+            (views.EventDetailView, f'/api/events/{event.pk}', {'id': str(event.pk)}),
+            (views.TicketView, '/api/tickets/', {}),
+            (views.TicketDetailView, f'/api/tickets/{ticket.pk}', {'id': str(ticket.pk)}),
+            (views.RegistrationView, '/api/registrations/', {}),
+            (views.RegistrationDetailView, f'/api/registrations/{registration.pk}', {'id': str(registration.pk)}),
+            (views.EventDetailView, '/api/events/00000000-0000-0000-0000-000000000000', {'id': '00000000-0000-0000-0000-000000000000'}),
+        ]
+        for view, url, kwargs in cases:
+            with self.subTest(url=url):
+                expected = client.get(url)
+                view_func = async_to_sync(ASYNC_VARIANTS[view].as_view())
+                response = view_func(factory.get(url, headers={'Authorization': f'Bearer {token}'}), **kwargs)
+                self.assertEqual((response.status_code, response.content), (expected.status_code, expected.content))
+                if expected.status_code == 200:
+                    self.assertEqual(response['ETag'], expected['ETag'])
+                    revalidated = view_func(factory.get(
+                        url, headers={'Authorization': f'Bearer {token}', 'If-None-Match': expected['ETag']},
+                    ), **kwargs)
+                    self.assertEqual(revalidated.status_code, 304)
+        response = async_to_sync(ASYNC_VARIANTS[views.EventView].as_view())(factory.get('/api/events/'))
+        self.assertEqual((response.status_code, response.content), (401, APIClient().get('/api/events/').content))
+
+
+class ListQueryBudgetTests(TestCase):
+    """
+    List endpoints run the same number of queries whatever the page size,
+    so related rows are never fetched one per item.
+    """
+    LIST_ENDPOINTS = [
+        '/api/users/',
+        '/api/events/',
+        '/api/tickets/',
+        '/api/registrations/',
+        '/api/payments/',
+    ]
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(seed_dataset(30, prefix='budget'))
+
+    def count_queries(self, url, page_size):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, {'page_size': page_size})
+        self.assertEqual(response.status_code, 200, response.content)
+        return len(queries)
+
+    def test_constant_queries_per_page(self):
+        for url in self.LIST_ENDPOINTS:
+            with self.subTest(url=url):
+                self.assertEqual(self.count_queries(url, 2), self.count_queries(url, 25))
+
+
+class ListValidatorTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(seed_dataset(30, prefix='etag'))
+
+    def test_etag_reads_only_the_page(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/payments/', {'page_size': 5})
+        validator_sql = next(query['sql'] for query in queries if '"updated_at"' in query['sql'])
+        self.assertIn('LIMIT 6', validator_sql)
+
+        etag = response['ETag']
+        self.assertEqual(self.client.get('/api/payments/', {'page_size': 5}, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        # A row off the page doesn't change it, removing one on the page does
+        Payment.objects.order_by('-created_at', '-id').first().delete()
+        self.assertEqual(self.client.get('/api/payments/', {'page_size': 5}, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        Payment.objects.order_by('created_at', 'id').first().delete()
+        self.assertEqual(self.client.get('/api/payments/', {'page_size': 5}, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+
+class DetailValidatorTests(TestCase):
+    def test_detail_revalidation(self):
+        cache.clear()
+        organizer, event, ticket, client = make_event()
+        url = f'/api/events/{event.pk}'
+        response = client.get(url)
+        etag, modified = response['ETag'], response['Last-Modified']
+        self.assertIn('no-cache', response['Cache-Control'])
+        self.assertEqual(client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        self.assertEqual(client.get(url, HTTP_IF_MODIFIED_SINCE=modified).status_code, 304)
+
+        # A sale moves the embedded availability and with it the validators
+        with self.captureOnCommitCallbacks(execute=True):
+            client.post('/api/registrations/', {'user_id': str(organizer.pk), 'ticket_id': str(ticket.pk)}, format='json')
+        response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(response.data['availability']['sold'], 1)
+
+
+@override_settings(REPLICA_DATABASES=['replica0'])
+class ReplicaRoutingTests(TransactionTestCase):
+    def read_aliases(self, client, url):
+        # Where each read would go; the query itself still runs on default
+        aliases, read_alias = [], RequestRouting.read_alias
+
+        def spy(state):
+            aliases.append(read_alias(state))
+
+        with mock.patch.object(RequestRouting, 'read_alias', spy):
+            self.assertEqual(client.get(url).status_code, 200)
+        return set(aliases)
+
+    def test_writers_read_their_writes(self):
+        cache.clear()
+        organizer, event, ticket, client = make_event()
+        self.assertEqual(self.read_aliases(client, '/api/events/'), {'replica0'})
+        self.assertEqual(client.put(f'/api/events/{event.pk}', {'name': 'Renamed'}, format='json').status_code, 200)
+        # Sticky to the primary until REPLICA_STICKY_SECONDS pass
+        self.assertEqual(self.read_aliases(client, '/api/events/'), {None})
+        cache.delete(sticky_key(organizer.pk))
+        self.assertEqual(self.read_aliases(client, '/api/events/'), {'replica0'})
+
+
+@override_settings(METRICS_TOKEN='scrape', METRICS_SLOW_REQUEST_MS=0, METRICS_SLOW_REQUEST_SAMPLE_RATE=1)
+class MetricsTests(TestCase):
+    def scrape(self):
+        response = APIClient().get('/api/metrics/', HTTP_AUTHORIZATION='Metrics scrape')
+        self.assertEqual(response.status_code, 200)
+        samples = {}
+        for line in response.content.decode().splitlines():
+            if line.startswith('#'):
+                continue
+            name, value = line.rsplit(' ', 1)
+            samples[name] = float(value)
+        return samples
+
+    def test_requests_are_measured_per_endpoint(self):
+        organizer, event, ticket, client = make_event()
+        metrics_registry.reset()
+        with self.assertLogs('core.metrics', 'WARNING') as logs:
+            client.get('/api/events/')
+        client.get('/api/events/')
+        # The slow-request log carries the statements of the sampled request
+        statements = logs.output[0].split('\n')[1:]
+        self.assertTrue(statements and all(sql.startswith('SELECT') for sql in statements))
+
+        samples = self.scrape()
+        labels = '{route="events-list",method="GET"}'
+        self.assertEqual(samples[f'http_requests_total{labels}'], 2)
+        self.assertEqual(samples[f'http_db_queries_total{labels}'], 2 * len(statements))
+        self.assertEqual(samples[f'http_slow_requests_total{labels}'], 2)
+        self.assertEqual(samples['http_request_duration_seconds_count' + labels], 2)
+        self.assertGreater(samples[f'http_response_bytes_total{labels}'], 0)
+        self.assertIn(APIClient().get('/api/metrics/', HTTP_AUTHORIZATION='Metrics wrong').status_code, (401, 403))
+
+
+@override_settings(EXPORT_CHUNK_SIZE=200)
+class ExportMemoryTests(TestCase):
+    def export_peak(self, rows, export_format):
+        """
+        Peak traced memory while reading the export of an event with ``rows``
+        registrations, chunk by chunk as the WSGI server would.
+        """
+        organizer, event, ticket, client = make_event()
+        Registration.objects.bulk_create([Registration(user=organizer, ticket=ticket) for _ in range(rows)])
+        response = client.get(f'/api/events/{event.pk}/registrations.{export_format}')
+        self.assertEqual(response.status_code, 200)
+        tracemalloc.start()
+        try:
+            lines = 0
+            for chunk in response.streaming_content:
+                lines += chunk.count(b'\n')
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        # Header line in CSV only
+        self.assertEqual(lines, rows + (export_format == 'csv'))
+        Event.objects.filter(pk=event.pk).delete()
+        User.objects.filter(pk=organizer.pk).delete()
+        return peak
+
+    def test_peak_memory_does_not_grow_with_rows(self):
+        for export_format in ('csv', 'ndjson'):
+            with self.subTest(export_format=export_format):
+                small = self.export_peak(500, export_format)
+                large = self.export_peak(5000, export_format)
+                # Ten times the rows; a buffered export would peak ~10x higher
+                self.assertLess(large, small * 1.5, (small, large))
+
+
+    def test_every_registration_is_streamed_once(self):
+        organizer, event, ticket, client = make_event()
+        registrations = Registration.objects.bulk_create([Registration(user=organizer, ticket=ticket) for _ in range(7)])
+        Payment.objects.create(registration=registrations[0], payment_method='card', payment_status='CONFIRMED', amount_paid=100)
+        other = Event.objects.create(
+            name='Other', description='Other', location='Bandung', status='PUBLISHED', quota=1,
+            start_time=event.start_time, end_time=event.end_time, organizer=organizer,
+        )
+        Registration.objects.create(user=organizer, ticket=Ticket.objects.create(
+            name='Other', price=1, quota=1, sales_start=ticket.sales_start, sales_end=ticket.sales_end, event=other,
+        ))
+        expected = [str(pk) for pk in Registration.objects.filter(ticket__event=event).order_by('created_at', 'id').values_list('id', flat=True)]
+
+        # Chunks smaller than the export, so rows span several of them
+        with self.settings(EXPORT_CHUNK_SIZE=3):
+            response = client.get(f'/api/events/{event.pk}/registrations.csv')
+            self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
+            rows = list(csv.DictReader(StringIO(b''.join(response.streaming_content).decode())))
+            self.assertEqual([row['registration_id'] for row in rows], expected)
+            paid = next(row for row in rows if row['registration_id'] == str(registrations[0].pk))
+            self.assertEqual((paid['payment_status'], paid['amount_paid']), ('CONFIRMED', '100'))
+            self.assertEqual({row['payment_status'] for row in rows} - {'CONFIRMED'}, {''})
+
+            response = client.get(f'/api/events/{event.pk}/registrations.ndjson')
+            rows = [json.loads(line) for line in b''.join(response.streaming_content).decode().splitlines()]
+            self.assertEqual([row['registration_id'] for row in rows], expected)
+            self.assertEqual(sum(row['payment_status'] is None for row in rows), 6)
+
+        self.assertEqual(client.get(f'/api/events/{uuid.uuid4()}/registrations.csv').status_code, 404)
+
+
+@override_settings(
+    RATE_LIMIT_STORE='core.throttling.LocalTokenBucketStore',
+    RATE_LIMITS={'login:ip': '100/min', 'login:user': '2/min'},
+)
+class RateLimitTests(TestCase):
+    def setUp(self):
+        get_store().clear()
+        User.objects.create_user('member', 'member@example.com', 'S3cret-pass')
+
+    def login(self, username, ip='10.0.0.1'):
+        return APIClient().post('/api/login/', {'username': username, 'password': 'S3cret-pass'}, format='json', REMOTE_ADDR=ip)
+
+    def test_empty_bucket_answers_429_until_refilled(self):
+        now = 1_000_000.0
+        with mock.patch.object(TokenBucketThrottle, 'timer', mock.Mock(side_effect=lambda: now)):
+            self.assertEqual(self.login('member').status_code, 200)
+            # Per account, whatever the IP
+            self.assertEqual(self.login('Member', ip='10.0.0.2').status_code, 401)
+            response = self.login('member', ip='10.0.0.3')
+            self.assertEqual(response.status_code, 429)
+            # One token every 30 seconds
+            self.assertEqual(response['Retry-After'], '30')
+            self.assertEqual(self.login('other').status_code, 401)
+
+            now += 30
+            self.assertEqual(self.login('member').status_code, 200)
+            self.assertEqual(self.login('member').status_code, 429)
+
+
+class PasswordHashingTests(TestCase):
+    @override_settings(PASSWORD_HASHERS=['core.hashers.PBKDF2PasswordHasher', 'core.hashers.Argon2PasswordHasher'])
+    def test_costs_follow_settings_but_not_below_django(self):
+        with self.settings(PASSWORD_PBKDF2_ITERATIONS=2_000_000, PASSWORD_ARGON2_MEMORY_COST=204800):
+            self.assertEqual(get_hasher('pbkdf2_sha256').iterations, 2_000_000)
+            self.assertEqual(get_hasher('argon2').memory_cost, 204800)
+        with self.settings(PASSWORD_PBKDF2_ITERATIONS=1000, PASSWORD_ARGON2_MEMORY_COST=1024):
+            self.assertEqual(get_hasher('pbkdf2_sha256').iterations, 1_000_000)
+            self.assertEqual(get_hasher('argon2').memory_cost, 102400)
+
+    def test_only_views_are_shed_when_hashing_is_saturated(self):
+        with mock.patch.object(password_limiter, 'queue_size', 0), ExitStack() as slots:
+            for _ in range(password_limiter.limit):
+                slots.enter_context(password_limiter.slot())
+            # Management commands and other callers hash inline, unthrottled
+            user = User(username='inline')
+            user.set_password('S3cret-pass')
+            user.save()
+            self.assertTrue(user.check_password('S3cret-pass'))
+
+            response = APIClient().post('/api/register/', {
+                'username': 'wave', 'email': 'wave@example.com', 'password': 'S3cret-pass',
+            }, format='json')
+            self.assertEqual(response.status_code, 429)
+            self.assertIn('Retry-After', response)
+        response = APIClient().post('/api/login/', {'username': 'inline', 'password': 'S3cret-pass'}, format='json')
+        self.assertEqual(response.status_code, 200, response.content)
+
+
+class AvailabilityTests(TestCase):
+    def sold(self, event, ticket):
+        return (
+            TicketAvailability.objects.filter(ticket=ticket).values_list('sold', flat=True).first() or 0,
+            EventAvailability.objects.filter(event=event).values_list('sold', flat=True).first() or 0,
+        )
+
+    def test_counters_move_with_the_purchase(self):
+        organizer, event, ticket, client = make_event(ticket_quota=1)
+        for code in (201, 409):
+            response = client.post('/api/registrations/', {
+                'user_id': str(organizer.pk), 'ticket_id': str(ticket.pk),
+            }, format='json')
+            self.assertEqual(response.status_code, code, response.content)
+        # Written in the purchase transaction, nothing waits for the commit
+        self.assertEqual(self.sold(event, ticket), (1, 1))
+
+    def test_rolled_back_purchase_leaves_counters(self):
+        organizer, event, ticket, client = make_event()
+        with self.assertRaises(RuntimeError), transaction.atomic():
+            client.post('/api/registrations/', {
+                'user_id': str(organizer.pk), 'ticket_id': str(ticket.pk),
+            }, format='json')
+            raise RuntimeError
+        self.assertEqual(self.sold(event, ticket), (0, 0))
+
+
+class EventFilterTests(TestCase):
+    def names(self, client, query):
+        response = client.get(f'/api/events/?{query}')
+        self.assertEqual(response.status_code, 200, response.content)
+        return sorted(event['name'] for event in response.data['events'])
+
+    def test_filters_combine(self):
+        organizer, event, ticket, client = make_event()
+        start = event.start_time
+        for name, category, location, days in [
+            ('Jazz Night', 'music', 'Bandung', 2), ('Rock Fest', 'music', 'Jakarta', 5), ('Python Meetup', 'tech', 'Jakarta', 3),
+        ]:
+            Event.objects.create(
+                name=name, description=f'{name} description', location=location, status='PUBLISHED', quota=1,
+                category=category, start_time=start + timedelta(days=days), end_time=start + timedelta(days=days, hours=2),
+                organizer=organizer,
+            )
+        self.assertEqual(self.names(client, 'category=music'), ['Jazz Night', 'Rock Fest'])
+        self.assertEqual(self.names(client, 'category=music&location=Jakarta'), ['Rock Fest'])
+        after = (start + timedelta(days=2, hours=12)).isoformat().replace('+', '%2B')
+        self.assertEqual(self.names(client, f'start_time_after={after}'), ['Python Meetup', 'Rock Fest'])
+        # Case-insensitive, on name or description
+        self.assertEqual(self.names(client, 'q=python'), ['Python Meetup'])
+        self.assertEqual(self.names(client, 'q=DESCRIPTION&location=Bandung'), ['Jazz Night'])
+        self.assertEqual(client.get('/api/events/?q=ab').status_code, 400)
+
+
+class DetailCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_write_replaces_the_cached_payload(self):
+        organizer, event, ticket, client = make_event()
+        self.assertEqual(client.get(f'/api/events/{event.pk}').data['name'], 'Event')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(client.put(f'/api/events/{event.pk}', {'name': 'Renamed'}, format='json').status_code, 200)
+        self.assertEqual(client.get(f'/api/events/{event.pk}').data['name'], 'Renamed')
+        with self.captureOnCommitCallbacks(execute=True):
+            client.delete(f'/api/events/{event.pk}')
+        self.assertEqual(client.get(f'/api/events/{event.pk}').status_code, 404)
+
+    def test_versions_only_move_forward(self):
+        pk = '00000000-0000-0000-0000-000000000001'
+        older, newer = (timezone.now() + timedelta(seconds=n) for n in (0, 1))
+        event_cache.set_version(pk, newer.isoformat())
+        # Commit callbacks of two writes ran out of order
+        event_cache.set_version(pk, older.isoformat())
+        self.assertEqual(event_cache.get_version(pk), newer.isoformat())
+        # A loader that read a newer row replaces an older version
+        newest = (newer + timedelta(seconds=1)).isoformat()
+        self.assertEqual(event_cache.get_or_load(pk, lambda: (newest, 'payload')), 'payload')
+        self.assertEqual(event_cache.get_version(pk), newest)
+        event_cache.invalidate(pk)
+        event_cache.set_version(pk, (newer + timedelta(seconds=2)).isoformat())
+        self.assertIsNone(event_cache.get_version(pk))
+
+    def test_concurrent_misses_load_once(self):
+        detail_cache = ReadThroughCache('single-flight')
+        pk, calls, results = '00000000-0000-0000-0000-000000000002', [], []
+
+        def loader():
+            calls.append(1)
+            time.sleep(0.1)
+            return timezone.now().isoformat(), 'payload'
+
+        threads = [threading.Thread(target=lambda: results.append(detail_cache.get_or_load(pk, loader))) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual((len(calls), results), (1, ['payload'] * 8))
+
+
+@override_settings(FEED_MAX_EVENTS=3, FEED_LOCAL_SECONDS=0)
+class UpcomingFeedTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        feed._local.snapshot = None
+        self.organizer, self.event, _, self.client = make_event()
+        start = self.event.start_time
+        Event.objects.bulk_create([
+            Event(name=f'Event {i}', description='', location='', status='PUBLISHED', quota=1,
+                  start_time=start + timedelta(hours=i), end_time=start + timedelta(hours=i + 1),
+                  organizer=self.organizer)
+            for i in range(1, 7)
+        ])
+
+    def test_requires_authentication(self):
+        self.assertEqual(APIClient().get('/api/events/upcoming/').status_code, 401)
+
+    def test_pages_past_a_truncated_snapshot(self):
+        names, url = [], '/api/events/upcoming/?page_size=2'
+        while url:
+            page = self.client.get(url).json()
+            names += [event['name'] for event in page['events']]
+            url = page['next']
+        self.assertTrue(feed.current().truncated)
+        self.assertEqual(names, ['Event', *[f'Event {i}' for i in range(1, 7)]])
+
+        page = self.client.get('/api/events/upcoming/?page_size=3').json()
+        self.assertEqual(len(page['events']), 3)
+        self.assertIsNotNone(page['next'])
+
+    def test_pages_past_the_snapshot_revalidate_their_rows(self):
+        url = self.client.get('/api/events/upcoming/?page_size=3').json()['next']
+        response = self.client.get(url)
+        etag = response['ETag']
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        # Past the snapshot, so the feed version doesn't move
+        Event.objects.filter(name='Event 4').update(location='Bandung', updated_at=timezone.now())
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+
+class PaymentConfirmationTests(TestCase):
+    def set_status(self, client, payment, payment_status):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = client.put(f'/api/payments/{payment.pk}', {'payment_status': payment_status}, format='json')
+        self.assertEqual(response.status_code, 200, response.content)
+        payment.refresh_from_db()
+
+    def test_every_confirmation_is_handled_once(self):
+        organizer, event, ticket, client = make_event()
+        registration = Registration.objects.create(user=organizer, ticket=ticket)
+        payment = Payment.objects.create(
+            registration=registration, payment_method='TRANSFER', payment_status='PENDING', amount_paid=100,
+        )
+
+        self.set_status(client, payment, 'CONFIRMED')
+        self.set_status(client, payment, 'CONFIRMED')
+        self.assertEqual(OutboxMessage.objects.count(), 1)
+        # The request only enqueued the work
+        self.assertIsNone(payment.confirmed_at)
+        ticket_version = Ticket.objects.get(pk=ticket.pk).updated_at
+        process_batch()
+        payment.refresh_from_db()
+        confirmed_at = payment.confirmed_at
+        self.assertIsNotNone(confirmed_at)
+        self.assertGreater(Ticket.objects.get(pk=ticket.pk).updated_at, ticket_version)
+        # A replay finds the payment stamped
+        OutboxMessage.objects.update(status=OutboxMessage.PENDING)
+        process_batch()
+        payment.refresh_from_db()
+        self.assertEqual(payment.confirmed_at, confirmed_at)
+
+        # Withdrawn and confirmed again: a new message, handled again
+        self.set_status(client, payment, 'PENDING')
+        self.assertIsNone(payment.confirmed_at)
+        self.set_status(client, payment, 'CONFIRMED')
+        self.assertEqual(OutboxMessage.objects.count(), 2)
+        process_batch()
+        payment.refresh_from_db()
+        self.assertGreater(payment.confirmed_at, confirmed_at)
+
+
+class RollupTests(TestCase):
+    def assertRollupsMatch(self, *events):
+        for event in events:
+            raw = dashboard_stats(Registration.objects.filter(ticket__event=event), RAW)
+            rollup = dashboard_stats(EventRollup.objects.filter(event=event), ROLLUP)
+            self.assertEqual(rollup, raw)
+
+    def test_rollups_follow_the_raw_tables(self):
+        organizer, event, ticket, client = make_event(ticket_quota=5)
+        other_event = Event.objects.create(
+            name='Other', description='Other', location='Bandung', status='PUBLISHED', quota=10,
+            start_time=event.start_time, end_time=event.end_time, organizer=organizer,
+        )
+        other_ticket = Ticket.objects.create(
+            name='Regular', price=100, quota=2, sales_start=ticket.sales_start, sales_end=ticket.sales_end, event=other_event,
+        )
+        now = timezone.now()
+        registrations = [Registration.objects.create(user=organizer, ticket=ticket) for _ in range(3)]
+        for hours, registration in enumerate(registrations):
+            Registration.objects.filter(pk=registration.pk).update(created_at=now - timedelta(hours=hours))
+        Payment.objects.create(registration=registrations[0], payment_method='card', payment_status='CONFIRMED', amount_paid=100)
+        Payment.objects.create(registration=registrations[1], payment_method='transfer', payment_status='PENDING', amount_paid=50)
+        call_command('rollup_stats', stdout=StringIO())
+        self.assertRollupsMatch(event, other_event)
+        self.assertEqual(dashboard_stats(EventRollup.objects.filter(event=event), ROLLUP)['totals']['revenue'], 100)
+
+        # A run that changes nothing still moves as_of
+        as_of = rollups_as_of()
+        call_command('rollup_stats', stdout=StringIO())
+        self.assertGreater(rollups_as_of(), as_of)
+
+        # Moved to another event: the old event's bucket is rebuilt too
+        moved = Registration.objects.get(pk=registrations[2].pk)
+        moved.ticket = other_ticket
+        moved.save()
+        call_command('rollup_stats', stdout=StringIO())
+        self.assertRollupsMatch(event, other_event)
+        self.assertEqual(EventRollup.objects.filter(event=other_event).count(), 1)
+
+
+class HotInventoryMixin:
+    def setUp(self):
+        super().setUp()
+        self.settings_override = override_settings(HOT_INVENTORY_STORE='core.inventory.LocalInventoryStore')
+        self.settings_override.enable()
+        self.store = inventory.get_store()
+        self.store.clear()
+
+    def tearDown(self):
+        self.store.clear()
+        inventory._uncommitted.seats.clear()
+        self.settings_override.disable()
+        super().tearDown()
+
+    def buy(self, client, user, ticket):
+        # Hot purchases are journaled when the request commits
+        with self.captureOnCommitCallbacks(execute=True):
+            return client.post('/api/registrations/', {'user_id': str(user.pk), 'ticket_id': str(ticket.pk)}, format='json')
+
+
+class HotInventoryTests(HotInventoryMixin, TestCase):
+    def test_whole_event_sells_from_the_counters(self):
+        organizer, event, hot, client = make_event(quota=3, ticket_quota=3)
+        other = Ticket.objects.create(
+            name='VIP', price=500, quota=3, sales_start=hot.sales_start, sales_end=hot.sales_end, event=event,
+        )
+        inventory.enable(hot.pk)
+        codes = [self.buy(client, organizer, ticket).status_code for ticket in (hot, other, other, hot)]
+        # Three seats in the event, wherever they were bought
+        self.assertEqual(codes, [201, 201, 201, 409])
+        self.assertEqual(Registration.objects.count(), 0)
+        inventory.disable(hot.pk)
+        event.refresh_from_db()
+        self.assertEqual((event.quota, Registration.objects.count()), (0, 3))
+        self.assertFalse(inventory.is_hot(event.pk))
+
+    def test_hot_event_quotas_are_locked(self):
+        organizer, event, ticket, client = make_event()
+        inventory.enable(ticket.pk)
+        self.assertEqual(client.put(f'/api/tickets/{ticket.pk}', {'quota': 5}, format='json').status_code, 400)
+        self.assertEqual(client.put(f'/api/events/{event.pk}', {'quota': 50}, format='json').status_code, 400)
+        response = client.post('/api/tickets/', {
+            'name': 'Late', 'price': 1, 'quota': 1, 'sales_start': ticket.sales_start,
+            'sales_end': ticket.sales_end, 'event_id': str(event.pk),
+        }, format='json')
+        self.assertEqual(response.status_code, 400, response.content)
+
+    def test_hot_event_cannot_be_deleted(self):
+        organizer, event, ticket, client = make_event()
+        inventory.enable(ticket.pk)
+        self.assertEqual(self.buy(client, organizer, ticket).status_code, 201)
+        self.assertEqual(client.delete(f'/api/tickets/{ticket.pk}').status_code, 400)
+        self.assertEqual(client.delete(f'/api/events/{event.pk}').status_code, 400)
+        # Deleted behind the check (e.g. after unloading): the flush drops the purchase instead of failing
+        self.store.unload(ticket.pk)
+        ticket.delete()
+        with self.assertLogs('core.inventory', 'WARNING'):
+            self.assertEqual(inventory.drain(), 1)
+        self.assertEqual((self.store.pending(), Registration.objects.count()), (0, 0))
+
+    def test_flush_never_drives_quota_negative(self):
+        organizer, event, ticket, client = make_event(quota=5, ticket_quota=5)
+        inventory.enable(ticket.pk)
+        for _ in range(3):
+            self.assertEqual(self.buy(client, organizer, ticket).status_code, 201)
+        # The rows lost seats the counters never heard of
+        Event.objects.filter(pk=event.pk).update(quota=1)
+        with self.assertLogs('core.inventory', 'ERROR'):
+            inventory.drain()
+        event.refresh_from_db()
+        self.assertEqual(event.quota, 0)
+        # Lowered to the rows: the ticket still has 2, the event none
+        self.assertEqual(self.store.remaining(ticket.pk), (2, 0))
+        self.assertEqual(self.buy(client, organizer, ticket).status_code, 409)
+
+    def test_rows_keep_the_purchase_time(self):
+        organizer, event, ticket, client = make_event()
+        inventory.enable(ticket.pk)
+        purchased = timezone.now() - timedelta(minutes=5)
+        with mock.patch('core.inventory.timezone.now', return_value=purchased):
+            response = self.buy(client, organizer, ticket)
+        inventory.drain()
+        registration = Registration.objects.get(pk=response.data['id'])
+        self.assertEqual(registration.created_at, purchased)
+
+    def test_one_flusher_at_a_time(self):
+        organizer, event, ticket, client = make_event()
+        inventory.enable(ticket.pk)
+        self.assertEqual(self.buy(client, organizer, ticket).status_code, 201)
+        # Another flusher holds the lock: this one neither claims nor requeues its batch
+        self.assertTrue(self.store.lock('other', 60))
+        self.store.claim(10)
+        self.assertEqual(inventory.flush(), 0)
+        self.assertEqual((len(self.store.journal), len(self.store.processing)), (0, 1))
+        # Its lock ran out mid-batch: the next flusher replays the batch, the late ack is ignored
+        self.store.owner_expires = 0
+        self.assertEqual(inventory.drain(), 1)
+        self.store.ack(1, 'other')
+        self.assertEqual((self.store.pending(), Registration.objects.count()), (0, 1))
+
+
+class HotInventoryRollbackTests(HotInventoryMixin, TransactionTestCase):
+    def test_rolled_back_take_is_given_back(self):
+        organizer, event, ticket, client = make_event(quota=5, ticket_quota=2)
+        inventory.enable(ticket.pk)
+        with self.assertRaises(RuntimeError), transaction.atomic():
+            hold_ticket(organizer, ticket)
+            self.assertEqual(self.store.remaining(ticket.pk), (1, 4))
+            raise RuntimeError
+        inventory.settle()
+        self.assertEqual(self.store.remaining(ticket.pk), (2, 5))
+
+        hold_ticket(organizer, ticket)
+        inventory.settle()
+        self.assertEqual(self.store.remaining(ticket.pk), (1, 4))
+
+    def test_rolled_back_purchase_is_not_journaled(self):
+        organizer, event, ticket, client = make_event(quota=5, ticket_quota=2)
+        inventory.enable(ticket.pk)
+        with self.assertRaises(RuntimeError), transaction.atomic():
+            self.assertIsNotNone(inventory.purchase(organizer, ticket))
+            raise RuntimeError
+        inventory.settle()
+        self.assertEqual((self.store.remaining(ticket.pk), self.store.pending()), ((2, 5), 0))
+
+        inventory.purchase(organizer, ticket)
+        self.assertEqual((self.store.remaining(ticket.pk), self.store.pending()), ((1, 4), 1))
+
+
+@override_settings(WAITING_ROOM_STORE='core.waiting_room.LocalWaitingRoomStore', WAITING_ROOM_ADMISSION_SECONDS=60, RATE_LIMITS={})
+class WaitingRoomTests(TestCase):
+    def setUp(self):
+        waiting_room.get_store().clear()
+        self.organizer, self.event, self.ticket, _ = make_event(quota=10, ticket_quota=10)
+        waiting_room.open_queue(self.event.pk, [self.ticket.pk], rate=2)
+        self.clients = []
+        for name in ('first', 'second', 'third'):
+            client = APIClient()
+            client.force_authenticate(User.objects.create_user(name, f'{name}@example.com', 'pw'))
+            self.clients.append(client)
+
+    def join(self, client):
+        response = client.post('/api/queue/', {'ticket_id': str(self.ticket.pk)}, format='json')
+        self.assertEqual(response.status_code, 201, response.content)
+        return response.data
+
+    def reserve(self, client, token=None):
+        headers = {} if token is None else {'HTTP_X_QUEUE_TOKEN': token}
+        return client.post('/api/reservations/', {'ticket_id': str(self.ticket.pk)}, format='json', **headers)
+
+    def status(self, token):
+        return APIClient().get(f'/api/queue/{token}/')
+
+    def test_buyers_are_admitted_in_join_order(self):
+        tokens = [self.join(client)['token'] for client in self.clients]
+        self.assertEqual([self.status(token).data['position'] for token in tokens], [1, 2, 3])
+        # Joining again keeps the place in line
+        self.assertEqual(self.join(self.clients[0])['token'], tokens[0])
+
+        self.assertEqual(self.reserve(self.clients[0]).status_code, 403)
+        self.assertEqual(self.reserve(self.clients[0], tokens[0]).status_code, 403)
+
+        credits = {}
+        # Half a second at 2 per second
+        self.assertEqual(waiting_room.schedule(credits, 0.5), 1)
+        first, second = self.status(tokens[0]).data, self.status(tokens[1]).data
+        self.assertEqual((first['admitted'], first['ahead']), (True, 0))
+        self.assertEqual((second['admitted'], second['ahead']), (False, 1))
+        self.assertEqual(self.reserve(self.clients[1], tokens[1]).status_code, 403)
+        # A token is only good for the user it was issued to
+        self.assertEqual(self.reserve(self.clients[1], tokens[0]).status_code, 403)
+
+        self.assertEqual(self.reserve(self.clients[0], tokens[0]).status_code, 201)
+        # One admission, one purchase
+        self.assertEqual(self.status(tokens[0]).status_code, 404)
+        self.assertEqual(self.reserve(self.clients[0], tokens[0]).status_code, 403)
+
+        # An idle scheduler doesn't save up more than a second of admissions
+        self.assertEqual(waiting_room.schedule(credits, 10), 2)
+        self.assertTrue(self.status(tokens[2]).data['admitted'])
+
+    def test_admission_expires(self):
+        token = self.join(self.clients[0])['token']
+        waiting_room.schedule({}, 1)
+        now = time.time()
+        with mock.patch.object(waiting_room.time, 'time', return_value=now):
+            # The admission window starts when the buyer first sees it
+            self.assertEqual(self.status(token).data['expires_in'], 60)
+        with mock.patch.object(waiting_room.time, 'time', return_value=now + 61):
+            self.assertEqual(self.status(token).data['admitted'], False)
+            response = self.reserve(self.clients[0], token)
+        self.assertEqual(response.status_code, 403)
+        self.assertIn('expired', response.data['detail'])
+        self.assertEqual(self.status(token).status_code, 404)
+
+        # Back to the end of the line
+        self.assertEqual(self.join(self.clients[0])['position'], 2)
+
+
+@override_settings(IDEMPOTENCY_STORE='core.idempotency.LocalIdempotencyStore', RATE_LIMITS={})
+class IdempotencyTests(TestCase):
+    def setUp(self):
+        idempotency.get_store().clear()
+
+    def register(self, client, user, ticket, key):
+        return client.post(
+            '/api/registrations/', {'user_id': str(user.pk), 'ticket_id': str(ticket.pk)},
+            format='json', HTTP_IDEMPOTENCY_KEY=key,
+        )
+
+    def test_retry_is_replayed(self):
+        organizer, event, ticket, client = make_event()
+        first = self.register(client, organizer, ticket, 'k1')
+        self.assertEqual(first.status_code, 201, first.content)
+        retry = self.register(client, organizer, ticket, 'k1')
+        self.assertEqual((retry.status_code, retry.data), (201, first.data))
+        self.assertEqual(retry['Idempotent-Replayed'], 'true')
+        self.assertEqual(Registration.objects.count(), 1)
+
+        # A new key is a new purchase
+        self.assertEqual(self.register(client, organizer, ticket, 'k2').status_code, 201)
+        self.assertEqual(Registration.objects.count(), 2)
+
+    def test_key_reused_for_another_request_is_refused(self):
+        organizer, event, ticket, client = make_event(ticket_quota=0)
+        # Sold out; failures release the key
+        self.assertEqual(self.register(client, organizer, ticket, 'k1').status_code, 409)
+        Ticket.objects.filter(pk=ticket.pk).update(quota=2)
+        self.assertEqual(self.register(client, organizer, ticket, 'k1').status_code, 201)
+
+        other = User.objects.create_user('other', 'other@example.com', 'pw')
+        response = self.register(client, other, ticket, 'k1')
+        self.assertEqual(response.status_code, 422)
+        self.assertEqual(Registration.objects.count(), 1)
+
+    def test_duplicate_waits_for_the_request_in_flight(self):
+        started, release = threading.Event(), threading.Event()
+        calls = []
+
+        class Purchase(views.APIView):
+            permission_classes = []
+            throttle_classes = []
+
+            @idempotency.idempotent
+            def post(self, request):
+                calls.append(request.data)
+                started.set()
+                release.wait(5)
+                return views.Response({'purchase': len(calls)}, status=201)
+
+        user = User.objects.create_user('buyer', 'buyer@example.com', 'pw')
+
+        def call():
+            request = APIRequestFactory().post('/purchase/', {'ticket': 1}, format='json', HTTP_IDEMPOTENCY_KEY='k1')
+            force_authenticate(request, user)
+            return Purchase.as_view()(request)
+
+        responses = []
+        first = threading.Thread(target=lambda: responses.append(call()))
+        first.start()
+        self.assertTrue(started.wait(5))
+        with self.settings(IDEMPOTENCY_WAIT_TIMEOUT=0.05):
+            self.assertEqual(call().status_code, 409)
+        second = threading.Thread(target=lambda: responses.append(call()))
+        second.start()
+        time.sleep(0.05)
+        release.set()
+        first.join(5)
+        second.join(5)
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual([(response.status_code, response.data) for response in responses], [(201, {'purchase': 1})] * 2)
+        self.assertEqual({response.get('Idempotent-Replayed') for response in responses}, {None, 'true'})
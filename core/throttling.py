@@ -0,0 +1,198 @@
+import math
+import threading
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.module_loading import import_string
+from rest_framework import exceptions
+from rest_framework.throttling import BaseThrottle
+
+
+PERIODS = {'s': 1, 'sec': 1, 'min': 60, 'hour': 3600, 'day': 86400}
+
+
+def parse_rate(rate):
+    """
+    ``'10/min'`` -> ``(10, 60)``: a bucket of 10 tokens refilled over a minute.
+    """
+    count, period = rate.split('/')
+    return int(count), PERIODS[period]
+
+
+def refill(tokens, updated, capacity, period, now):
+    return min(capacity, tokens + (now - updated) * capacity / period)
+
+
+class LocalTokenBucketStore:
+    """
+    Buckets in process memory, for tests and single-process runs.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._buckets = {}
+
+    def take(self, key, capacity, period, now):
+        with self._lock:
+            tokens, updated = self._buckets.get(key, (capacity, now))
+            tokens = refill(tokens, updated, capacity, period, now)
+            allowed = tokens >= 1
+            if allowed:
+                tokens -= 1
+            self._buckets[key] = (tokens, now)
+        return allowed, tokens
+
+    def clear(self):
+        with self._lock:
+            self._buckets.clear()
+
+
+class CacheTokenBucketStore:
+    """
+    Buckets in the default cache, shared by every worker when the cache is.
+
+    Like DRF's own throttles the read and write are separate calls, so two
+    workers racing on one bucket can let an extra request through; that is
+    fine for rate limiting. Keys expire once the bucket would be full again.
+    """
+    key_prefix = 'throttle'
+
+    def take(self, key, capacity, period, now):
+        key = f'{self.key_prefix}:{key}'
+        tokens, updated = cache.get(key, (capacity, now))
+        tokens = refill(tokens, updated, capacity, period, now)
+        allowed = tokens >= 1
+        if allowed:
+            tokens -= 1
+        cache.set(key, (tokens, now), math.ceil((capacity - tokens) * period / capacity) or 1)
+        return allowed, tokens
+
+
+_stores = {}
+
+
+def get_store():
+    path = settings.RATE_LIMIT_STORE
+    if path not in _stores:
+        _stores[path] = import_string(path)()
+    return _stores[path]
+
+
+class TokenBucketThrottle(BaseThrottle):
+    """
+    Token bucket per client, sized by ``RATE_LIMITS['<scope>:<kind>']`` where
+    the scope is the view's ``throttle_scope``. Scopes without a rate are
+    not limited.
+    """
+    kind = None
+    timer = time.time
+
+    def get_ident_key(self, request):
+        raise NotImplementedError
+
+    def allow_request(self, request, view):
+        self.retry_after = None
+        scope = getattr(view, 'throttle_scope', None)
+        rate = settings.RATE_LIMITS.get(f'{scope}:{self.kind}')
+        ident = self.get_ident_key(request)
+        if rate is None or ident is None:
+            return True
+        capacity, period = parse_rate(rate)
+        allowed, tokens = get_store().take(f'{scope}:{self.kind}:{ident}', capacity, period, self.timer())
+        if not allowed:
+            # Time until the next whole token
+            self.retry_after = (1 - tokens) * period / capacity
+        return allowed
+
+    def wait(self):
+        return self.retry_after
+
+
+class IPRateThrottle(TokenBucketThrottle):
+    """
+    Per client IP, honouring ``NUM_PROXIES`` like DRF's throttles.
+    """
+    kind = 'ip'
+
+    def get_ident_key(self, request):
+        return self.get_ident(request)
+
+
+class UserRateThrottle(TokenBucketThrottle):
+    """
+    Per authenticated user, or per submitted ``username`` on login and
+    sign-up so one account can't be brute forced from many IPs.
+    """
+    kind = 'user'
+
+    def get_ident_key(self, request):
+        if request.user and request.user.is_authenticated:
+            return request.user.pk
+        username = request.data.get('username') if hasattr(request.data, 'get') else None
+        return username.lower() if isinstance(username, str) and username else None
+
+
+class ConcurrencyLimiter:
+    """
+    Admit at most ``limit`` requests at a time into a section of code.
+
+    Up to ``queue_size`` more wait up to ``timeout`` seconds for a slot; the
+    rest, and waiters that time out, get a 429 with ``Retry-After`` instead
+    of piling up on the database. Slots are per process, so the database
+    sees at most workers x ``limit`` concurrent purchases.
+    """
+    detail = 'Too many concurrent purchases, retry shortly.'
+
+    def __init__(self, limit, queue_size, timeout, detail=None):
+        self.limit = limit
+        self.queue_size = queue_size
+        self.timeout = timeout
+        if detail is not None:
+            self.detail = detail
+        self._slots = threading.BoundedSemaphore(limit)
+        self._lock = threading.Lock()
+        self.waiting = 0
+        self.shed = 0
+
+    def retry_after(self):
+        return max(1, math.ceil(self.timeout))
+
+    def reject(self):
+        with self._lock:
+            self.shed += 1
+        raise exceptions.Throttled(wait=self.retry_after(), detail=self.detail)
+
+    @contextmanager
+    def slot(self):
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                queued = self.waiting < self.queue_size
+                if queued:
+                    self.waiting += 1
+            if not queued:
+                self.reject()
+            try:
+                acquired = self._slots.acquire(timeout=self.timeout)
+            finally:
+                with self._lock:
+                    self.waiting -= 1
+            if not acquired:
+                self.reject()
+        try:
+            yield
+        finally:
+            self._slots.release()
+
+
+purchase_limiter = ConcurrencyLimiter(
+    settings.PURCHASE_CONCURRENCY, settings.PURCHASE_QUEUE_SIZE, settings.PURCHASE_QUEUE_TIMEOUT,
+)
+
+# Signups, logins and password changes: each hash takes a core (and, for
+# scrypt and Argon2, tens of MiB) for a good part of a second
+password_limiter = ConcurrencyLimiter(
+    settings.PASSWORD_HASH_CONCURRENCY, settings.PASSWORD_HASH_QUEUE_SIZE, settings.PASSWORD_HASH_QUEUE_TIMEOUT,
+    detail='Too many concurrent sign-ins, retry shortly.',
+)
@@ -1,18 +1,36 @@
 from django.urls import path, re_path
 from . import views
+from .async_views import read_view
 
 urlpatterns = [
     # Events
-    path('events/', views.EventView.as_view(), name='events-list'),
-    re_path(r'^events/(?P<id>[0-9a-f-]+)/?$', views.EventDetailView.as_view(), name='events-detail'),
+    path('events/', read_view(views.EventView), name='events-list'),
+    path('events/upcoming/', views.UpcomingEventsView.as_view(), name='events-upcoming'),
+    re_path(r'^events/(?P<id>[0-9a-f-]+)/?$', read_view(views.EventDetailView), name='events-detail'),
+    re_path(
+        r'^events/(?P<id>[0-9a-f-]+)/registrations\.(?P<export_format>csv|ndjson)$',
+        views.EventRegistrationExportView.as_view(),
+        name='events-registrations-export',
+    ),
+    re_path(r'^events/(?P<id>[0-9a-f-]+)/stats/?$', views.EventStatsView.as_view(), name='events-stats'),
     
     # Registrations
-    path('registrations/', views.RegistrationView.as_view()),
-    re_path(r'^registrations/(?P<id>[0-9a-f-]+)/?$', views.RegistrationDetailView.as_view()),
+    path('registrations/', read_view(views.RegistrationView)),
+    path('registrations/bulk/', views.RegistrationBulkView.as_view()),
+    re_path(r'^registrations/(?P<id>[0-9a-f-]+)/?$', read_view(views.RegistrationDetailView)),
     
+    # Reservations
+    path('reservations/', views.ReservationView.as_view()),
+    re_path(r'^reservations/(?P<id>[0-9a-f-]+)/?$', views.ReservationDetailView.as_view()),
+    
+    # Waiting room
+    path('queue/', views.QueueView.as_view(), name='queue-join'),
+    re_path(r'^queue/(?P<token>[\w-]+)/?$', views.QueueStatusView.as_view(), name='queue-status'),
+
     # Tickets
-    path('tickets/', views.TicketView.as_view()),
-    re_path(r'^tickets/(?P<id>[0-9a-f-]+)/?$', views.TicketDetailView.as_view()),
+    path('tickets/', read_view(views.TicketView)),
+    path('tickets/bulk/', views.TicketBulkView.as_view()),
+    re_path(r'^tickets/(?P<id>[0-9a-f-]+)/?$', read_view(views.TicketDetailView)),
 
     # Payments
     path('payments/', views.PaymentView.as_view()),
@@ -26,6 +44,15 @@ urlpatterns = [
     re_path(r'^groups/(?P<pk>\d+)/?$', views.GroupDetailView.as_view(), name='group-detail'),
     path('assign-roles/', views.AssignRoleView.as_view(), name='assign-roles'),
     
+    # Cache
+    path('cache-stats/', views.CacheStatsView.as_view(), name='cache-stats'),
+    
+    # Monitoring
+    path('metrics/', views.MetricsView.as_view(), name='metrics'),
+    
+    # Dashboard
+    re_path(r'^organizers/(?P<id>[0-9a-f-]+)/stats/?$', views.OrganizerStatsView.as_view(), name='organizers-stats'),
+    
     path('users/',views.UserView.as_view(), name='user-list'),
     re_path(r'^users/(?P<id>[0-9a-f-]+)/?$',views.UserDetailView.as_view(), name='user-list')
 ]
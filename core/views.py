@@ -1,13 +1,34 @@
 from django.shortcuts import render
-from .models import User, Event, Registration, Ticket, Payment
-from .serializers import UserSerializer, EventSerializer, RegistrationSerializer, TicketSerializer, PaymentSerializer, UserRegisterSerializer, GroupSerializer, AssignRoleSerializer
+from .models import User, Event, Registration, Ticket, Payment, Reservation, EventRollup
+from .serializers import UserSerializer, EventSerializer, RegistrationSerializer, TicketSerializer, PaymentSerializer, UserRegisterSerializer, GroupSerializer, AssignRoleSerializer, ReservationSerializer, QueueJoinSerializer, RegistrationBulkSerializer, EventFilterSerializer, StatsFilterSerializer
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status, serializers
-from django.http import Http404
+from django.http import Http404, HttpResponse, StreamingHttpResponse
 from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.views import TokenObtainPairView
+from .authentication import StatelessJWTAuthentication
 from rest_framework.permissions import IsAuthenticated
-from .permissions import IsAdmin, IsSuperUser, IsUser, IsAdminOrSuperUser, IsOwnerOrAdminOrSuperUser
+from .permissions import IsAdmin, IsSuperUser, IsUser, IsAdminOrSuperUser, IsOwnerOrAdminOrSuperUser, HasMetricsToken
+from .pagination import KeysetPagination
+from .reservations import hold_ticket, cancel_hold, return_inventory, delete_inventory
+from django.db import transaction, DEFAULT_DB_ALIAS
+from .cache import event_cache, ticket_cache, cache_stats
+from .fast_serializers import EventFastSerializer, TicketFastSerializer, RegistrationFastSerializer, PaymentFastSerializer
+from .search import filter_events
+from .payments import enqueue_confirmation, CONFIRMED
+from .availability import availability_data, availability_version, confirmed_amount, record_payment_change, record_revenue, adjust
+from .bulk import bulk_create_tickets, bulk_create_registrations
+from .exports import export_registrations, STREAMERS, EXPORT_CONTENT_TYPES
+from .analytics import dashboard_stats, filter_period, rollups_as_of, ROLLUP
+from .roles import has_role
+from .conditional import detail_validators, list_validators, row_version
+from .metrics import registry as metrics_registry
+from .throttling import IPRateThrottle, UserRateThrottle, purchase_limiter, password_limiter
+from . import waiting_room
+from .idempotency import idempotent
+from . import feed
+from django.conf import settings
 from django.contrib.auth.models import Group
 from django.shortcuts import get_object_or_404
 
@@ -31,16 +52,19 @@ class UserView(APIView):
         return [IsAuthenticated()]
     
     def get(self, request):
-        users = User.objects.all().order_by('id')[:10]
+        paginator = KeysetPagination(ordering=('id',))
+        users = paginator.paginate_queryset(User.objects.prefetch_related('groups', 'user_permissions'), request, view=self)
         serializer = UserSerializer(users, many=True)
         return Response({
-                'users': serializer.data
+                'users': serializer.data,
+                'next': paginator.get_next_link(),
             })
     
     def post(self, request):
         serializer = UserSerializer(data=request.data)
         if serializer.is_valid():
-            serializer.save()
+            with password_limiter.slot():
+                serializer.save()
             return Response(serializer.data, status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
@@ -69,7 +93,8 @@ class UserDetailView(APIView):
         user = self.get_object(id)
         serializer = UserSerializer(user, data=request.data)
         if serializer.is_valid():
-            serializer.save()
+            with password_limiter.slot():
+                serializer.save()
             return Response(serializer.data)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
@@ -78,17 +103,31 @@ class UserDetailView(APIView):
         user.delete()
         return Response(status=status.HTTP_204_NO_CONTENT)
 
+class LoginView(TokenObtainPairView):
+    throttle_classes = [IPRateThrottle, UserRateThrottle]
+    throttle_scope = 'login'
+
+    def post(self, request, *args, **kwargs):
+        with password_limiter.slot():
+            return super().post(request, *args, **kwargs)
+
+
 class RegisterView(APIView):
+    throttle_classes = [IPRateThrottle]
+    throttle_scope = 'register'
+
     def post(self, request):
         serializer = UserRegisterSerializer(data=request.data)
         if serializer.is_valid():
-            serializer.save()
+            with password_limiter.slot():
+                serializer.save()
             return Response({"message": "User created successfully"}, status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
 class EventView(APIView):
-    authentication_classes = [JWTAuthentication]
+    authentication_classes = [StatelessJWTAuthentication]
+    read_from_replica = True
     
     def get_permissions(self):
         if self.request.method == "POST":
@@ -96,11 +135,19 @@ class EventView(APIView):
         return [IsAuthenticated()]
     
     def get(self, request):
-        events = Event.objects.all().order_by('created_at')[:10]
-        serializer = EventSerializer(events, many=True)
-        return Response({
-                'events': serializer.data
-            })
+        filters = EventFilterSerializer(data=request.query_params)
+        filters.is_valid(raise_exception=True)
+        queryset = filter_events(Event.objects.all(), filters.validated_data)
+        paginator = KeysetPagination(ordering=(filters.validated_data['ordering'], 'id'))
+        validators = list_validators(paginator.get_page_queryset(queryset, request))
+        response = validators.not_modified(request)
+        if response is None:
+            events = paginator.paginate_queryset(EventFastSerializer.get_queryset(queryset), request, view=self)
+            response = Response({
+                    'events': EventFastSerializer.serialize(events),
+                    'next': paginator.get_next_link(),
+                })
+        return validators.apply(response)
     def post(self, request):
         serializer = EventSerializer(data=request.data)
         if serializer.is_valid():
@@ -108,6 +155,20 @@ class EventView(APIView):
             return Response(serializer.data, status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
     
+class UpcomingEventsView(APIView):
+    # Home page feed, paged from the in-memory snapshot of core.feed
+    authentication_classes = [StatelessJWTAuthentication]
+    permission_classes = [IsAuthenticated]
+    # Only pages past a truncated snapshot query the database
+    read_from_replica = True
+
+    def get(self, request):
+        body, validators = feed.render_page(request)
+        response = validators.not_modified(request)
+        if response is None:
+            response = HttpResponse(body, content_type='application/json')
+        return validators.apply(response)
+
 class EventDetailView(APIView):
     
     def get_object(self, id):
@@ -116,17 +177,37 @@ class EventDetailView(APIView):
         except Event.DoesNotExist:
             raise Http404
     
-    authentication_classes = [JWTAuthentication]
+    authentication_classes = [StatelessJWTAuthentication]
+    read_from_replica = True
     
     def get_permissions(self):
         if self.request.method == "GET":
             return [IsAuthenticated()]
         return [IsAuthenticated(), IsAdminOrSuperUser()]
     
+    def load(self, id):
+        try:
+            # Payload dibagi semua client, selalu ambil dari primary (bukan replica yang tertinggal)
+            event = Event.objects.using(DEFAULT_DB_ALIAS).select_related('availability').get(id=id)
+        except Event.DoesNotExist:
+            raise Http404
+        data = dict(EventSerializer(event).data)
+        data['availability'] = availability_data(event)
+        return availability_version(event), data
+    
+    def get_version(self, id):
+        # Versi di cache sama dengan hasil load(), cek DB hanya kalau belum ada
+        version = event_cache.get_version(id)
+        if version is None:
+            version = row_version(Event.objects.all(), id, fields=('updated_at', 'availability__updated_at'))
+        return version
+    
     def get(self, request, id):
-        event = self.get_object(id=id)
-        serializer = EventSerializer(event)
-        return Response(serializer.data)
+        validators = detail_validators(self.get_version(id))
+        response = validators.not_modified(request)
+        if response is None:
+            response = Response(event_cache.get_or_load(id, lambda: self.load(id)))
+        return validators.apply(response)
         
     def put(self, request, id):
         event = self.get_object(id=id)
@@ -138,11 +219,69 @@ class EventDetailView(APIView):
     
     def delete(self, request, id):
         event = self.get_object(id=id)
-        event.delete()
+        delete_inventory(event)
         return Response(status=status.HTTP_204_NO_CONTENT)
     
+class EventRegistrationExportView(APIView):
+    """
+    Stream every registration of an event as CSV or NDJSON.
+    """
+    authentication_classes = [StatelessJWTAuthentication]
+    
+    def get_permissions(self):
+        return [IsAuthenticated(), IsAdminOrSuperUser()]
+    
+    def get(self, request, id, export_format):
+        if not Event.objects.filter(id=id).exists():
+            raise Http404
+        rows = export_registrations(id)
+        response = StreamingHttpResponse(
+            STREAMERS[export_format](rows), content_type=EXPORT_CONTENT_TYPES[export_format]
+        )
+        response['Content-Disposition'] = f'attachment; filename="event-{id}-registrations.{export_format}"'
+        return response
+    
+class EventStatsView(APIView):
+    """
+    Dashboard numbers of one event, read only from the hourly rollups.
+    """
+    authentication_classes = [StatelessJWTAuthentication]
+    
+    def get_permissions(self):
+        return [IsAuthenticated()]
+    
+    def check_organizer(self, organizer_id):
+        # Organizer hanya boleh melihat statistik miliknya sendiri
+        user = self.request.user
+        if not (user.is_superuser or has_role(user, 'admin') or str(user.pk) == str(organizer_id)):
+            self.permission_denied(self.request)
+    
+    def get_rollups(self, id):
+        event = get_object_or_404(Event.objects.only('id', 'organizer_id'), id=id)
+        self.check_organizer(event.organizer_id)
+        return EventRollup.objects.filter(event_id=event.pk)
+    
+    def get(self, request, id):
+        filters = StatsFilterSerializer(data=request.query_params)
+        filters.is_valid(raise_exception=True)
+        rollups = filter_period(self.get_rollups(id), ROLLUP, **filters.validated_data)
+        data = dashboard_stats(rollups, ROLLUP)
+        data['as_of'] = rollups_as_of()
+        return Response(data)
+
+class OrganizerStatsView(EventStatsView):
+    """
+    Dashboard numbers over every event of an organizer.
+    """
+    
+    def get_rollups(self, id):
+        organizer = get_object_or_404(User.objects.only('id'), id=id)
+        self.check_organizer(organizer.pk)
+        return EventRollup.objects.filter(event__organizer_id=organizer.pk)
+    
 class RegistrationView(APIView):
-    authentication_classes = [JWTAuthentication]
+    authentication_classes = [StatelessJWTAuthentication]
+    throttle_scope = 'registration'
     
     def get_permissions(self):
         if self.request.method == "GET":
@@ -150,20 +289,54 @@ class RegistrationView(APIView):
         return [IsAuthenticated()]
     
     def get(self, request):
-        registrations = Registration.objects.all().order_by('created_at')[:10]
-        serializer = RegistrationSerializer(registrations, many=True)
-        return Response({
-                'registrations': serializer.data
-            })
+        paginator = KeysetPagination()
+        validators = list_validators(paginator.get_page_queryset(Registration.objects.all(), request))
+        response = validators.not_modified(request)
+        if response is None:
+            registrations = paginator.paginate_queryset(RegistrationFastSerializer.get_queryset(Registration.objects.all()), request, view=self)
+            response = Response({
+                    'registrations': RegistrationFastSerializer.serialize(registrations),
+                    'next': paginator.get_next_link(),
+                })
+        return validators.apply(response)
+    def get_throttles(self):
+        if self.request.method == "POST":
+            return [IPRateThrottle(), UserRateThrottle()]
+        return []
+    
+    @idempotent
     def post(self, request):
-        serializer = RegistrationSerializer(data=request.data)
-        if serializer.is_valid():
-            serializer.save()
-            return Response(serializer.data, status=status.HTTP_201_CREATED)
+        # Before any database work: the herd waiting for a queue is turned away here
+        admission = waiting_room.admit(request)
+        # Validation reads the ticket and the hold, so it counts as purchase work too
+        with purchase_limiter.slot():
+            serializer = RegistrationSerializer(data=request.data)
+            if serializer.is_valid():
+                serializer.save()
+                waiting_room.consume(admission)
+                return Response(serializer.data, status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
+class RegistrationBulkView(APIView):
+    authentication_classes = [StatelessJWTAuthentication]
+    
+    def get_permissions(self):
+        return [IsAuthenticated(), IsAdminOrSuperUser()]
+    
+    def post(self, request):
+        serializer = RegistrationBulkSerializer(data=request.data, many=True, max_length=settings.BULK_MAX_ITEMS)
+        if not serializer.is_valid():
+            return Response({'errors': serializer.errors}, status=status.HTTP_400_BAD_REQUEST)
+        registrations, errors = bulk_create_registrations(serializer.validated_data)
+        if any(errors):
+            return Response({'errors': errors}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({
+                'registrations': RegistrationSerializer(registrations, many=True).data
+            }, status=status.HTTP_201_CREATED)
+
 class RegistrationDetailView(APIView):
-    authentication_classes = [JWTAuthentication]
+    authentication_classes = [StatelessJWTAuthentication]
+    read_from_replica = True
     
     def get_permissions(self):
         if self.request.method == "GET":
@@ -177,9 +350,12 @@ class RegistrationDetailView(APIView):
             raise Http404
     
     def get(self, request, id):
-        registration = self.get_object(id=id)
-        serializer = RegistrationSerializer(registration)
-        return Response(serializer.data)
+        validators = detail_validators(row_version(Registration.objects.all(), id))
+        response = validators.not_modified(request)
+        if response is None:
+            registration = self.get_object(id=id)
+            response = Response(RegistrationSerializer(registration).data)
+        return validators.apply(response)
         
     def put(self, request, id):
         registration = self.get_object(id=id)
@@ -190,12 +366,85 @@ class RegistrationDetailView(APIView):
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
     
     def delete(self, request, id):
-        event = self.get_object(id=id)
-        event.delete()
+        registration = self.get_object(id=id)
+        with transaction.atomic():
+            # Payment ikut terhapus (cascade), revenue-nya juga dikurangi
+            revenue = confirmed_amount(getattr(registration, 'payment', None))
+            ticket = registration.ticket
+            registration.delete()
+            if ticket is not None:
+                return_inventory(ticket)
+                adjust(ticket.pk, ticket.event_id, sold=-1, revenue=-revenue)
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+# Reservation (hold seat sebelum registrasi)
+class ReservationView(APIView):
+    authentication_classes = [JWTAuthentication]
+    permission_classes = [IsAuthenticated]
+    throttle_classes = [IPRateThrottle, UserRateThrottle]
+    throttle_scope = 'reservation'
+
+    def post(self, request):
+        admission = waiting_room.admit(request)
+        with purchase_limiter.slot():
+            serializer = ReservationSerializer(data=request.data)
+            serializer.is_valid(raise_exception=True)
+            reservation = hold_ticket(request.user, serializer.validated_data['ticket'])
+        waiting_room.consume(admission)
+        return Response(ReservationSerializer(reservation).data, status=status.HTTP_201_CREATED)
+
+# Waiting room (antrian sebelum penjualan tiket populer)
+class QueueView(APIView):
+    authentication_classes = [StatelessJWTAuthentication]
+    permission_classes = [IsAuthenticated]
+    throttle_classes = [IPRateThrottle, UserRateThrottle]
+    throttle_scope = 'queue'
+
+    def post(self, request):
+        serializer = QueueJoinSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = waiting_room.join(request.user, serializer.validated_data['ticket_id'])
+        if data is None:
+            return Response({'detail': 'This ticket has no waiting room.'}, status=status.HTTP_404_NOT_FOUND)
+        return Response(data, status=status.HTTP_201_CREATED)
+
+class QueueStatusView(APIView):
+    # Polled by every waiting client: the token is the credential, so no
+    # authentication, throttling or database access, only the store
+    authentication_classes = []
+    permission_classes = []
+
+    def get(self, request, token):
+        data = waiting_room.queue_status(token)
+        if data is None:
+            raise Http404
+        response = Response(data)
+        response['Cache-Control'] = 'no-store'
+        return response
+
+class ReservationDetailView(APIView):
+    authentication_classes = [JWTAuthentication]
+    permission_classes = [IsAuthenticated]
+
+    def get_object(self, id):
+        try:
+            return Reservation.objects.select_related('ticket').get(id=id, user=self.request.user)
+        except Reservation.DoesNotExist:
+            raise Http404
+
+    def get(self, request, id):
+        reservation = self.get_object(id=id)
+        serializer = ReservationSerializer(reservation)
+        return Response(serializer.data)
+
+    def delete(self, request, id):
+        reservation = self.get_object(id=id)
+        cancel_hold(reservation)
         return Response(status=status.HTTP_204_NO_CONTENT)
     
 class TicketView(APIView):
-    authentication_classes = [JWTAuthentication]
+    authentication_classes = [StatelessJWTAuthentication]
+    read_from_replica = True
     
     def get_permissions(self):
         if self.request.method == "GET":
@@ -206,11 +455,16 @@ class TicketView(APIView):
         return [IsAuthenticated(), IsAdminOrSuperUser()]
     
     def get(self, request):
-        tickets = Ticket.objects.all().order_by('created_at')[:10]
-        serializer = TicketSerializer(tickets, many=True)
-        return Response({
-                'tickets': serializer.data
-            })
+        paginator = KeysetPagination()
+        validators = list_validators(paginator.get_page_queryset(Ticket.objects.all(), request))
+        response = validators.not_modified(request)
+        if response is None:
+            tickets = paginator.paginate_queryset(TicketFastSerializer.get_queryset(Ticket.objects.all()), request, view=self)
+            response = Response({
+                    'tickets': TicketFastSerializer.serialize(tickets),
+                    'next': paginator.get_next_link(),
+                })
+        return validators.apply(response)
     def post(self, request):
         serializer = TicketSerializer(data=request.data)
         if serializer.is_valid():
@@ -218,8 +472,26 @@ class TicketView(APIView):
             return Response(serializer.data, status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
+class TicketBulkView(APIView):
+    authentication_classes = [StatelessJWTAuthentication]
+    
+    def get_permissions(self):
+        return [IsAuthenticated(), IsAdminOrSuperUser()]
+    
+    def post(self, request):
+        serializer = TicketSerializer(data=request.data, many=True, max_length=settings.BULK_MAX_ITEMS)
+        if not serializer.is_valid():
+            return Response({'errors': serializer.errors}, status=status.HTTP_400_BAD_REQUEST)
+        tickets, errors = bulk_create_tickets(serializer.validated_data)
+        if any(errors):
+            return Response({'errors': errors}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({
+                'tickets': TicketSerializer(tickets, many=True).data
+            }, status=status.HTTP_201_CREATED)
+
 class TicketDetailView(APIView):
-    authentication_classes = [JWTAuthentication]
+    authentication_classes = [StatelessJWTAuthentication]
+    read_from_replica = True
     
     def get_permissions(self):
         if self.request.method == "GET":
@@ -232,10 +504,27 @@ class TicketDetailView(APIView):
         except Ticket.DoesNotExist:
             raise Http404
     
+    def load(self, id):
+        try:
+            ticket = Ticket.objects.using(DEFAULT_DB_ALIAS).select_related('availability').get(id=id)
+        except Ticket.DoesNotExist:
+            raise Http404
+        data = dict(TicketSerializer(ticket).data)
+        data['availability'] = availability_data(ticket)
+        return availability_version(ticket), data
+    
+    def get_version(self, id):
+        version = ticket_cache.get_version(id)
+        if version is None:
+            version = row_version(Ticket.objects.all(), id, fields=('updated_at', 'availability__updated_at'))
+        return version
+    
     def get(self, request, id):
-        tickets = self.get_object(id=id)
-        serializer = TicketSerializer(tickets)
-        return Response(serializer.data)
+        validators = detail_validators(self.get_version(id))
+        response = validators.not_modified(request)
+        if response is None:
+            response = Response(ticket_cache.get_or_load(id, lambda: self.load(id)))
+        return validators.apply(response)
         
     def put(self, request, id):
         tickets = self.get_object(id=id)
@@ -247,12 +536,12 @@ class TicketDetailView(APIView):
     
     def delete(self, request, id):
         tickets = self.get_object(id=id)
-        tickets.delete()
+        delete_inventory(tickets)
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 # Payment
 class PaymentView(APIView):
-    authentication_classes = [JWTAuthentication]
+    authentication_classes = [StatelessJWTAuthentication]
     
     def get_permissions(self):
         if self.request.method == "POST":
@@ -260,10 +549,15 @@ class PaymentView(APIView):
         return [IsAuthenticated(), IsAdminOrSuperUser()]
     
     def get(self, request):
-        payments = Payment.objects.all().order_by('created_at')[:10]
-        serializer = PaymentSerializer(payments, many=True)
-        return Response({'payments': serializer.data})
+        paginator = KeysetPagination()
+        validators = list_validators(paginator.get_page_queryset(Payment.objects.all(), request))
+        response = validators.not_modified(request)
+        if response is None:
+            payments = paginator.paginate_queryset(PaymentFastSerializer.get_queryset(Payment.objects.all()), request, view=self)
+            response = Response({'payments': PaymentFastSerializer.serialize(payments), 'next': paginator.get_next_link()})
+        return validators.apply(response)
 
+    @idempotent
     def post(self, request):
         serializer = PaymentSerializer(data=request.data)
         if serializer.is_valid():
@@ -272,7 +566,7 @@ class PaymentView(APIView):
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 class PaymentDetailView(APIView):
-    authentication_classes = [JWTAuthentication]
+    authentication_classes = [StatelessJWTAuthentication]
     
     def get_permissions(self):
         if self.request.method == "GET":
@@ -292,24 +586,30 @@ class PaymentDetailView(APIView):
 
     def put(self, request, id):
         payment = self.get_object(id)
+        was_confirmed = payment.payment_status == CONFIRMED
+        registration_id, revenue = payment.registration_id, confirmed_amount(payment)
         serializer = PaymentSerializer(payment, data=request.data, partial=True)
         if serializer.is_valid():
-            serializer.save()
-            
-            # Cek jika status diupdate menjadi CONFIRMED
-            if serializer.validated_data.get('status') == "CONFIRMED":
-                registration = payment.registration
-                if registration and registration.ticket:
-                    ticket = registration.ticket
-                    ticket.status = "SOLD"
-                    ticket.save()
+            confirmed = serializer.validated_data.get('payment_status', payment.payment_status) == CONFIRMED
+            if was_confirmed and not confirmed:
+                # Dibatalkan -> konfirmasi berikutnya diproses ulang oleh worker
+                payment.confirmed_at = None
+            with transaction.atomic():
+                serializer.save()
+                record_payment_change(payment, registration_id, revenue)
+                
+                # Cek jika status diupdate menjadi CONFIRMED -> diproses outbox worker
+                if confirmed and not was_confirmed:
+                    enqueue_confirmation(payment)
 
             return Response(serializer.data)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
     def delete(self, request, id):
         payment = self.get_object(id=id)
-        payment.delete()
+        with transaction.atomic():
+            record_revenue(payment.registration_id, -confirmed_amount(payment))
+            payment.delete()
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 class GroupListCreateView(APIView):
@@ -382,3 +682,22 @@ class AssignRoleView(APIView):
             "group_id": group.id,
             "group_name": group.name,
         },status=status.HTTP_201_CREATED)
+
+class CacheStatsView(APIView):
+    authentication_classes = [JWTAuthentication]
+    
+    def get_permissions(self):
+        return [IsAuthenticated(), IsSuperUser()]
+    
+    def get(self, request):
+        return Response(cache_stats())
+
+
+class MetricsView(APIView):
+    authentication_classes = [JWTAuthentication]
+
+    def get_permissions(self):
+        return [(HasMetricsToken | IsSuperUser)()]
+
+    def get(self, request):
+        return HttpResponse(metrics_registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -0,0 +1,344 @@
+import math
+import secrets
+import threading
+import time
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+
+class NotAdmitted(APIException):
+    status_code = status.HTTP_403_FORBIDDEN
+    default_detail = 'Join the waiting room for this ticket and wait to be admitted.'
+    default_code = 'not_admitted'
+
+
+class LocalWaitingRoomStore:
+    """
+    Queues in process memory, for tests and single-process runs.
+
+    A queue covers one ticket or every ticket of an event. Positions start
+    at 1 and ``head`` is the number of positions admitted so far.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._clear()
+
+    def _clear(self):
+        self.queues = {}
+        self.ticket_queues = {}
+        self.tokens = {}
+        self.members = {}
+
+    def open(self, queue_id, ticket_ids, rate):
+        with self._lock:
+            queue = self.queues.setdefault(queue_id, {'head': 0, 'tail': 0, 'tickets': set()})
+            queue['rate'] = rate
+            queue['tickets'].update(ticket_ids)
+            for ticket_id in ticket_ids:
+                self.ticket_queues[ticket_id] = queue_id
+
+    def close(self, queue_id):
+        with self._lock:
+            queue = self.queues.pop(queue_id, None)
+            if queue is None:
+                return
+            for ticket_id in queue['tickets']:
+                self.ticket_queues.pop(ticket_id, None)
+            for token in [token for token, entry in self.tokens.items() if entry['queue'] == queue_id]:
+                entry = self.tokens.pop(token)
+                self.members.pop((queue_id, entry['user']), None)
+
+    def queues_info(self):
+        with self._lock:
+            return {
+                queue_id: {'rate': queue['rate'], 'head': queue['head'], 'tail': queue['tail']}
+                for queue_id, queue in self.queues.items()
+            }
+
+    def queue_for(self, ticket_id):
+        with self._lock:
+            return self.ticket_queues.get(ticket_id)
+
+    def join(self, ticket_id, user_id, token):
+        with self._lock:
+            queue_id = self.ticket_queues.get(ticket_id)
+            if queue_id is None:
+                return None
+            existing = self.members.get((queue_id, user_id))
+            if existing is not None:
+                return existing
+            queue = self.queues[queue_id]
+            queue['tail'] += 1
+            self.tokens[token] = {'queue': queue_id, 'user': user_id, 'position': queue['tail'], 'admitted_at': None}
+            self.members[(queue_id, user_id)] = token
+            return token
+
+    def lookup(self, token, now):
+        with self._lock:
+            entry = self.tokens.get(token)
+            if entry is None:
+                return None
+            queue = self.queues[entry['queue']]
+            if entry['position'] <= queue['head'] and entry['admitted_at'] is None:
+                entry['admitted_at'] = now
+            return {**entry, 'head': queue['head'], 'rate': queue['rate']}
+
+    def advance(self, queue_id, count):
+        with self._lock:
+            queue = self.queues.get(queue_id)
+            if queue is None:
+                return 0
+            admitted = min(count, queue['tail'] - queue['head'])
+            queue['head'] += admitted
+            return admitted
+
+    def consume(self, token):
+        with self._lock:
+            entry = self.tokens.pop(token, None)
+            if entry is not None:
+                self.members.pop((entry['queue'], entry['user']), None)
+
+    def clear(self):
+        with self._lock:
+            self._clear()
+
+
+# Hand out the next position, or the one the user already holds
+_JOIN = """
+local queue_id = redis.call('GET', KEYS[1])
+if not queue_id then return false end
+local queue_key = ARGV[1] .. 'queue:' .. queue_id
+local member_key = ARGV[1] .. 'member:' .. queue_id .. ':' .. ARGV[2]
+local existing = redis.call('GET', member_key)
+if existing and redis.call('EXISTS', ARGV[1] .. 'token:' .. existing) == 1 then return existing end
+local position = redis.call('HINCRBY', queue_key, 'tail', 1)
+local token_key = ARGV[1] .. 'token:' .. ARGV[3]
+redis.call('HSET', token_key, 'queue', queue_id, 'user', ARGV[2], 'position', position)
+redis.call('EXPIRE', token_key, ARGV[4])
+redis.call('SET', member_key, ARGV[3], 'EX', ARGV[4])
+return ARGV[3]
+"""
+
+_ADVANCE = """
+local head = tonumber(redis.call('HGET', KEYS[1], 'head') or '-1')
+if head < 0 then return 0 end
+local admitted = math.min(tonumber(ARGV[1]), tonumber(redis.call('HGET', KEYS[1], 'tail')) - head)
+if admitted > 0 then redis.call('HINCRBY', KEYS[1], 'head', admitted) end
+return admitted
+"""
+
+
+class RedisWaitingRoomStore:
+    """
+    Queues shared by every worker, in Redis (needs ``redis-py``).
+
+    Tokens and memberships expire after ``WAITING_ROOM_TOKEN_TTL`` so
+    abandoned positions don't pile up.
+    """
+    prefix = 'waiting-room:'
+
+    def __init__(self):
+        import redis
+
+        self.redis = redis.Redis.from_url(settings.WAITING_ROOM_REDIS_URL, decode_responses=True)
+        self._join = self.redis.register_script(_JOIN)
+        self._advance = self.redis.register_script(_ADVANCE)
+
+    def key(self, *parts):
+        return self.prefix + ':'.join(map(str, parts))
+
+    def open(self, queue_id, ticket_ids, rate):
+        pipe = self.redis.pipeline()
+        pipe.hsetnx(self.key('queue', queue_id), 'head', 0)
+        pipe.hsetnx(self.key('queue', queue_id), 'tail', 0)
+        pipe.hset(self.key('queue', queue_id), 'rate', rate)
+        pipe.sadd(self.key('queues'), queue_id)
+        for ticket_id in ticket_ids:
+            pipe.set(self.key('ticket', ticket_id), queue_id)
+            pipe.sadd(self.key('queue-tickets', queue_id), ticket_id)
+        pipe.execute()
+
+    def close(self, queue_id):
+        tickets = self.redis.smembers(self.key('queue-tickets', queue_id))
+        # Tokens and memberships of the queue expire on their own
+        self.redis.delete(
+            self.key('queue', queue_id), self.key('queue-tickets', queue_id),
+            *[self.key('ticket', ticket_id) for ticket_id in tickets],
+        )
+        self.redis.srem(self.key('queues'), queue_id)
+
+    def queues_info(self):
+        queue_ids = sorted(self.redis.smembers(self.key('queues')))
+        pipe = self.redis.pipeline()
+        for queue_id in queue_ids:
+            pipe.hmget(self.key('queue', queue_id), 'rate', 'head', 'tail')
+        return {
+            queue_id: {'rate': float(rate), 'head': int(head), 'tail': int(tail)}
+            for queue_id, (rate, head, tail) in zip(queue_ids, pipe.execute()) if rate is not None
+        }
+
+    def queue_for(self, ticket_id):
+        return self.redis.get(self.key('ticket', ticket_id))
+
+    def join(self, ticket_id, user_id, token):
+        return self._join(
+            keys=[self.key('ticket', ticket_id)],
+            args=[self.prefix, user_id, token, settings.WAITING_ROOM_TOKEN_TTL],
+        )
+
+    def lookup(self, token, now):
+        token_key = self.key('token', token)
+        entry = self.redis.hgetall(token_key)
+        if not entry:
+            return None
+        rate, head = self.redis.hmget(self.key('queue', entry['queue']), 'rate', 'head')
+        if rate is None:
+            return None
+        position, head = int(entry['position']), int(head)
+        admitted_at = entry.get('admitted_at')
+        if position <= head and admitted_at is None:
+            self.redis.hsetnx(token_key, 'admitted_at', now)
+            admitted_at = self.redis.hget(token_key, 'admitted_at')
+        return {
+            'queue': entry['queue'], 'user': entry['user'], 'position': position,
+            'admitted_at': None if admitted_at is None else float(admitted_at),
+            'head': head, 'rate': float(rate),
+        }
+
+    def advance(self, queue_id, count):
+        return int(self._advance(keys=[self.key('queue', queue_id)], args=[count]))
+
+    def consume(self, token):
+        entry = self.redis.hmget(self.key('token', token), 'queue', 'user')
+        keys = [self.key('token', token)]
+        if entry[0] is not None:
+            keys.append(self.key('member', *entry))
+        self.redis.delete(*keys)
+
+
+_stores = {}
+
+
+def get_store():
+    """
+    The configured ``WAITING_ROOM_STORE``, ``None`` when the waiting room is off.
+    """
+    path = settings.WAITING_ROOM_STORE
+    if not path:
+        return None
+    if path not in _stores:
+        _stores[path] = import_string(path)()
+    return _stores[path]
+
+
+def open_queue(queue_id, ticket_ids, rate=None):
+    get_store().open(str(queue_id), [str(ticket_id) for ticket_id in ticket_ids], rate or settings.WAITING_ROOM_RATE)
+
+
+def close_queue(queue_id):
+    get_store().close(str(queue_id))
+
+
+def join(user, ticket_id):
+    """
+    Queue ``user`` for the ticket's waiting room and return their status;
+    joining again returns the same position. ``None`` when the ticket has
+    no waiting room.
+    """
+    store = get_store()
+    if store is None:
+        return None
+    token = store.join(str(ticket_id), str(user.pk), secrets.token_urlsafe(24))
+    return None if token is None else queue_status(token)
+
+
+def queue_status(token):
+    """
+    Position, people ahead, ETA and admission of ``token`` from the store
+    alone, without touching the database. ``None`` for unknown tokens.
+    """
+    store = get_store()
+    if store is None:
+        return None
+    now = time.time()
+    entry = store.lookup(token, now)
+    if entry is None:
+        return None
+    ahead = max(0, entry['position'] - entry['head'])
+    eta = ahead / entry['rate'] if entry['rate'] else None
+    expires_in = None
+    if entry['admitted_at'] is not None:
+        expires_in = max(0, math.floor(entry['admitted_at'] + settings.WAITING_ROOM_ADMISSION_SECONDS - now))
+    return {
+        'token': token,
+        'position': entry['position'],
+        'ahead': ahead,
+        'admitted': bool(expires_in),
+        'eta_seconds': None if eta is None else math.ceil(eta),
+        'expires_in': expires_in,
+        # Far back in the queue, poll less often
+        'poll_after': min(settings.WAITING_ROOM_MAX_POLL_SECONDS, max(1, math.ceil((eta or 0) / 2))),
+    }
+
+
+def admit(request):
+    """
+    Raise ``NotAdmitted`` unless the purchase in ``request`` may go ahead.
+
+    Tickets without a waiting room, and registrations confirming a hold
+    (which needed an admission already), pass. Otherwise the
+    ``X-Queue-Token`` header must be an admitted token of the requesting
+    user for the ticket's queue, within its admission window. Returns the
+    token to ``consume()`` once the purchase succeeded.
+    """
+    store = get_store()
+    if store is None or not hasattr(request.data, 'get') or request.data.get('reservation_id'):
+        return None
+    queue_id = store.queue_for(str(request.data.get('ticket_id')))
+    if queue_id is None:
+        return None
+    token = request.META.get('HTTP_X_QUEUE_TOKEN')
+    now = time.time()
+    entry = store.lookup(token, now) if token else None
+    if entry is None or entry['queue'] != queue_id or entry['user'] != str(request.user.pk):
+        raise NotAdmitted()
+    if entry['admitted_at'] is None:
+        raise NotAdmitted(f'Not admitted yet, {entry["position"] - entry["head"]} ahead in the waiting room.')
+    if now - entry['admitted_at'] > settings.WAITING_ROOM_ADMISSION_SECONDS:
+        store.consume(token)
+        raise NotAdmitted('Admission expired, join the waiting room again.')
+    return token
+
+
+def consume(token):
+    """
+    Use up an admission: one admission, one purchase.
+    """
+    if token is not None:
+        get_store().consume(token)
+
+
+def schedule(credits, elapsed):
+    """
+    One scheduler step: admit ``rate x elapsed`` more positions of every
+    queue. ``credits`` carries fractional admissions between steps and is
+    capped at one second's worth, so an idle queue can't save up a burst.
+    Returns the number admitted.
+    """
+    store = get_store()
+    admitted = 0
+    queues = store.queues_info()
+    for queue_id in list(credits):
+        if queue_id not in queues:
+            del credits[queue_id]
+    for queue_id, queue in queues.items():
+        credit = min(queue['rate'], credits.get(queue_id, 0) + queue['rate'] * elapsed)
+        count = int(credit)
+        if count:
+            admitted += store.advance(queue_id, count)
+        credits[queue_id] = credit - count
+    return admitted
@@ -10,8 +10,10 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
+from importlib.util import find_spec
 from pathlib import Path
-from decouple import config
+from decouple import config, Csv
 from datetime import timedelta
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -45,11 +47,13 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.middleware.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'core.middleware.ReplicaRoutingMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -73,10 +77,39 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'dicoevent.wsgi.application'
 
+# Serve GETs on the event/ticket/registration endpoints from async views.
+# Enable when running under ASGI; under WSGI every async view pays an extra
+# event-loop hop.
+ASYNC_READ_VIEWS = config('ASYNC_READ_VIEWS', default=False, cast=bool)
+
 
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
+# Connections are kept open for DATABASE_CONN_MAX_AGE seconds and checked
+# before reuse. DATABASE_POOL switches to psycopg's connection pool instead
+# (requires psycopg 3 with the pool extra: pip install "psycopg[binary,pool]");
+# Django doesn't allow persistent connections together with a pool.
+# Statement timeouts are in milliseconds, 0 disables them; raise them for
+# long management commands (rollup_stats --full, rebuild_availability).
+
+DATABASE_POOL = config('DATABASE_POOL', default=False, cast=bool)
+
+DATABASE_OPTIONS = {
+    'connect_timeout': config('DATABASE_CONNECT_TIMEOUT', default=5, cast=int),
+    'options': ' '.join([
+        f"-c statement_timeout={config('DATABASE_STATEMENT_TIMEOUT', default=30000, cast=int)}",
+        f"-c idle_in_transaction_session_timeout={config('DATABASE_IDLE_IN_TRANSACTION_TIMEOUT', default=60000, cast=int)}",
+    ]),
+}
+if DATABASE_POOL:
+    DATABASE_OPTIONS['pool'] = {
+        'min_size': config('DATABASE_POOL_MIN_SIZE', default=2, cast=int),
+        'max_size': config('DATABASE_POOL_MAX_SIZE', default=10, cast=int),
+        # Seconds to wait for a free connection before failing the request
+        'timeout': config('DATABASE_POOL_TIMEOUT', default=10, cast=int),
+    }
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.postgresql',
@@ -85,9 +118,74 @@ DATABASES = {
         'PASSWORD': config('DATABASE_PASSWORD', default='default'),
         'HOST': config('DATABASE_HOST', default='localhost'),
         'PORT': config('DATABASE_PORT', default=5432, cast=int),
+        'CONN_MAX_AGE': 0 if DATABASE_POOL else config('DATABASE_CONN_MAX_AGE', default=60, cast=int),
+        'CONN_HEALTH_CHECKS': config('DATABASE_CONN_HEALTH_CHECKS', default=True, cast=bool),
+        # Set behind PgBouncer in transaction mode (breaks iterator() cursors otherwise)
+        'DISABLE_SERVER_SIDE_CURSORS': config('DATABASE_DISABLE_SERVER_SIDE_CURSORS', default=False, cast=bool),
+        'OPTIONS': DATABASE_OPTIONS,
+    }
+}
+
+# Read replicas: comma separated hosts, same credentials as the primary.
+# GETs of views with read_from_replica = True read from one of them (see
+# core.routers); users who just wrote stay on the primary for
+# REPLICA_STICKY_SECONDS so they read their own writes.
+for index, host in enumerate(config('DATABASE_REPLICA_HOSTS', default='', cast=Csv())):
+    DATABASES[f'replica{index}'] = {
+        **DATABASES['default'],
+        'HOST': host,
+        'TEST': {'MIRROR': 'default'},
+    }
+
+REPLICA_DATABASES = [alias for alias in DATABASES if alias != 'default']
+REPLICA_STICKY_SECONDS = config('REPLICA_STICKY_SECONDS', default=5, cast=int)
+DATABASE_ROUTERS = ['core.routers.PrimaryReplicaRouter']
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+# Local memory by default; point CACHE_BACKEND/CACHE_LOCATION at a shared
+# backend (e.g. Redis) in production so invalidation reaches every worker.
+
+CACHES = {
+    'default': {
+        'BACKEND': config('CACHE_BACKEND', default='django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': config('CACHE_LOCATION', default='dicoevent'),
     }
 }
 
+DETAIL_CACHE_TIMEOUT = config('DETAIL_CACHE_TIMEOUT', default=300, cast=int)
+ROLE_CACHE_TIMEOUT = config('ROLE_CACHE_TIMEOUT', default=300, cast=int)
+
+
+# Password hashing (core.hashers)
+# https://docs.djangoproject.com/en/5.2/topics/auth/passwords/
+# PASSWORD_HASHER picks the hasher for new hashes: argon2 (needs
+# argon2-cffi, used by default when installed), scrypt or pbkdf2. The
+# others stay listed so existing hashes verify; they are rehashed with the
+# preferred hasher and parameters on the next login. Defaults are Django's
+# own; lower values are ignored.
+PASSWORD_HASHER = config('PASSWORD_HASHER', default='argon2' if find_spec('argon2') else 'scrypt')
+_PASSWORD_HASHERS = {
+    'argon2': 'core.hashers.Argon2PasswordHasher',
+    'scrypt': 'core.hashers.ScryptPasswordHasher',
+    'pbkdf2': 'core.hashers.PBKDF2PasswordHasher',
+}
+PASSWORD_HASHERS = [_PASSWORD_HASHERS[PASSWORD_HASHER]] + [
+    path for name, path in _PASSWORD_HASHERS.items() if name != PASSWORD_HASHER
+]
+PASSWORD_ARGON2_TIME_COST = config('PASSWORD_ARGON2_TIME_COST', default=2, cast=int)
+PASSWORD_ARGON2_MEMORY_COST = config('PASSWORD_ARGON2_MEMORY_COST', default=102400, cast=int)  # KiB
+PASSWORD_ARGON2_PARALLELISM = config('PASSWORD_ARGON2_PARALLELISM', default=8, cast=int)
+PASSWORD_SCRYPT_WORK_FACTOR = config('PASSWORD_SCRYPT_WORK_FACTOR', default=2 ** 14, cast=int)
+PASSWORD_SCRYPT_BLOCK_SIZE = config('PASSWORD_SCRYPT_BLOCK_SIZE', default=8, cast=int)
+PASSWORD_SCRYPT_PARALLELISM = config('PASSWORD_SCRYPT_PARALLELISM', default=5, cast=int)
+PASSWORD_PBKDF2_ITERATIONS = config('PASSWORD_PBKDF2_ITERATIONS', default=1000000, cast=int)
+# Views that hash a password (signup, login, password change) let this many
+# run at once per process; more wait up to the timeout, then get a 429
+PASSWORD_HASH_CONCURRENCY = config('PASSWORD_HASH_CONCURRENCY', default=min(4, os.cpu_count() or 1), cast=int)
+PASSWORD_HASH_QUEUE_SIZE = config('PASSWORD_HASH_QUEUE_SIZE', default=64, cast=int)
+PASSWORD_HASH_QUEUE_TIMEOUT = config('PASSWORD_HASH_QUEUE_TIMEOUT', default=5.0, cast=float)
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -135,12 +233,102 @@ REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
         'rest_framework_simplejwt.authentication.JWTAuthentication',
     ),
+    'DEFAULT_RENDERER_CLASSES': (
+        'core.renderers.JSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ),
 }
 
+# Default page size of the list endpoints (see core.pagination)
+API_PAGE_SIZE = config('API_PAGE_SIZE', default=10, cast=int)
+
 SIMPLE_JWT = {
     "ACCESS_TOKEN_LIFETIME": timedelta(hours=3),
     "REFRESH_TOKEN_LIFETIME": timedelta(days=1),
     "ROTATE_REFRESH_TOKENS": False,
     "BLACKLIST_AFTER_ROTATION": True,
     "AUTH_HEADER_TYPES": ("Bearer",),
-}
\ No newline at end of file
+    # Embed username, superuser flag and roles for StatelessJWTAuthentication
+    "TOKEN_OBTAIN_SERIALIZER": "core.serializers.RoleTokenObtainPairSerializer",
+}
+
+# Maximum number of items accepted by the bulk endpoints
+BULK_MAX_ITEMS = config('BULK_MAX_ITEMS', default=10000, cast=int)
+
+# Ticket reservation holds
+RESERVATION_HOLD_TTL = timedelta(seconds=config('RESERVATION_HOLD_SECONDS', default=600, cast=int))
+
+# Outbox worker (manage.py run_outbox_worker)
+OUTBOX_MAX_ATTEMPTS = config('OUTBOX_MAX_ATTEMPTS', default=8, cast=int)
+OUTBOX_RETRY_BASE_SECONDS = config('OUTBOX_RETRY_BASE_SECONDS', default=2, cast=int)
+OUTBOX_RETRY_MAX_SECONDS = config('OUTBOX_RETRY_MAX_SECONDS', default=600, cast=int)
+# Rows fetched per round trip by the streaming exports
+EXPORT_CHUNK_SIZE = config('EXPORT_CHUNK_SIZE', default=2000, cast=int)
+# Request metrics (core.metrics), scraped from /api/metrics/ with
+# "Authorization: Metrics <METRICS_TOKEN>" or a superuser token
+METRICS_TOKEN = config('METRICS_TOKEN', default='')
+# Requests at least this slow are logged with their SQL, if sampled
+METRICS_SLOW_REQUEST_MS = config('METRICS_SLOW_REQUEST_MS', default=500, cast=int)
+METRICS_SLOW_REQUEST_SAMPLE_RATE = config('METRICS_SLOW_REQUEST_SAMPLE_RATE', default=0.1, cast=float)
+METRICS_SLOW_REQUEST_MAX_QUERIES = config('METRICS_SLOW_REQUEST_MAX_QUERIES', default=100, cast=int)
+
+# Rate limits (core.throttling): token buckets of "<tokens>/<s|min|hour|day>"
+# per "<throttle_scope>:<ip|user>". CacheTokenBucketStore shares buckets
+# through CACHES; LocalTokenBucketStore keeps them in process (tests).
+RATE_LIMIT_STORE = config('RATE_LIMIT_STORE', default='core.throttling.CacheTokenBucketStore')
+RATE_LIMITS = {
+    'login:ip': config('RATE_LIMIT_LOGIN_IP', default='20/min'),
+    'login:user': config('RATE_LIMIT_LOGIN_USER', default='5/min'),
+    'register:ip': config('RATE_LIMIT_REGISTER_IP', default='10/hour'),
+    'registration:ip': config('RATE_LIMIT_REGISTRATION_IP', default='60/min'),
+    'registration:user': config('RATE_LIMIT_REGISTRATION_USER', default='10/min'),
+    'reservation:ip': config('RATE_LIMIT_RESERVATION_IP', default='60/min'),
+    'reservation:user': config('RATE_LIMIT_RESERVATION_USER', default='10/min'),
+    'queue:ip': config('RATE_LIMIT_QUEUE_IP', default='30/min'),
+    'queue:user': config('RATE_LIMIT_QUEUE_USER', default='10/min'),
+}
+# Ticket purchases (registrations and holds) running at once per process;
+# up to PURCHASE_QUEUE_SIZE more wait PURCHASE_QUEUE_TIMEOUT seconds, the
+# rest get 429 + Retry-After
+PURCHASE_CONCURRENCY = config('PURCHASE_CONCURRENCY', default=8, cast=int)
+PURCHASE_QUEUE_SIZE = config('PURCHASE_QUEUE_SIZE', default=32, cast=int)
+PURCHASE_QUEUE_TIMEOUT = config('PURCHASE_QUEUE_TIMEOUT', default=2.0, cast=float)
+# Hot ticket inventory (core.inventory, manage.py hot_tickets): seats of
+# designated tickets are sold from counters in this store and written to the
+# database by manage.py run_inventory_flusher. Empty = off.
+# core.inventory.RedisInventoryStore (needs redis-py) or LocalInventoryStore (tests)
+HOT_INVENTORY_STORE = config('HOT_INVENTORY_STORE', default='')
+HOT_INVENTORY_REDIS_URL = config('HOT_INVENTORY_REDIS_URL', default='redis://localhost:6379/0')
+HOT_INVENTORY_FLUSH_BATCH = config('HOT_INVENTORY_FLUSH_BATCH', default=500, cast=int)
+# Seconds a flusher may hold the single-flusher lock for one batch
+HOT_INVENTORY_FLUSH_LOCK_TTL = config('HOT_INVENTORY_FLUSH_LOCK_TTL', default=60, cast=int)
+# Waiting room (core.waiting_room, manage.py waiting_room): buyers of tickets
+# with an open queue join /api/queue/ and may only purchase once
+# manage.py run_waiting_room admits them, WAITING_ROOM_RATE per second per
+# queue. Empty store = off.
+# core.waiting_room.RedisWaitingRoomStore (needs redis-py) or LocalWaitingRoomStore (tests)
+WAITING_ROOM_STORE = config('WAITING_ROOM_STORE', default='')
+WAITING_ROOM_REDIS_URL = config('WAITING_ROOM_REDIS_URL', default='redis://localhost:6379/0')
+WAITING_ROOM_RATE = config('WAITING_ROOM_RATE', default=20.0, cast=float)
+# Seconds an admitted buyer has to purchase, and a queue token lives
+WAITING_ROOM_ADMISSION_SECONDS = config('WAITING_ROOM_ADMISSION_SECONDS', default=300, cast=int)
+WAITING_ROOM_TOKEN_TTL = config('WAITING_ROOM_TOKEN_TTL', default=7200, cast=int)
+WAITING_ROOM_MAX_POLL_SECONDS = config('WAITING_ROOM_MAX_POLL_SECONDS', default=30, cast=int)
+# Idempotency-Key on purchase and payment POSTs (core.idempotency):
+# successful responses are replayed to retries for IDEMPOTENCY_TTL seconds,
+# duplicates wait up to IDEMPOTENCY_WAIT_TIMEOUT for the first request.
+# CacheIdempotencyStore shares keys through CACHES; LocalIdempotencyStore (tests)
+IDEMPOTENCY_STORE = config('IDEMPOTENCY_STORE', default='core.idempotency.CacheIdempotencyStore')
+IDEMPOTENCY_TTL = config('IDEMPOTENCY_TTL', default=86400, cast=int)
+# Longest a request may run holding its key before a duplicate may run
+IDEMPOTENCY_LOCK_TTL = config('IDEMPOTENCY_LOCK_TTL', default=30, cast=int)
+IDEMPOTENCY_WAIT_TIMEOUT = config('IDEMPOTENCY_WAIT_TIMEOUT', default=10.0, cast=float)
+# Upcoming events feed (core.feed, /api/events/upcoming/): a snapshot of the
+# next FEED_MAX_EVENTS published events in the cache, patched by signals on
+# Event changes and rebuilt every FEED_REFRESH_SECONDS. Workers keep a copy
+# in memory and check for a newer one every FEED_LOCAL_SECONDS.
+FEED_MAX_EVENTS = config('FEED_MAX_EVENTS', default=1000, cast=int)
+FEED_REFRESH_SECONDS = config('FEED_REFRESH_SECONDS', default=60, cast=int)
+FEED_LOCAL_SECONDS = config('FEED_LOCAL_SECONDS', default=1.0, cast=float)
+FEED_CACHE_TIMEOUT = config('FEED_CACHE_TIMEOUT', default=3600, cast=int)
+FEED_LOCK_TIMEOUT = config('FEED_LOCK_TIMEOUT', default=10, cast=int)
@@ -16,16 +16,14 @@ Including another URLconf
 """
 from django.contrib import admin
 from django.urls import path, include
-from rest_framework_simplejwt.views import (
-    TokenObtainPairView,
-    TokenRefreshView,
-)
+from rest_framework_simplejwt.views import TokenRefreshView
+from core.views import LoginView
 
 
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/',include('core.urls')),
-    path('api/login/', TokenObtainPairView.as_view()),
+    path('api/login/', LoginView.as_view()),
     path('api/token/', TokenRefreshView.as_view()),
 ]